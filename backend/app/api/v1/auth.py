@@ -124,7 +124,10 @@ async def get_current_user_info(
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get current logged in user information"""
-    user_doc = await db.users.find_one({"user_id": current_user["user_id"]})
+    user_doc = await db.users.find_one(
+        {"user_id": current_user["user_id"]},
+        {"_id": 0, "hashed_password": 0}
+    )
     
     if not user_doc:
         raise HTTPException(
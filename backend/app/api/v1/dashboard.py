@@ -1,129 +1,126 @@
 from fastapi import APIRouter, Depends
-from typing import Dict
+from typing import Dict, List
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from app.core.cache import TTLCache
+from app.core.config import settings
 from app.core.database import get_database
 from app.core.security import get_current_user
 from app.models.session import SessionStatus
-from datetime import datetime, timedelta
+from app.services import blob_store, stats_service, vlm_cache
+from datetime import datetime
+import asyncio
 
 router = APIRouter()
 
+# Short-lived per-(role, user) cache; the Dashboard page polls every 30 seconds
+_stats_cache = TTLCache(ttl_seconds=settings.DASHBOARD_CACHE_TTL_SECONDS, max_entries=4096)
+
+
+def _status_keys(statuses: List[SessionStatus], prefix: str = "") -> List[str]:
+    return [f"{prefix}status:{s.value}" for s in statuses]
+
 
 @router.get("/stats", response_model=Dict)
 async def get_dashboard_stats(
     current_user: Dict = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
-    """Get dashboard statistics based on user role"""
+    """Get dashboard statistics based on user role
+    
+    Session figures come from the materialized counters maintained by
+    stats_service, and collection totals from collection metadata, so the
+    cost does not grow with the number of sessions.
+    """
     user_role = current_user.get("role")
     user_id = current_user.get("user_id")
     
-    stats = {}
+    cache_key = (user_role, user_id)
+    cached = _stats_cache.get(cache_key)
+    if cached is not None:
+        return cached
     
-    # Common stats for all roles
-    total_patients = await db.patients.count_documents({})
-    stats["total_patients"] = total_patients
+    today = datetime.utcnow().strftime("%Y-%m-%d")
     
-    # Calculate today's start time
-    today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    # Counter keys summed into each stat
+    stat_keys: Dict[str, List[str]] = {}
     
     if user_role == "nurse":
-        # Nurse-specific stats
         # Active sessions (draft or submitted)
-        active_sessions = await db.sessions.count_documents({
-            "session_status": {"$in": [
-                SessionStatus.draft.value,
-                SessionStatus.submitted.value,
-                SessionStatus.vlm_processing.value
-            ]}
-        })
-        stats["active_sessions"] = active_sessions
-        
+        stat_keys["active_sessions"] = _status_keys([
+            SessionStatus.draft,
+            SessionStatus.submitted,
+            SessionStatus.vlm_processing
+        ])
         # Sessions created today by this nurse
-        created_today = await db.sessions.count_documents({
-            "created_by": user_id,
-            "created_at": {"$gte": today_start}
-        })
-        stats["created_today"] = created_today
-        
+        stat_keys["created_today"] = [f"created:{today}:{user_id}"]
         # Sessions awaiting VLM or doctor
-        pending_review = await db.sessions.count_documents({
-            "session_status": {"$in": [
-                SessionStatus.vlm_processing.value,
-                SessionStatus.awaiting_doctor.value,
-                SessionStatus.vlm_failed.value
-            ]}
-        })
-        stats["pending_review"] = pending_review
+        stat_keys["pending_review"] = _status_keys([
+            SessionStatus.vlm_processing,
+            SessionStatus.awaiting_doctor,
+            SessionStatus.vlm_failed
+        ])
         
     elif user_role == "doctor":
-        # Doctor-specific stats
         # Sessions assigned to this doctor awaiting review
-        assigned_to_me = await db.sessions.count_documents({
-            "assigned_doctor_id": user_id,
-            "session_status": {"$in": [
-                SessionStatus.awaiting_doctor.value,
-                SessionStatus.vlm_failed.value
-            ]}
-        })
-        stats["assigned_to_me"] = assigned_to_me
-        
+        stat_keys["assigned_to_me"] = _status_keys(
+            [SessionStatus.awaiting_doctor, SessionStatus.vlm_failed],
+            prefix=f"assigned:{user_id}:"
+        )
         # Sessions currently being reviewed by this doctor
-        currently_reviewing = await db.sessions.count_documents({
-            "doctor_id": user_id,
-            "session_status": SessionStatus.doctor_reviewing.value
-        })
-        stats["currently_reviewing"] = currently_reviewing
-        
+        stat_keys["currently_reviewing"] = _status_keys(
+            [SessionStatus.doctor_reviewing],
+            prefix=f"reviewer:{user_id}:"
+        )
         # Sessions completed today by this doctor
-        completed_today = await db.sessions.count_documents({
-            "doctor_id": user_id,
-            "session_status": {"$in": [
-                SessionStatus.completed.value,
-                SessionStatus.pending_tests.value
-            ]},
-            "session_closed_at": {"$gte": today_start}
-        })
-        stats["completed_today"] = completed_today
-        
+        stat_keys["completed_today"] = [f"closed:{today}:reviewer:{user_id}"]
         # Total sessions assigned to this doctor (all time)
-        total_assigned = await db.sessions.count_documents({
-            "assigned_doctor_id": user_id
-        })
-        stats["total_assigned"] = total_assigned
+        stat_keys["total_assigned"] = [f"assigned:{user_id}:total"]
         
     elif user_role == "admin":
-        # Admin-specific stats
         # All active sessions
-        active_sessions = await db.sessions.count_documents({
-            "session_status": {"$in": [
-                SessionStatus.draft.value,
-                SessionStatus.submitted.value,
-                SessionStatus.vlm_processing.value,
-                SessionStatus.awaiting_doctor.value,
-                SessionStatus.vlm_failed.value,
-                SessionStatus.doctor_reviewing.value
-            ]}
-        })
-        stats["active_sessions"] = active_sessions
-        
+        stat_keys["active_sessions"] = _status_keys([
+            SessionStatus.draft,
+            SessionStatus.submitted,
+            SessionStatus.vlm_processing,
+            SessionStatus.awaiting_doctor,
+            SessionStatus.vlm_failed,
+            SessionStatus.doctor_reviewing
+        ])
         # Completed sessions today
-        completed_today = await db.sessions.count_documents({
-            "session_status": {"$in": [
-                SessionStatus.completed.value,
-                SessionStatus.pending_tests.value
-            ]},
-            "session_closed_at": {"$gte": today_start}
-        })
-        stats["completed_today"] = completed_today
-        
-        # Total users
-        total_users = await db.users.count_documents({})
-        stats["total_users"] = total_users
-        
-        # Total sessions
-        total_sessions = await db.sessions.count_documents({})
-        stats["total_sessions"] = total_sessions
+        stat_keys["completed_today"] = [f"closed:{today}"]
     
+    all_keys = {key for keys in stat_keys.values() for key in keys}
+    lookups = [
+        db.patients.estimated_document_count(),
+        stats_service.get_counts(db, all_keys)
+    ]
+    if user_role == "admin":
+        lookups += [
+            db.users.estimated_document_count(),
+            db.sessions.estimated_document_count(),
+            vlm_cache.get_stats(db, today),
+            blob_store.get_stats(db)
+        ]
+    results = await asyncio.gather(*lookups)
+    
+    # Common stats for all roles
+    stats = {"total_patients": results[0]}
+    
+    counts = results[1]
+    for stat, keys in stat_keys.items():
+        stats[stat] = sum(counts[key] for key in keys)
+    
+    if user_role == "admin":
+        stats["total_users"] = results[2]
+        stats["total_sessions"] = results[3]
+        cache_stats = results[4]
+        stats["vlm_cache_hits_today"] = cache_stats["hits"]
+        stats["vlm_cache_misses_today"] = cache_stats["misses"]
+        blob_stats = results[5]
+        stats["duplicate_uploads"] = blob_stats["duplicate_uploads"]
+        stats["storage_bytes"] = blob_stats["stored_bytes"]
+        stats["storage_bytes_saved"] = blob_stats["bytes_saved"]
+        stats["upload_seconds_saved"] = round(blob_stats["upload_seconds_saved"], 1)
+    
+    _stats_cache.set(cache_key, stats)
     return stats
-
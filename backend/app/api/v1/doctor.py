@@ -1,106 +1,135 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from typing import List, Dict, Optional
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from app.models.session import SessionSummary, Session, SessionStatus, Diagnosis, PendingTests
-from app.services import session_service
-from app.services.vlm_service import mock_vlm_service
+from app.models.session import SessionSummary, Session, SessionStatus, Diagnosis, PendingTests, VLMChatMessage
+from app.services import history_service, session_service, session_state, stats_service
+from app.services.medgemma_service import medgemma_service
 from app.core.database import get_database
+from app.core.executor import vlm_executor
 from app.core.security import get_current_user, require_role
+from app.utils.projection import parse_fields, sparse_response
+from app.utils.pagination import set_page_headers
 from datetime import datetime
+import asyncio
+import json
+import logging
+import time
 import uuid
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 
 @router.get("/queue", response_model=List[SessionSummary])
 async def get_doctor_queue(
+    response: Response,
     assigned_to_me: bool = Query(False, description="Filter by assigned doctor"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return (sparse fieldset)"),
+    limit: int = Query(100, ge=1, le=500, description="Sessions per page"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
     current_user: Dict = Depends(require_role(["doctor", "admin"])),
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
-    """Get sessions in doctor queue
+    """Get sessions in doctor queue, oldest first, one page at a time
     
     Includes:
     - awaiting_doctor and vlm_failed statuses (filtered by assigned_doctor_id if assigned_to_me=True)
     - doctor_reviewing statuses where the current doctor is the reviewing doctor (always shown)
+    
+    The body stays a plain list; the continuation token and (first page only)
+    total count are returned in the X-Next-Cursor and X-Total-Count headers.
     """
     doctor_id = current_user["user_id"] if assigned_to_me else None
     current_doctor_id = current_user["user_id"]
     # Include both awaiting_doctor and vlm_failed statuses so doctors can see sessions even if VLM fails
     statuses = [SessionStatus.awaiting_doctor, SessionStatus.vlm_failed]
-    return await session_service.get_sessions_for_doctor_queue(
-        db, doctor_id, statuses, current_doctor_id
+    projection = parse_fields(fields, Session, always=["session_id"])
+    if projection:
+        page = await session_service.get_doctor_queue_fields(
+            db, projection, doctor_id, statuses, current_doctor_id, limit, cursor
+        )
+        sparse = sparse_response(page.items)
+        set_page_headers(sparse, page)
+        return sparse
+    
+    page = await session_service.get_sessions_for_doctor_queue(
+        db, doctor_id, statuses, current_doctor_id, limit, cursor
     )
+    set_page_headers(response, page)
+    return page.items
 
 
 @router.get("/sessions/{session_id}/review", response_model=Session)
 async def get_session_for_review(
     session_id: str,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return (sparse fieldset)"),
     current_user: Dict = Depends(require_role(["doctor", "admin"])),
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get session for doctor review and lock it"""
-    session_doc = await db.sessions.find_one({"session_id": session_id})
+    # Get user full name
+    user_doc = await db.users.find_one({"user_id": current_user["user_id"]}, {"full_name": 1})
+    doctor_name = user_doc.get("full_name", current_user.get("username", "Unknown"))
     
-    if not session_doc:
-        from fastapi import HTTPException, status
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Session not found"
+    # Lock awaiting_doctor or vlm_failed sessions; the status check is part of
+    # the write, so only one doctor can acquire the lock.
+    # vlm_failed is included so doctors can review sessions even if VLM processing failed
+    try:
+        await session_state.transition(
+            db,
+            session_id,
+            SessionStatus.doctor_reviewing,
+            current_user["user_id"],
+            fields={
+                "doctor_id": current_user["user_id"],
+                "doctor_name": doctor_name,
+                "doctor_opened_at": datetime.utcnow()
+            }
         )
-    
-    # Check if session is already being reviewed by another doctor
-    if session_doc["session_status"] == SessionStatus.doctor_reviewing:
-        # Allow access if current doctor is the one reviewing, or if admin
-        if session_doc.get("doctor_id") != current_user["user_id"] and current_user.get("role") != "admin":
+    except session_state.TransitionConflict as conflict:
+        # Sessions in other statuses are returned without locking; one already
+        # being reviewed is only accessible to the reviewing doctor or an admin
+        reviewer = conflict.current.get("doctor_id")
+        if (
+            conflict.current["session_status"] == SessionStatus.doctor_reviewing
+            and reviewer != current_user["user_id"]
+            and current_user.get("role") != "admin"
+        ):
             from fastapi import HTTPException, status
             raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
+                status_code=status.HTTP_409_CONFLICT,
                 detail="This session is currently being reviewed by another doctor"
             )
-        # If it's the same doctor, allow access without changing status
-        return await session_service.get_session(db, session_id)
-    
-    # If status is awaiting_doctor or vlm_failed, change to doctor_reviewing
-    # This ensures doctors can review sessions even if VLM processing failed
-    if session_doc["session_status"] in [SessionStatus.awaiting_doctor, SessionStatus.vlm_failed]:
-        now = datetime.utcnow()
-        # Get user full name
-        user_doc = await db.users.find_one({"user_id": current_user["user_id"]})
-        doctor_name = user_doc.get("full_name", current_user.get("username", "Unknown"))
-        
-        await db.sessions.update_one(
-            {"session_id": session_id},
-            {
-                "$set": {
-                    "session_status": SessionStatus.doctor_reviewing,
-                    "doctor_id": current_user["user_id"],
-                    "doctor_name": doctor_name,
-                    "doctor_opened_at": now,
-                    "last_updated": now
-                },
-                "$push": {
-                    "status_history": {
-                        "status": SessionStatus.doctor_reviewing,
-                        "timestamp": now,
-                        "user_id": current_user["user_id"]
-                    }
-                }
-            }
-        )
     
+    return await _review_response(db, session_id, fields)
+
+
+async def _review_response(db: AsyncIOMotorDatabase, session_id: str, fields: Optional[str]):
+    """Full session for review, or only the requested fields"""
+    projection = parse_fields(fields, Session, always=["session_id"])
+    if projection:
+        return sparse_response(await session_service.get_session_fields(db, session_id, projection))
     return await session_service.get_session(db, session_id)
 
 
-@router.post("/sessions/{session_id}/vlm-chat")
-async def chat_with_vlm(
-    session_id: str,
-    message: Dict[str, str],
-    current_user: Dict = Depends(require_role(["doctor", "admin"])),
-    db: AsyncIOMotorDatabase = Depends(get_database)
-):
-    """Send a message to VLM and get response"""
-    session_doc = await db.sessions.find_one({"session_id": session_id})
+async def _chat_context(db: AsyncIOMotorDatabase, session_id: str):
+    """Patient context, session context and recent messages for a VLM chat turn"""
+    # Only the last 3 exchanges are used as chat context
+    session_doc, previous_chat = await asyncio.gather(
+        db.sessions.find_one(
+            {"session_id": session_id},
+            {
+                "patient_id": 1,
+                "chief_complaint": 1,
+                "current_state_description": 1,
+                "vlm_initial_output": 1
+            }
+        ),
+        history_service.recent_chat_messages(db, session_id, 6)
+    )
     
     if not session_doc:
         from fastapi import HTTPException, status
@@ -110,7 +139,10 @@ async def chat_with_vlm(
         )
     
     # Get patient context
-    patient = await db.patients.find_one({"patient_id": session_doc["patient_id"]})
+    patient = await db.patients.find_one(
+        {"patient_id": session_doc["patient_id"]},
+        {"age": 1, "sex": 1, "chronic_diseases": 1}
+    )
     patient_context = {
         "age": patient.get("age"),
         "sex": patient.get("sex"),
@@ -123,33 +155,146 @@ async def chat_with_vlm(
         "vlm_initial_output": session_doc.get("vlm_initial_output")
     }
     
-    # Get VLM response
-    vlm_response = mock_vlm_service.process_doctor_query(
-        patient_context=patient_context,
-        session_context=session_context,
-        doctor_query=message.get("content", ""),
-        previous_chat=session_doc.get("vlm_chat_history", [])
-    )
-    
+    return patient_context, session_context, previous_chat
+
+
+async def _save_chat_message(
+    db: AsyncIOMotorDatabase,
+    session_id: str,
+    content: str,
+    vlm_response: Dict
+) -> Dict:
+    """Store a doctor-VLM chat turn and return it"""
     # Create chat message
     message_id = f"M-{uuid.uuid4().hex[:8]}"
     chat_message = {
         "message_id": message_id,
         "timestamp": datetime.utcnow(),
         "sender": "doctor",
-        "content": message.get("content", ""),
+        "content": content,
         "vlm_response": vlm_response
     }
     
     # Add to chat history
-    await db.sessions.update_one(
-        {"session_id": session_id},
-        {"$push": {"vlm_chat_history": chat_message}}
-    )
+    await history_service.add_chat_message(db, session_id, dict(chat_message))
     
     return chat_message
 
 
+@router.post("/sessions/{session_id}/vlm-chat")
+async def chat_with_vlm(
+    session_id: str,
+    message: Dict[str, str],
+    current_user: Dict = Depends(require_role(["doctor", "admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Send a message to VLM and get response"""
+    _check_vlm_configured()
+    patient_context, session_context, previous_chat = await _chat_context(db, session_id)
+    
+    # Get VLM response; inference blocks, so it runs off the event loop
+    vlm_response = await vlm_executor.run(
+        medgemma_service.process_doctor_query,
+        patient_context=patient_context,
+        session_context=session_context,
+        doctor_query=message.get("content", ""),
+        previous_chat=previous_chat
+    )
+    
+    return await _save_chat_message(db, session_id, message.get("content", ""), vlm_response)
+
+
+def _check_vlm_configured():
+    """503 if the inference backend selected by VLM_BACKEND can't serve requests"""
+    configuration_error = medgemma_service.backend.configuration_error()
+    if configuration_error:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=configuration_error)
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+
+@router.post("/sessions/{session_id}/vlm-chat/stream")
+async def stream_chat_with_vlm(
+    session_id: str,
+    message: Dict[str, str],
+    current_user: Dict = Depends(require_role(["doctor", "admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Send a message to VLM and stream the response as server-sent events
+    
+    Emits `token` events ({"text": ...}) as the model generates, then a single
+    `done` event carrying the stored chat message, or an `error` event
+    ({"detail": ...}). The message is stored once, when generation completes;
+    its vlm_response records time_to_first_token_ms.
+    """
+    _check_vlm_configured()
+    started = time.perf_counter()
+    content = message.get("content", "")
+    patient_context, session_context, previous_chat = await _chat_context(db, session_id)
+    
+    async def events():
+        tokens = []
+        first_token_ms = None
+        try:
+            async for token in vlm_executor.stream(
+                medgemma_service.stream_doctor_query,
+                patient_context=patient_context,
+                session_context=session_context,
+                doctor_query=content,
+                previous_chat=previous_chat
+            ):
+                if first_token_ms is None:
+                    first_token_ms = int((time.perf_counter() - started) * 1000)
+                tokens.append(token)
+                yield _sse("token", {"text": token})
+        except HTTPException as e:
+            yield _sse("error", {"detail": e.detail})
+            return
+        except Exception as e:
+            logger.error(f"VLM chat stream failed for session {session_id}: {str(e)}")
+            yield _sse("error", {"detail": "VLM chat failed"})
+            return
+        
+        total_seconds = time.perf_counter() - started
+        logger.info(
+            f"VLM chat stream for {session_id}: first token after {first_token_ms}ms, "
+            f"{len(tokens)} tokens in {total_seconds:.1f}s"
+        )
+        vlm_response = {
+            "findings": "".join(tokens).strip(),
+            "processing_time": int(total_seconds),
+            "time_to_first_token_ms": first_token_ms
+        }
+        yield _sse("done", await _save_chat_message(db, session_id, content, vlm_response))
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/sessions/{session_id}/vlm-chat", response_model=List[VLMChatMessage])
+async def get_vlm_chat_history(
+    session_id: str,
+    response: Response,
+    limit: int = Query(50, ge=1, le=200, description="Messages per page"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    current_user: Dict = Depends(require_role(["doctor", "admin"])),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Get the doctor-VLM chat of a session, newest page first
+    
+    Messages within a page are oldest first; X-Next-Cursor leads to the
+    previous (older) page.
+    """
+    page = await history_service.get_chat_page(db, session_id, limit, cursor)
+    set_page_headers(response, page)
+    return page.items
+
+
 @router.put("/sessions/{session_id}/diagnosis")
 async def submit_diagnosis(
     session_id: str,
@@ -158,7 +303,7 @@ async def submit_diagnosis(
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Submit diagnosis for a session"""
-    session_doc = await db.sessions.find_one({"session_id": session_id})
+    session_doc = await db.sessions.find_one({"session_id": session_id}, {"_id": 1})
     
     if not session_doc:
         from fastapi import HTTPException, status
@@ -212,7 +357,18 @@ async def close_session(
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Close a session and optionally create follow-up"""
-    session_doc = await db.sessions.find_one({"session_id": session_id})
+    session_doc = await db.sessions.find_one(
+        {"session_id": session_id},
+        {
+            "patient_id": 1,
+            "patient_name": 1,
+            "assigned_doctor_id": 1,
+            "assigned_doctor_name": 1,
+            "chief_complaint": 1,
+            "diagnosis": 1,
+            "pending_tests": 1
+        }
+    )
     
     if not session_doc:
         from fastapi import HTTPException, status
@@ -237,24 +393,22 @@ async def close_session(
     else:
         final_status = SessionStatus.completed
     
-    # Close current session
-    await db.sessions.update_one(
-        {"session_id": session_id},
-        {
-            "$set": {
-                "session_status": final_status,
-                "session_closed_at": now,
-                "session_closed_by": current_user["user_id"],
-                "last_updated": now
-            },
-            "$push": {
-                "status_history": {
-                    "status": final_status,
-                    "timestamp": now,
-                    "user_id": current_user["user_id"]
-                }
-            }
-        }
+    # Close current session; only the reviewing doctor (or an admin) can, and
+    # only once, so a repeated close can't create a second follow-up
+    conditions = {}
+    if current_user.get("role") != "admin":
+        conditions["doctor_id"] = current_user["user_id"]
+    await session_state.transition(
+        db,
+        session_id,
+        final_status,
+        current_user["user_id"],
+        fields={
+            "session_closed_at": now,
+            "session_closed_by": current_user["user_id"]
+        },
+        conditions=conditions,
+        conflict_detail="Only a session under review by this doctor can be closed"
     )
     
     # Create follow-up session if pending tests
@@ -284,17 +438,22 @@ async def close_session(
             "current_state_description": f"Pending tests: {', '.join(pending_tests.get('tests_requested', []))}",
             "uploaded_files": [],
             "vlm_initial_status": "pending",
-            "vlm_chat_history": [],
+            "vlm_chat_count": 0,
             "created_at": now,
             "created_by": "system",
             "last_updated": now,
             "last_updated_by": "system",
-            "status_history": [
-                {"status": SessionStatus.draft, "timestamp": now, "user_id": "system"}
-            ]
+            "status_event_count": 1
         }
         
         await db.sessions.insert_one(follow_up_doc)
+        await asyncio.gather(
+            history_service.record_status_event(
+                db, follow_up_session_id, 1,
+                {"status": SessionStatus.draft.value, "timestamp": now, "user_id": "system"}
+            ),
+            stats_service.record_session_change(db, None, follow_up_doc)
+        )
         
         # Link sessions
         await db.sessions.update_one(
@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, Query
-from typing import List, Dict
+from typing import List, Dict, Optional
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from app.models.patient import PatientCreate, PatientUpdate, Patient, PatientSearchResult
+from app.models.session import Session
 from app.services import patient_service
 from app.core.database import get_database
 from app.core.security import get_current_user, require_role
+from app.utils.projection import parse_fields, sparse_response
 
 router = APIRouter()
 
@@ -33,10 +35,14 @@ async def search_patients(
 @router.get("/{patient_id}", response_model=Patient)
 async def get_patient(
     patient_id: str,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return (sparse fieldset)"),
     current_user: Dict = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get patient by patient_id"""
+    projection = parse_fields(fields, Patient, always=["patient_id"])
+    if projection:
+        return sparse_response(await patient_service.get_patient_fields(db, patient_id, projection))
     return await patient_service.get_patient(db, patient_id)
 
 
@@ -54,9 +60,15 @@ async def update_patient(
 @router.get("/{patient_id}/portfolio", response_model=Dict)
 async def get_patient_portfolio(
     patient_id: str,
+    fields: Optional[str] = Query(None, description="Comma-separated session fields to return (default: summary fields)"),
+    limit: int = Query(50, ge=1, le=200, description="Sessions per page"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     current_user: Dict = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
-    """Get patient with all their sessions"""
-    return await patient_service.get_patient_portfolio(db, patient_id)
+    """Get patient with their sessions, newest first, one page at a time"""
+    session_projection = parse_fields(fields, Session, always=["session_id"])
+    return await patient_service.get_patient_portfolio(
+        db, patient_id, session_projection, limit, cursor
+    )
 
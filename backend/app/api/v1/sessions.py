@@ -1,5 +1,5 @@
-from fastapi import APIRouter, Depends, UploadFile, File, Form
-from typing import List, Dict
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Request, Response, status
+from typing import List, Dict, Optional
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from app.models.session import (
     SessionCreate,
@@ -7,14 +7,36 @@ from app.models.session import (
     Session,
     SessionSummary,
     UploadedFile,
-    FileType
+    FileType,
+    FileUrlKind,
+    StatusHistoryEntry
 )
-from app.services import session_service
+from app.services import history_service, session_service
+from app.core.config import settings
 from app.core.database import get_database
 from app.core.security import get_current_user, require_role
+from app.utils import deep_zoom
+from app.utils.projection import parse_fields, sparse_response
+from app.utils.pagination import set_page_headers
+import hashlib
+import re
 
 router = APIRouter()
 
+# Sessions one batch signed URL request may cover
+MAX_URL_BATCH_SESSIONS = 100
+
+_TILE_NAME = re.compile(r"(?P<col>\d+)_(?P<row>\d+)\.jpg")
+
+
+def _immutable_headers(stored_path: str) -> Dict[str, str]:
+    """Caching headers for a stored file that never changes (tiles live
+    under the content hash of their original)"""
+    return {
+        "Cache-Control": f"private, max-age={settings.TILE_CACHE_MAX_AGE_SECONDS}, immutable",
+        "ETag": f'"{hashlib.sha256(stored_path.encode()).hexdigest()[:32]}"'
+    }
+
 
 @router.post("", response_model=Session, status_code=201)
 async def create_session(
@@ -24,7 +46,7 @@ async def create_session(
 ):
     """Create a new session (nurse, admin)"""
     # Get user full name
-    user_doc = await db.users.find_one({"user_id": current_user["user_id"]})
+    user_doc = await db.users.find_one({"user_id": current_user["user_id"]}, {"full_name": 1})
     user_name = user_doc.get("full_name", "Unknown")
     
     return await session_service.create_session(
@@ -35,16 +57,53 @@ async def create_session(
     )
 
 
+@router.get("/files/urls")
+async def get_file_urls_for_sessions(
+    session_ids: str = Query(..., min_length=1, description="Comma-separated sessions to sign every file of"),
+    kind: Optional[FileUrlKind] = Query(None, description="Sign this derivative, or the deep zoom tiles, of each file instead of the original"),
+    current_user: Dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Get signed URLs for all files of several sessions, by session then file id"""
+    ids = list(dict.fromkeys(s.strip() for s in session_ids.split(",") if s.strip()))
+    if not ids or len(ids) > MAX_URL_BATCH_SESSIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Give between 1 and {MAX_URL_BATCH_SESSIONS} session ids"
+        )
+    urls = await session_service.get_file_signed_urls(db, ids, kind)
+    return {"sessions": urls}
+
+
 @router.get("/{session_id}", response_model=Session)
 async def get_session(
     session_id: str,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return (sparse fieldset)"),
     current_user: Dict = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get session by session_id"""
+    projection = parse_fields(fields, Session, always=["session_id"])
+    if projection:
+        return sparse_response(await session_service.get_session_fields(db, session_id, projection))
     return await session_service.get_session(db, session_id)
 
 
+@router.get("/{session_id}/status-history", response_model=List[StatusHistoryEntry])
+async def get_status_history(
+    session_id: str,
+    response: Response,
+    limit: int = Query(100, ge=1, le=500, description="Events per page"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    current_user: Dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Get the status changes of a session, oldest first"""
+    page = await history_service.get_status_page(db, session_id, limit, cursor)
+    set_page_headers(response, page)
+    return page.items
+
+
 @router.put("/{session_id}", response_model=Session)
 async def update_session(
     session_id: str,
@@ -91,6 +150,18 @@ async def delete_file(
     return {"success": success, "message": "File deleted successfully"}
 
 
+@router.get("/{session_id}/files/urls")
+async def get_file_urls(
+    session_id: str,
+    kind: Optional[FileUrlKind] = Query(None, description="Sign this derivative, or the deep zoom tiles, of each file instead of the original"),
+    current_user: Dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Get signed URLs for all files of a session, by file id"""
+    urls = await session_service.get_file_signed_urls(db, [session_id], kind)
+    return {"urls": urls[session_id]}
+
+
 @router.get("/{session_id}/files/{file_id}/url")
 async def get_file_url(
     session_id: str,
@@ -103,14 +174,85 @@ async def get_file_url(
     return {"url": url}
 
 
+def _check_tiles_signature(session_id: str, file_id: str, expires: int, signature: str) -> None:
+    if not session_service.verify_tiles_url(session_id, file_id, expires, signature):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid or expired tiles URL"
+        )
+
+
+@router.get("/{session_id}/files/{file_id}/tiles.dzi")
+async def get_file_tile_descriptor(
+    session_id: str,
+    file_id: str,
+    request: Request,
+    expires: int = Query(...),
+    signature: str = Query(...),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Get the deep zoom (DZI) descriptor of an X-ray or CT slice; its tiles
+    are under tiles_files/ (signed URL from files/urls?kind=tiles, no login)"""
+    _check_tiles_signature(session_id, file_id, expires, signature)
+    pyramid = await session_service.get_file_pyramid(db, session_id, file_id)
+    headers = _immutable_headers(pyramid["file_path"])
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    descriptor = deep_zoom.descriptor(
+        pyramid["width"], pyramid["height"], pyramid["tile_size"], pyramid["overlap"], pyramid["format"]
+    )
+    return Response(descriptor, media_type="application/xml", headers=headers)
+
+
+@router.get("/{session_id}/files/{file_id}/tiles_files/{level}/{tile}")
+async def get_file_tile(
+    session_id: str,
+    file_id: str,
+    level: int,
+    tile: str,
+    request: Request,
+    expires: int = Query(...),
+    signature: str = Query(...),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Get one deep zoom tile ({col}_{row}.jpg) of an X-ray or CT slice,
+    signed like its descriptor"""
+    _check_tiles_signature(session_id, file_id, expires, signature)
+    match = _TILE_NAME.fullmatch(tile)
+    if not match:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tile not found")
+    col, row = int(match["col"]), int(match["row"])
+    
+    # Tiles never change, so a browser holding one needs no storage read
+    pyramid = await session_service.get_file_pyramid(db, session_id, file_id)
+    headers = _immutable_headers(deep_zoom.tile_path(pyramid["file_path"], level, col, row, pyramid["format"]))
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    content = await session_service.get_file_tile(db, session_id, file_id, level, col, row)
+    return Response(content, media_type="image/jpeg", headers=headers)
+
+
 @router.post("/{session_id}/submit", response_model=Session)
 async def submit_session(
     session_id: str,
+    bypass_cache: bool = Query(False, description="Always run the model, ignoring cached analyses"),
     current_user: Dict = Depends(require_role(["nurse", "admin"])),
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Submit session for VLM processing (nurse, admin)"""
-    return await session_service.submit_session(db, session_id, current_user["user_id"])
+    return await session_service.submit_session(db, session_id, current_user["user_id"], bypass_cache)
+
+
+@router.post("/vlm-failed/requeue", status_code=202)
+async def requeue_failed_sessions(
+    limit: int = Query(100, ge=1, le=1000, description="Sessions to requeue, oldest first"),
+    max_in_flight: int = Query(4, ge=1, le=50, description="Requeued sessions processed at a time"),
+    current_user: Dict = Depends(require_role(["admin"]))
+):
+    """Re-run the VLM on vlm_failed sessions in the background (admin)"""
+    from app.tasks.maintenance_tasks import requeue_failed_vlm_task
+    task = requeue_failed_vlm_task.delay(current_user["user_id"], limit, max_in_flight)
+    return {"task_id": task.id, "limit": limit, "max_in_flight": max_in_flight}
 
 
 @router.delete("/{session_id}")
@@ -0,0 +1,37 @@
+import mimetypes
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import FileResponse
+from app.services.storage_backends import LocalStorageBackend
+from app.services.storage_service import storage_service
+
+router = APIRouter()
+
+
+@router.get("/{file_path:path}")
+async def download_file(
+    file_path: str,
+    expires: int = Query(...),
+    signature: str = Query(...)
+):
+    """Serve a file of the local storage backend (signed URL, no login)"""
+    backend = storage_service.backend
+    if not isinstance(backend, LocalStorageBackend) or not backend.verify(file_path, expires, signature):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid or expired file URL"
+        )
+    
+    try:
+        path = backend.local_path(file_path)
+    except ValueError:
+        path = None
+    if path is None or not path.is_file():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File not found"
+        )
+    
+    return FileResponse(
+        path,
+        media_type=mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+    )
@@ -7,6 +7,7 @@ class Settings(BaseSettings):
     # MongoDB
     MONGODB_URL: str = "mongodb://localhost:27017"
     MONGODB_DB_NAME: str = "medflow"
+    SEQUENCE_BLOCK_SIZE: int = 100  # IDs reserved per process per counters round trip
     
     # JWT
     SECRET_KEY: str = "your-secret-key-change-in-production"
@@ -15,15 +16,35 @@ class Settings(BaseSettings):
     
     # Redis
     REDIS_URL: str = "redis://localhost:6379/0"
+    WORKER_MONGO_POOL_SIZE: int = 10  # Connections per Celery worker process
     
     # Google Cloud Storage
     GCS_BUCKET_NAME: str = "medflow-files"
     GOOGLE_APPLICATION_CREDENTIALS: str = ""
+    MAX_UPLOAD_SIZE_MB: int = 512  # Larger uploads are rejected with 413
+    UPLOAD_CHUNK_SIZE_MB: int = 1  # Uploads are read and passed to storage in chunks this size
+    GCS_UPLOAD_CHUNK_SIZE_MB: int = 8  # Size of each resumable upload request to GCS
+    STORAGE_BACKEND: str = "auto"  # gcs, local, or auto: gcs if the credentials file exists, else local
+    LOCAL_STORAGE_DIR: str = "storage"  # Root of the local backend (relative to the working directory)
+    STORAGE_MAX_CONCURRENCY: int = 16  # Concurrent blocking storage calls per process
+    STORAGE_TIMEOUT_SECONDS: float = 120.0  # Per storage call, including the wait for a free slot
+    SIGNED_URL_EXPIRATION_MINUTES: int = 30
+    SIGNED_URL_REFRESH_MARGIN_SECONDS: int = 300  # Cached URLs are re-signed once this close to expiry
+    SIGNED_URL_CACHE_MAX_ENTRIES: int = 10000  # Per process
+    DERIVATIVES_ENABLED: bool = True  # Generate previews and thumbnails of imaging uploads
+    DERIVATIVE_PREVIEW_MAX_PX: int = 1024  # Longest edge
+    DERIVATIVE_THUMBNAIL_MAX_PX: int = 256
+    DERIVATIVE_JPEG_QUALITY: int = 85
+    DZI_TILE_SIZE: int = 254  # Deep zoom tiles of X-rays and CT slices (256 with overlap)
+    DZI_TILE_OVERLAP: int = 1
+    TILE_CACHE_MAX_AGE_SECONDS: int = 31536000  # Tiles never change; browsers may keep them a year
     
     # Application
     API_V1_PREFIX: str = "/api/v1"
     PROJECT_NAME: str = "MedFlow"
+    PUBLIC_BASE_URL: str = "http://localhost:8000"  # Where browsers reach this API (local storage URLs)
     DEBUG: bool = True
+    DASHBOARD_CACHE_TTL_SECONDS: int = 10
     
     # CORS
     BACKEND_CORS_ORIGINS: List[str] = ["http://localhost:5173", "http://localhost:3000"]
@@ -32,6 +53,34 @@ class Settings(BaseSettings):
     HF_TOKEN: str = ""
     MEDGEMMA_MODEL: str = "google/medgemma-4b-it"  # Primary medical VLM (instruction-tuned)
     BIOGPT_MODEL: str = "microsoft/biogpt"  # Fallback medical text model (lowercase)
+    VLM_BACKEND: str = ""  # Inference backend: hf, mock or local; unset means hf with an HF_TOKEN, else mock
+    VLM_CHAT_MAX_CONCURRENCY: int = 4  # Concurrent chat inference calls per API worker
+    VLM_CHAT_TIMEOUT_SECONDS: float = 60.0  # Including the wait for a free slot
+    VLM_HEDGING_ENABLED: bool = True  # Start the fallback when the primary passes its p95 latency
+    VLM_HEDGE_DEFAULT_AFTER_SECONDS: float = 30.0  # Hedge deadline until enough latencies are recorded
+    VLM_HEDGE_MAX_THREADS: int = 16  # Concurrent model calls per process, hedges included
+    VLM_HEALTH_WINDOW: int = 100  # Recent calls kept per model for latency/error stats
+    VLM_BREAKER_FAILURE_THRESHOLD: int = 5  # Consecutive failures that open a model's circuit
+    VLM_BREAKER_COOLDOWN_SECONDS: float = 60.0  # How long an open circuit skips the model
+    VLM_MAX_RETRIES: int = 4  # Retries of a transient initial-analysis failure before vlm_failed
+    VLM_RETRY_BASE_SECONDS: float = 10.0  # Backoff before the first retry, doubling after
+    VLM_RETRY_MAX_SECONDS: float = 600.0
+    VLM_REQUEUE_MAX_WAIT_SECONDS: float = 1800.0  # How long a vlm_failed requeue sweep waits for a free slot before stopping
+    VLM_CACHE_ENABLED: bool = True  # Reuse initial analyses of identical prompts
+    VLM_CACHE_TTL_SECONDS: int = 604800  # 7 days
+    VLM_CACHE_MAX_ENTRIES: int = 10000  # Least recently used entries evicted past this
+    VLM_BATCH_MAX_SIZE: int = 8  # Initial analyses per model dispatch; 1 disables batching
+    VLM_BATCH_WINDOW_SECONDS: float = 0.5  # How long queued analyses wait for a batch to fill
+    VLM_BATCH_CLAIM_TIMEOUT_SECONDS: float = 2400.0  # Claimed analyses still queued after this are reclaimed (over the 30 min task limit)
+    VLM_RESUME_AFTER_SECONDS: float = 2400.0  # A redelivered analysis takes over a session claimed longer ago (over the 30 min task limit)
+    VLM_PARTIAL_OUTPUT_ENABLED: bool = True  # Stream initial analyses and store each section as it completes
+    VLM_INITIAL_TIMEOUT_SECONDS: float = 600.0  # An initial analysis with no answer from either model by then fails (and is retried)
+    VLM_LOCAL_LATENCY_DISTRIBUTION: str = "lognormal"  # constant, uniform, normal or lognormal
+    VLM_LOCAL_LATENCY_MEAN_SECONDS: float = 0.5  # Mean time to first token of the local backend
+    VLM_LOCAL_LATENCY_SPREAD: float = 0.5  # Half-width (uniform), std dev in seconds (normal) or sigma (lognormal)
+    VLM_LOCAL_TOKENS_PER_SECOND: float = 40.0  # Generation speed after the first token
+    VLM_LOCAL_FAILURE_RATE: float = 0.0  # Fraction of local calls that time out
+    VLM_LOCAL_SEED: int = 42
     
     class Config:
         env_file = ".env"
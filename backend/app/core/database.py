@@ -1,6 +1,13 @@
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from pymongo.errors import OperationFailure
 from app.core.config import settings
-from typing import Optional
+from app.core.query_shapes import index_specs
+from typing import Optional, Dict, List
+import asyncio
+
+# Server codes for an index that already exists with different options
+INDEX_CONFLICT_CODES = (85, 86)
 
 class Database:
     client: Optional[AsyncIOMotorClient] = None
@@ -38,33 +45,80 @@ async def create_indexes():
     # Patients collection indexes
     await db.db.patients.create_index("patient_id", unique=True)
     await db.db.patients.create_index("national_id", unique=True)
-    await db.db.patients.create_index("phone_primary")
-    await db.db.patients.create_index([("name", "text")])
     
     # Sessions collection indexes
     await db.db.sessions.create_index("session_id", unique=True)
-    await db.db.sessions.create_index("patient_id")
     await db.db.sessions.create_index("session_date")
-    await db.db.sessions.create_index("session_status")
-    await db.db.sessions.create_index("assigned_doctor_id")
     
     # Users collection indexes
     await db.db.users.create_index("user_id", unique=True)
     await db.db.users.create_index("username", unique=True)
     await db.db.users.create_index("email", unique=True, sparse=True)
     
+    # VLM analysis cache: expired entries are removed by the TTL monitor
+    await db.db.vlm_analysis_cache.create_index("expires_at", expireAfterSeconds=0)
+    
+    # Compound indexes derived from the registered query shapes
+    # (see app/core/query_shapes.py and scripts/index_advisor.py)
+    for collection, keys, unique in index_specs():
+        try:
+            await db.db[collection].create_index(keys, unique=unique)
+        except OperationFailure as e:
+            if e.code not in INDEX_CONFLICT_CODES:
+                raise
+            # Built before its options changed (e.g. made unique): rebuild it
+            await db.db[collection].drop_index(keys)
+            await db.db[collection].create_index(keys, unique=unique)
+    
     # Note: _id is automatically indexed by MongoDB, no need to create it
     
     print("Database indexes created")
 
 
+class SequenceAllocator:
+    """Hands out sequence values from blocks reserved on the counters collection
+
+    Each process reserves ``block_size`` values with a single ``$inc`` and serves
+    them from memory, so the ``counters`` document is only written once per
+    block instead of once per insert. Values left unused when a process exits
+    are skipped, never reused, so IDs stay unique across restarts.
+    """
+
+    def __init__(self, block_size: int):
+        self.block_size = max(1, block_size)
+        self._blocks: Dict[str, List[int]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def _lock_for(self, sequence_name: str) -> asyncio.Lock:
+        if sequence_name not in self._locks:
+            self._locks[sequence_name] = asyncio.Lock()
+        return self._locks[sequence_name]
+
+    async def _reserve_block(self, sequence_name: str) -> List[int]:
+        """Reserve the next block and return it as [next_value, last_value]"""
+        result = await db.db.counters.find_one_and_update(
+            {"_id": sequence_name},
+            {"$inc": {"sequence_value": self.block_size}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        last_value = result["sequence_value"]
+        return [last_value - self.block_size + 1, last_value]
+
+    async def next_value(self, sequence_name: str) -> int:
+        async with self._lock_for(sequence_name):
+            block = self._blocks.get(sequence_name)
+            if block is None or block[0] > block[1]:
+                block = await self._reserve_block(sequence_name)
+                self._blocks[sequence_name] = block
+            value = block[0]
+            block[0] += 1
+            return value
+
+
+sequence_allocator = SequenceAllocator(settings.SEQUENCE_BLOCK_SIZE)
+
+
 async def get_next_sequence(sequence_name: str) -> int:
     """Get next value for auto-incrementing sequences"""
-    result = await db.db.counters.find_one_and_update(
-        {"_id": sequence_name},
-        {"$inc": {"sequence_value": 1}},
-        upsert=True,
-        return_document=True
-    )
-    return result["sequence_value"]
-
+    return await sequence_allocator.next_value(sequence_name)
@@ -0,0 +1,148 @@
+"""
+Bounded thread pool for blocking calls made from async routes
+
+Inference clients (the mock VLM, huggingface_hub's InferenceClient) block
+for seconds, and the Google Cloud Storage client blocks on every round
+trip. Calling them directly from an ``async def`` route freezes the
+worker's event loop and every other request with it. BoundedExecutor runs
+them on a dedicated thread pool instead, with a per-worker limit on
+concurrent calls and a deadline covering both the wait for a slot and the
+call itself. Blocking generators (streamed inference) can be relayed item by
+item with ``stream``.
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Optional
+from fastapi import HTTPException, status
+from app.core.config import settings
+
+
+class BoundedExecutor:
+    def __init__(self, max_concurrency: int, timeout_seconds: float, name: str = "blocking"):
+        self.max_concurrency = max_concurrency
+        self.timeout_seconds = timeout_seconds
+        self.name = name
+        self.in_flight = 0
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def _ensure_started(self) -> None:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_concurrency)
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+
+    def _release(self, _future) -> None:
+        self.in_flight -= 1
+        if self._slots is not None:
+            self._slots.release()
+
+    async def run(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Run ``fn(*args, **kwargs)`` on the pool without blocking the event loop
+
+        Raises 503 if no slot frees up before the deadline and 504 if the
+        call itself overruns it. A timed-out call keeps its slot until its
+        thread actually returns, so slow calls can't pile up past the limit.
+        """
+        self._ensure_started()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or self.timeout_seconds)
+
+        try:
+            await asyncio.wait_for(self._slots.acquire(), deadline - loop.time())
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"Too many concurrent {self.name} requests, try again shortly"
+            )
+
+        self.in_flight += 1
+        future = loop.run_in_executor(self._pool, functools.partial(fn, *args, **kwargs))
+        future.add_done_callback(self._release)
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), max(deadline - loop.time(), 0))
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail=f"{self.name} request timed out"
+            )
+
+    async def stream(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> AsyncIterator:
+        """Iterate the blocking generator ``fn(*args, **kwargs)`` on the pool
+
+        Items are relayed as soon as the generator produces them. Slot and
+        deadline rules are those of ``run``, with the deadline covering the
+        whole stream. Closing the async iterator early (e.g. the client went
+        away) stops the generator at its next item.
+        """
+        self._ensure_started()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or self.timeout_seconds)
+
+        try:
+            await asyncio.wait_for(self._slots.acquire(), deadline - loop.time())
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"Too many concurrent {self.name} requests, try again shortly"
+            )
+
+        items: asyncio.Queue = asyncio.Queue()
+        end = object()
+        stopped = threading.Event()
+
+        def produce():
+            generator = fn(*args, **kwargs)
+            try:
+                for item in generator:
+                    if stopped.is_set():
+                        break
+                    loop.call_soon_threadsafe(items.put_nowait, (item, None))
+            except Exception as e:
+                loop.call_soon_threadsafe(items.put_nowait, (end, e))
+                return
+            finally:
+                generator.close()
+            loop.call_soon_threadsafe(items.put_nowait, (end, None))
+
+        self.in_flight += 1
+        future = loop.run_in_executor(self._pool, produce)
+        future.add_done_callback(self._release)
+
+        try:
+            while True:
+                try:
+                    item, error = await asyncio.wait_for(items.get(), max(deadline - loop.time(), 0))
+                except asyncio.TimeoutError:
+                    raise HTTPException(
+                        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                        detail=f"{self.name} request timed out"
+                    )
+                if item is end:
+                    if error:
+                        raise error
+                    return
+                yield item
+        finally:
+            stopped.set()
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            self._slots = None
+
+
+# Singleton instances
+vlm_executor = BoundedExecutor(
+    settings.VLM_CHAT_MAX_CONCURRENCY,
+    settings.VLM_CHAT_TIMEOUT_SECONDS,
+    name="VLM chat"
+)
+storage_executor = BoundedExecutor(
+    settings.STORAGE_MAX_CONCURRENCY,
+    settings.STORAGE_TIMEOUT_SECONDS,
+    name="storage"
+)
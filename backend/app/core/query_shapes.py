@@ -0,0 +1,242 @@
+"""
+Registry of the query shapes issued by the services
+
+Each shape records the filter/sort a service sends to MongoDB (with sample
+values) and the compound index meant to serve it, unique where the keys
+identify a document. create_indexes builds the indexes from this registry,
+and the index advisor runs explain() on every shape to check the planner
+actually uses them.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from app.models.session import SessionStatus
+
+IndexKeys = List[Tuple[str, int]]
+
+_PENDING_STATUSES = [SessionStatus.awaiting_doctor.value, SessionStatus.vlm_failed.value]
+
+
+@dataclass(frozen=True)
+class QueryShape:
+    name: str
+    collection: str
+    issued_by: str
+    filter: Dict[str, Any]
+    sort: Optional[IndexKeys] = None
+    index: Optional[IndexKeys] = None
+    unique: bool = False
+
+
+QUERY_SHAPES: List[QueryShape] = [
+    # patient_service
+    QueryShape(
+        name="patient_by_id",
+        collection="patients",
+        issued_by="patient_service.get_patient",
+        filter={"patient_id": "P-00001"},
+    ),
+    QueryShape(
+        name="patient_sessions",
+        collection="sessions",
+        issued_by="patient_service.get_patient_portfolio",
+        filter={"patient_id": "P-00001"},
+        sort=[("session_date", -1), ("session_id", -1)],
+        index=[("patient_id", 1), ("session_date", -1), ("session_id", -1)],
+    ),
+
+    # search_service
+    QueryShape(
+        name="patient_search_exact",
+        collection="patients",
+        issued_by="search_service.search_patients",
+        filter={"$or": [{"patient_id": "P-00001"}, {"search.national_id": "29801011234567"}]},
+        index=[("search.national_id", 1)],
+    ),
+    QueryShape(
+        name="patient_search_phone_primary",
+        collection="patients",
+        issued_by="search_service.search_patients",
+        filter={"search.phone_primary": {"$regex": "^0100"}},
+        index=[("search.phone_primary", 1)],
+    ),
+    QueryShape(
+        name="patient_search_phone_secondary",
+        collection="patients",
+        issued_by="search_service.search_patients",
+        filter={"search.phone_secondary": {"$regex": "^0100"}},
+        index=[("search.phone_secondary", 1)],
+    ),
+    QueryShape(
+        name="patient_search_name",
+        collection="patients",
+        issued_by="search_service.search_patients",
+        filter={"$and": [
+            {"search.name_tokens": {"$regex": "^ahm"}},
+            {"search.name_tokens": {"$regex": "^ali"}},
+        ]},
+        index=[("search.name_tokens", 1)],
+    ),
+
+    # session_service
+    QueryShape(
+        name="session_by_id",
+        collection="sessions",
+        issued_by="session_service.get_session",
+        filter={"session_id": "S-00001"},
+    ),
+    QueryShape(
+        name="doctor_queue",
+        collection="sessions",
+        issued_by="session_service.get_sessions_for_doctor_queue",
+        filter={"$or": [
+            {"session_status": {"$in": _PENDING_STATUSES}},
+            {"session_status": SessionStatus.doctor_reviewing.value, "doctor_id": "D-00001"},
+        ]},
+        sort=[("session_date", 1), ("session_id", 1)],
+        index=[("session_status", 1), ("session_date", 1), ("session_id", 1)],
+    ),
+    QueryShape(
+        name="doctor_queue_assigned",
+        collection="sessions",
+        issued_by="session_service.get_sessions_for_doctor_queue",
+        filter={"$or": [
+            {"session_status": {"$in": _PENDING_STATUSES}, "assigned_doctor_id": "D-00001"},
+            {"session_status": SessionStatus.doctor_reviewing.value, "doctor_id": "D-00001"},
+        ]},
+        sort=[("session_date", 1), ("session_id", 1)],
+        index=[("assigned_doctor_id", 1), ("session_status", 1), ("session_date", 1), ("session_id", 1)],
+    ),
+    QueryShape(
+        name="doctor_queue_reviewing",
+        collection="sessions",
+        issued_by="session_service.get_sessions_for_doctor_queue",
+        filter={"session_status": SessionStatus.doctor_reviewing.value, "doctor_id": "D-00001"},
+        sort=[("session_date", 1), ("session_id", 1)],
+        index=[("doctor_id", 1), ("session_status", 1), ("session_date", 1), ("session_id", 1)],
+    ),
+
+    QueryShape(
+        name="vlm_failed_sweep",
+        collection="sessions",
+        issued_by="session_service.requeue_failed_sessions",
+        filter={"session_status": SessionStatus.vlm_failed.value},
+        sort=[("session_date", 1), ("session_id", 1)],
+        index=[("session_status", 1), ("session_date", 1), ("session_id", 1)],
+    ),
+
+    # history_service
+    QueryShape(
+        name="session_chat_page",
+        collection="session_chat_messages",
+        issued_by="history_service.get_chat_page",
+        filter={"session_id": "S-00001"},
+        sort=[("seq", -1)],
+        index=[("session_id", 1), ("seq", -1)],
+        unique=True,
+    ),
+    QueryShape(
+        name="session_status_page",
+        collection="session_status_events",
+        issued_by="history_service.get_status_page",
+        filter={"session_id": "S-00001"},
+        sort=[("seq", 1)],
+        index=[("session_id", 1), ("seq", 1)],
+        unique=True,
+    ),
+
+    # vlm_cache
+    QueryShape(
+        name="vlm_cache_lru",
+        collection="vlm_analysis_cache",
+        issued_by="vlm_cache.put",
+        filter={},
+        sort=[("last_used_at", 1)],
+        index=[("last_used_at", 1)],
+    ),
+
+    # vlm_tasks
+    QueryShape(
+        name="vlm_pending_batch",
+        collection="vlm_pending_analyses",
+        issued_by="vlm_tasks._claim_batch",
+        filter={"batch_id": None},
+        sort=[("priority", 1), ("enqueued_at", 1)],
+        index=[("batch_id", 1), ("priority", 1), ("enqueued_at", 1)],
+    ),
+    QueryShape(
+        name="vlm_pending_by_session",
+        collection="vlm_pending_analyses",
+        issued_by="vlm_tasks._take_over",
+        filter={"session_id": "S-00001"},
+        index=[("session_id", 1)],
+    ),
+    QueryShape(
+        name="vlm_stale_batch_claims",
+        collection="vlm_pending_analyses",
+        issued_by="vlm_tasks._claim_batch",
+        filter={"claimed_at": {"$lt": datetime(2024, 1, 1)}},
+        index=[("claimed_at", 1)],
+    ),
+
+    # api/v1/auth
+    QueryShape(
+        name="user_by_username",
+        collection="users",
+        issued_by="auth.get_user_by_username",
+        filter={"username": "doctor1"},
+    ),
+]
+
+
+def index_specs() -> List[Tuple[str, IndexKeys, bool]]:
+    """Distinct (collection, keys, unique) indexes required by the registered shapes"""
+    specs = []
+    for shape in QUERY_SHAPES:
+        if shape.index and (shape.collection, shape.index, shape.unique) not in specs:
+            specs.append((shape.collection, shape.index, shape.unique))
+    return specs
+
+
+def _plan_stages(plan: Dict[str, Any]) -> List[str]:
+    """Flatten a (possibly nested) explain plan into its stage names"""
+    if "queryPlan" in plan:
+        plan = plan["queryPlan"]
+    stages = [plan.get("stage", "")]
+    if "inputStage" in plan:
+        stages.extend(_plan_stages(plan["inputStage"]))
+    for child in plan.get("inputStages", []):
+        stages.extend(_plan_stages(child))
+    return stages
+
+
+async def explain_shape(db: AsyncIOMotorDatabase, shape: QueryShape) -> Dict[str, Any]:
+    """Run explain() on a query shape and summarize how it was executed"""
+    command = {"find": shape.collection, "filter": shape.filter}
+    if shape.sort:
+        command["sort"] = dict(shape.sort)
+
+    explain = await db.command("explain", command, verbosity="executionStats")
+    stages = _plan_stages(explain["queryPlanner"]["winningPlan"])
+    stats = explain.get("executionStats", {})
+    docs_examined = stats.get("totalDocsExamined", 0)
+    returned = stats.get("nReturned", 0)
+
+    return {
+        "shape": shape.name,
+        "collection": shape.collection,
+        "issued_by": shape.issued_by,
+        "stages": stages,
+        "collection_scan": "COLLSCAN" in stages,
+        "in_memory_sort": "SORT" in stages,
+        "keys_examined": stats.get("totalKeysExamined", 0),
+        "docs_examined": docs_examined,
+        "returned": returned,
+        "examined_per_returned": docs_examined / returned if returned else float(docs_examined),
+    }
+
+
+async def explain_all_shapes(db: AsyncIOMotorDatabase) -> List[Dict[str, Any]]:
+    """Explain every registered query shape"""
+    return [await explain_shape(db, shape) for shape in QUERY_SHAPES]
@@ -0,0 +1,208 @@
+"""
+Latency/error tracking, circuit breaking and hedging for model calls
+
+Each model endpoint gets a ModelHealth: a rolling window of recent call
+latencies and outcomes, plus a circuit breaker that opens after a run of
+consecutive failures. While open, callers skip the model; once the
+cool-down has passed a single trial call is let through, and its outcome
+closes or re-opens the breaker.
+
+hedged_call tries models in order of preference. If the preferred one has
+not answered by its hedge deadline (normally its own p95 latency), the
+next one is started too, and whichever succeeds first wins. The slower
+call is left to finish in the background so its latency still counts
+towards the model's stats. An overall timeout gives up on calls that hang.
+
+is_transient and backoff_delay support retrying failures that are likely
+to go away (timeouts, rate limiting, overloaded endpoints).
+"""
+import math
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import httpx
+
+
+# HTTP statuses worth retrying: rate limiting, overload, gateway trouble
+TRANSIENT_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class CircuitOpen(Exception):
+    def __init__(self, model: str):
+        super().__init__(f"circuit open for {model}")
+
+
+class AllModelsFailed(Exception):
+    """Every model failed; ``errors`` maps each label to its exception"""
+
+    def __init__(self, errors: Dict[str, Exception]):
+        self.errors = errors
+        super().__init__("All VLM models failed. " + ", ".join(
+            f"{label.capitalize()}: {error}" for label, error in errors.items()
+        ))
+
+    @property
+    def transient(self) -> bool:
+        return bool(self.errors) and all(is_transient(error) for error in self.errors.values())
+
+
+def is_transient(error: BaseException) -> bool:
+    """Whether a failed call is worth retrying later"""
+    if isinstance(error, AllModelsFailed):
+        return error.transient
+    if isinstance(error, (CircuitOpen, TimeoutError, ConnectionError, httpx.TransportError)):
+        return True
+    # Client errors carry the response; an HTTPException (such as the 503/504
+    # of a saturated or timed out BoundedExecutor) carries the status itself
+    response = getattr(error, "response", None)
+    status_code = getattr(response, "status_code", None) or getattr(error, "status_code", None)
+    return status_code in TRANSIENT_STATUS_CODES
+
+
+def backoff_delay(attempt: int, base_seconds: float, max_seconds: float) -> float:
+    """Exponential backoff with full jitter for the given retry (1-based)"""
+    return random.uniform(0, min(max_seconds, base_seconds * 2 ** (attempt - 1)))
+
+
+class ModelHealth:
+    def __init__(
+        self,
+        name: str,
+        window: int = 100,
+        failure_threshold: int = 5,
+        cooldown_seconds: float = 60.0,
+        min_samples: int = 20
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.min_samples = min_samples
+        self.consecutive_failures = 0
+        self._samples: deque = deque(maxlen=window)  # (latency_seconds, ok)
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def record(self, latency_seconds: float, ok: bool) -> None:
+        with self._lock:
+            self._samples.append((latency_seconds, ok))
+            self._trial_in_flight = False
+            if ok:
+                self.consecutive_failures = 0
+                self._opened_at = None
+            else:
+                self.consecutive_failures += 1
+                if self._opened_at is not None or self.consecutive_failures >= self.failure_threshold:
+                    # A failed trial re-opens the breaker for another cool-down
+                    self._opened_at = time.monotonic()
+
+    def allow_request(self) -> bool:
+        """Whether the breaker lets a call through now"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial_in_flight or time.monotonic() - self._opened_at < self.cooldown_seconds:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.cooldown_seconds:
+            return "half_open"
+        return "open"
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """Latency percentile of recent successful calls, once there are enough"""
+        with self._lock:
+            latencies = sorted(latency for latency, ok in self._samples if ok)
+        if len(latencies) < self.min_samples:
+            return None
+        return latencies[max(math.ceil(len(latencies) * percentile / 100) - 1, 0)]
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = list(self._samples)
+        failures = sum(1 for _, ok in samples if not ok)
+        return {
+            "model": self.name,
+            "state": self.state,
+            "calls": len(samples),
+            "error_rate": failures / len(samples) if samples else 0.0,
+            "consecutive_failures": self.consecutive_failures,
+            "p50_seconds": self.latency_percentile(50),
+            "p95_seconds": self.latency_percentile(95),
+        }
+
+
+def _timed(health: ModelHealth, fn: Callable[[], Any]) -> Any:
+    start = time.monotonic()
+    try:
+        result = fn()
+    except Exception:
+        health.record(time.monotonic() - start, ok=False)
+        raise
+    health.record(time.monotonic() - start, ok=True)
+    return result
+
+
+def hedged_call(
+    pool: ThreadPoolExecutor,
+    attempts: List[Tuple[str, ModelHealth, Callable[[], Any]]],
+    hedge_after: Callable[[ModelHealth], Optional[float]],
+    timeout: Optional[float] = None
+) -> Tuple[str, Any]:
+    """Call ``attempts`` (label, health, fn) in order of preference
+
+    The next attempt starts when the running ones have all failed, or when
+    the latest one has been running for ``hedge_after(health)`` seconds
+    (None: never hedge, wait for it). Attempts whose breaker is open are
+    skipped. Returns the label and result of the first success; raises
+    AllModelsFailed with each attempt's error otherwise, a TimeoutError for
+    those still running after ``timeout`` seconds (None: no limit).
+    """
+    errors: Dict[str, Exception] = {}
+    running: Dict[Future, str] = {}
+    queue = list(attempts)
+    deadline = None if timeout is None else time.monotonic() + timeout
+
+    def start_next() -> Optional[Tuple[str, ModelHealth]]:
+        while queue:
+            label, health, fn = queue.pop(0)
+            if health.allow_request():
+                running[pool.submit(_timed, health, fn)] = label
+                return label, health
+            errors[label] = CircuitOpen(health.name)
+        return None
+
+    latest = start_next()
+    while running:
+        wait_seconds = hedge_after(latest[1]) if latest and queue else None
+        if deadline is not None:
+            remaining = max(deadline - time.monotonic(), 0.0)
+            wait_seconds = remaining if wait_seconds is None else min(wait_seconds, remaining)
+        done, _ = wait(running, timeout=wait_seconds, return_when=FIRST_COMPLETED)
+        if not done:
+            if deadline is not None and time.monotonic() >= deadline:
+                # Out of time: give up on the calls still running
+                for label in running.values():
+                    errors[label] = TimeoutError(f"no answer within {timeout:g}s")
+                break
+            # Hedge deadline passed: hedge with the next model
+            latest = start_next()
+            continue
+        for future in done:
+            label = running.pop(future)
+            try:
+                return label, future.result()
+            except Exception as e:
+                errors[label] = e
+        if not running:
+            latest = start_next()
+
+    raise AllModelsFailed(errors)
@@ -6,6 +6,9 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.core.config import settings
 import bcrypt
+import hashlib
+import hmac
+import time
 
 # Use bcrypt directly for better compatibility on Windows
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=12)
@@ -84,3 +87,16 @@ def require_role(allowed_roles: list):
         return current_user
     return role_checker
 
+
+
+def sign_path(path: str, expires: int) -> str:
+    """Signature of a path until a Unix time, for URLs that work without a login"""
+    message = f"{path}\n{expires}".encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+
+def verify_signed_path(path: str, expires: int, signature: str) -> bool:
+    """Whether a signed URL's parameters are authentic and unexpired"""
+    if expires < time.time():
+        return False
+    return hmac.compare_digest(sign_path(path, expires), signature)
@@ -2,7 +2,9 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.core.database import connect_to_mongo, close_mongo_connection
-from app.api.v1 import auth, patients, sessions, doctor, dashboard
+from app.core.executor import storage_executor, vlm_executor
+from app.utils.uploads import UploadSizeLimitMiddleware
+from app.api.v1 import auth, patients, sessions, doctor, dashboard, storage
 
 # Suppress passlib bcrypt version warning (harmless compatibility warning)
 import logging
@@ -15,13 +17,17 @@ app = FastAPI(
     redoc_url=f"{settings.API_V1_PREFIX}/redoc"
 )
 
-# CORS middleware
+# Turn away oversized uploads before their body is received
+app.add_middleware(UploadSizeLimitMiddleware)
+
+# CORS middleware (added last so it also wraps error responses)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.BACKEND_CORS_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count"],
 )
 
 
@@ -33,6 +39,8 @@ async def startup_db_client():
 @app.on_event("shutdown")
 async def shutdown_db_client():
     await close_mongo_connection()
+    vlm_executor.shutdown()
+    storage_executor.shutdown()
 
 
 # Health check
@@ -47,6 +55,7 @@ app.include_router(patients.router, prefix=f"{settings.API_V1_PREFIX}/patients",
 app.include_router(sessions.router, prefix=f"{settings.API_V1_PREFIX}/sessions", tags=["Sessions"])
 app.include_router(doctor.router, prefix=f"{settings.API_V1_PREFIX}/doctor", tags=["Doctor"])
 app.include_router(dashboard.router, prefix=f"{settings.API_V1_PREFIX}/dashboard", tags=["Dashboard"])
+app.include_router(storage.router, prefix=f"{settings.API_V1_PREFIX}/storage", tags=["Storage"])
 
 
 if __name__ == "__main__":
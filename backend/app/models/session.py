@@ -29,6 +29,39 @@ class FileType(str, Enum):
     other = "other"
 
 
+class DerivativeKind(str, Enum):
+    preview = "preview"
+    thumbnail = "thumbnail"
+
+
+class FileUrlKind(str, Enum):
+    """What to sign for each file instead of the original"""
+    preview = "preview"
+    thumbnail = "thumbnail"
+    tiles = "tiles"  # the deep zoom descriptor, whose URL also admits its tiles
+
+
+class FileDerivative(BaseModel):
+    """Downscaled rendition of an imaging file, stored next to it"""
+    kind: DerivativeKind
+    file_path: str
+    mime_type: str
+    width: int
+    height: int
+    size_bytes: int
+
+
+class TilePyramid(BaseModel):
+    """Deep zoom (DZI) tile pyramid of an imaging file, stored next to it"""
+    file_path: str  # The .dzi descriptor; tiles are under {name}_files/
+    width: int
+    height: int
+    tile_size: int
+    overlap: int
+    format: str
+    tile_count: int
+
+
 class UploadedFile(BaseModel):
     file_id: str
     file_name: str
@@ -36,9 +69,14 @@ class UploadedFile(BaseModel):
     file_path: str
     mime_type: str
     file_size_mb: float
+    sha256: Optional[str] = None  # Hex digest of the content (computed while uploading)
     upload_timestamp: datetime
     uploaded_by: str
     can_delete: bool = True
+    # Previews and thumbnails of imaging files, generated after upload
+    derivatives_status: Optional[str] = None  # pending, ready, unsupported, failed
+    derivatives: List[FileDerivative] = []
+    pyramid: Optional[TilePyramid] = None  # X-rays and CT slices larger than a preview
 
 
 class VLMInitialInput(BaseModel):
@@ -113,6 +151,7 @@ class SessionBase(BaseModel):
     assigned_doctor_id: str
     chief_complaint: str = Field(..., min_length=5, max_length=1000)
     current_state_description: str = Field(..., min_length=10)
+    urgent: bool = False  # Flagged by the nurse; analysed ahead of routine sessions
 
 
 class SessionCreate(SessionBase):
@@ -123,6 +162,7 @@ class SessionUpdate(BaseModel):
     chief_complaint: Optional[str] = Field(None, min_length=5, max_length=1000)
     current_state_description: Optional[str] = Field(None, min_length=10)
     assigned_doctor_id: Optional[str] = None
+    urgent: Optional[bool] = None
 
 
 class Session(SessionBase):
@@ -148,8 +188,8 @@ class Session(SessionBase):
     vlm_initial_input: Optional[VLMInitialInput] = None
     vlm_initial_output: Optional[VLMInitialOutput] = None
     
-    # Doctor-VLM Chat
-    vlm_chat_history: List[VLMChatMessage] = []
+    # Doctor-VLM Chat (messages are paged from GET /doctor/sessions/{id}/vlm-chat)
+    vlm_chat_count: int = 0
     
     # Doctor review
     doctor_id: Optional[str] = None
@@ -168,7 +208,8 @@ class Session(SessionBase):
     last_updated: datetime
     last_updated_by: str
     edit_history: List[EditHistoryEntry] = []
-    status_history: List[StatusHistoryEntry] = []
+    # Status events are paged from GET /sessions/{id}/status-history
+    status_event_count: int = 0
     
     class Config:
         from_attributes = True
@@ -0,0 +1,158 @@
+"""
+Content-addressed storage of session files
+
+The same X-ray is often uploaded again to a follow-up session, or twice by a
+retrying tablet. Uploads are hashed before anything is written, and each
+distinct content is stored once, under ``blobs/{sha256}/``, with a reference
+count in the ``blobs`` collection (keyed by the sha256). A duplicate upload
+takes a reference to the stored copy and finishes without writing; deleting a
+file drops a reference, and the stored copy goes with the last one.
+
+Each first copy is written under a name of its own (the uploading file's id),
+so a copy being deleted with its last reference never collides with a new
+upload of the same content. If two first copies race, the first to register
+is kept and the other removed.
+
+Files stored before deduplication have no blob document and are deleted
+directly. Bytes and upload time saved by duplicates are totalled in
+``blob_stats``.
+"""
+import asyncio
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from app.services.storage_service import storage_service
+from app.utils import deep_zoom
+from app.utils.uploads import StreamedUpload
+
+BLOBS_COLLECTION = "blobs"
+STATS_COLLECTION = "blob_stats"
+
+_TOTALS_ID = "totals"
+STATS = ("uploads", "duplicate_uploads", "stored_bytes", "bytes_saved", "upload_seconds_saved")
+
+
+async def _count(db: AsyncIOMotorDatabase, **deltas) -> None:
+    await db[STATS_COLLECTION].update_one({"_id": _TOTALS_ID}, {"$inc": deltas}, upsert=True)
+
+
+async def store(
+    db: AsyncIOMotorDatabase,
+    upload: StreamedUpload,
+    name: str,
+    content_type: str
+) -> Tuple[str, bool]:
+    """Store an upload once per content; returns (file_path, deduplicated)
+
+    ``name`` names the stored copy if this content is new. Raises whatever
+    reading the upload raises (413 past the size limit) before taking a
+    reference.
+    """
+    digest = await upload.hash()
+    blobs = db[BLOBS_COLLECTION]
+    now = datetime.utcnow()
+    blob = await blobs.find_one_and_update(
+        {"_id": digest},
+        {
+            "$inc": {"ref_count": 1},
+            "$set": {"last_referenced_at": now},
+            "$setOnInsert": {"file_path": None, "size_bytes": upload.size, "created_at": now}
+        },
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+
+    if blob["file_path"]:
+        await _count(
+            db,
+            uploads=1,
+            duplicate_uploads=1,
+            bytes_saved=blob["size_bytes"],
+            upload_seconds_saved=blob.get("upload_seconds", 0.0)
+        )
+        return blob["file_path"], True
+
+    try:
+        start = time.perf_counter()
+        file_path = await storage_service.upload_stream(
+            upload.chunks(),
+            f"blobs/{digest}/{name}",
+            content_type
+        )
+        upload_seconds = time.perf_counter() - start
+    except BaseException:
+        await blobs.update_one({"_id": digest}, {"$inc": {"ref_count": -1}})
+        await blobs.delete_one({"_id": digest, "file_path": None, "ref_count": {"$lte": 0}})
+        raise
+
+    registered = await blobs.find_one_and_update(
+        {"_id": digest, "file_path": None},
+        {"$set": {"file_path": file_path, "upload_seconds": upload_seconds}},
+        return_document=ReturnDocument.AFTER
+    )
+    if registered is None:
+        # Another first copy of this content registered while this one was
+        # being written; keep theirs
+        await storage_service.delete_file(file_path)
+        blob = await blobs.find_one({"_id": digest}, {"file_path": 1})
+        await _count(db, uploads=1, duplicate_uploads=1, bytes_saved=upload.size)
+        return blob["file_path"], True
+
+    await _count(db, uploads=1, stored_bytes=upload.size)
+    return file_path, False
+
+
+def derivative_paths(stored: Dict) -> List[str]:
+    """Paths of the previews, thumbnails and pyramid tiles recorded on a
+    blob or file document"""
+    paths = [derivative["file_path"] for derivative in stored.get("derivatives") or []]
+    pyramid = stored.get("pyramid")
+    if pyramid:
+        paths += [pyramid["file_path"], *deep_zoom.tile_paths(pyramid)]
+    return paths
+
+
+async def _delete_all(paths: Iterable[str]) -> None:
+    await asyncio.gather(*[storage_service.delete_file(path) for path in paths])
+
+
+async def release(db: AsyncIOMotorDatabase, file: Dict) -> bool:
+    """Drop an uploaded file's reference to its stored copy, deleting the
+    copy (and its previews and tiles) with the last reference
+
+    Files without a blob document (stored before deduplication) are deleted
+    from storage directly, with their derivatives.
+    """
+    sha256 = file.get("sha256")
+    file_path = file["file_path"]
+    blobs = db[BLOBS_COLLECTION]
+    blob = None
+    if sha256:
+        blob = await blobs.find_one_and_update(
+            {"_id": sha256, "file_path": file_path},
+            {"$inc": {"ref_count": -1}},
+            return_document=ReturnDocument.AFTER
+        )
+    if blob is None:
+        await _delete_all(derivative_paths(file))
+        return await storage_service.delete_file(file_path)
+
+    if blob["ref_count"] > 0:
+        return True
+
+    # A new reference taken since the decrement keeps the copy
+    result = await blobs.delete_one({"_id": sha256, "file_path": file_path, "ref_count": {"$lte": 0}})
+    if result.deleted_count == 0:
+        return True
+
+    await _count(db, stored_bytes=-blob["size_bytes"])
+    await _delete_all(derivative_paths(blob))
+    return await storage_service.delete_file(file_path)
+
+
+async def get_stats(db: AsyncIOMotorDatabase) -> Dict[str, float]:
+    """Uploads, duplicates, bytes stored and bytes/upload seconds saved"""
+    doc = await db[STATS_COLLECTION].find_one({"_id": _TOTALS_ID}) or {}
+    return {stat: doc.get(stat, 0) for stat in STATS}
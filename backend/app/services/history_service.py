@@ -0,0 +1,160 @@
+"""
+Session chat and status history
+
+Doctor-VLM chat messages and status events live in their own collections,
+one small document per entry keyed by (session_id, seq), instead of as
+unbounded arrays inside the session document. The session only keeps the
+counters that hand out `seq`:
+
+    session_chat_messages   vlm_chat_count      on the session
+    session_status_events   status_event_count  on the session
+
+Sessions written before the split can be migrated with
+scripts/migrate_session_history.py. Their entries are numbered up to 0, so
+they sort before anything written to the collections since.
+"""
+import asyncio
+from typing import Dict, List, Optional
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument, UpdateOne
+from app.models.session import StatusHistoryEntry, VLMChatMessage
+from app.utils.projection import model_projection
+from app.utils.pagination import Page, fetch_page
+
+CHAT_SORT = [("seq", -1)]
+STATUS_SORT = [("seq", 1)]
+
+CHAT_PROJECTION = model_projection(VLMChatMessage)
+STATUS_PROJECTION = model_projection(StatusHistoryEntry)
+
+
+async def record_status_event(db: AsyncIOMotorDatabase, session_id: str, seq: int, entry: Dict) -> None:
+    """Store a status event; `seq` is the session's status_event_count after the change"""
+    await db.session_status_events.insert_one({"session_id": session_id, "seq": seq, **entry})
+
+
+async def add_chat_message(db: AsyncIOMotorDatabase, session_id: str, message: Dict) -> Optional[int]:
+    """Append a chat message to a session; returns its seq, or None if the session doesn't exist"""
+    session_doc = await db.sessions.find_one_and_update(
+        {"session_id": session_id},
+        {"$inc": {"vlm_chat_count": 1}},
+        projection={"_id": 0, "vlm_chat_count": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if session_doc is None:
+        return None
+    seq = session_doc["vlm_chat_count"]
+    await db.session_chat_messages.insert_one({"session_id": session_id, "seq": seq, **message})
+    return seq
+
+
+async def recent_chat_messages(db: AsyncIOMotorDatabase, session_id: str, count: int) -> List[Dict]:
+    """The last `count` chat messages of a session, oldest first"""
+    cursor = db.session_chat_messages.find({"session_id": session_id}, CHAT_PROJECTION)
+    messages = await cursor.sort(CHAT_SORT).limit(count).to_list(length=count)
+    messages.reverse()
+    return messages
+
+
+async def get_chat_page(
+    db: AsyncIOMotorDatabase,
+    session_id: str,
+    limit: int = 50,
+    cursor: Optional[str] = None
+) -> Page:
+    """One page of chat history, walking back from the newest message
+
+    Items within a page are oldest first; the next cursor leads to older
+    messages.
+    """
+    page = await fetch_page(
+        db.session_chat_messages,
+        {"session_id": session_id},
+        CHAT_PROJECTION,
+        CHAT_SORT,
+        limit,
+        cursor
+    )
+    page.items = [VLMChatMessage(**message) for message in reversed(page.items)]
+    return page
+
+
+async def get_status_page(
+    db: AsyncIOMotorDatabase,
+    session_id: str,
+    limit: int = 100,
+    cursor: Optional[str] = None
+) -> Page:
+    """One page of status events, oldest first"""
+    page = await fetch_page(
+        db.session_status_events,
+        {"session_id": session_id},
+        STATUS_PROJECTION,
+        STATUS_SORT,
+        limit,
+        cursor
+    )
+    page.items = [StatusHistoryEntry(**event) for event in page.items]
+    return page
+
+
+async def delete_history(db: AsyncIOMotorDatabase, session_id: str) -> None:
+    """Remove a deleted session's chat messages and status events"""
+    await asyncio.gather(
+        db.session_chat_messages.delete_many({"session_id": session_id}),
+        db.session_status_events.delete_many({"session_id": session_id}),
+    )
+
+
+async def migrate_embedded_history(db: AsyncIOMotorDatabase, batch_size: int = 500) -> int:
+    """Move embedded vlm_chat_history/status_history arrays into their collections
+
+    Chat messages and status events added to a legacy session before it is
+    migrated already hold seq 1, 2, ... in the collections. The n legacy
+    entries go in front of them, as seq 1 - n .. 0, and the counters are
+    raised by n in the same write that unsets the arrays, so no seq is
+    handed out twice.
+
+    Returns the number of sessions migrated. Safe to re-run: a session is
+    only unset once its entries have been written, and its entries always
+    get the same seqs.
+    """
+    migrated = 0
+    query = {"$or": [{"vlm_chat_history": {"$exists": True}}, {"status_history": {"$exists": True}}]}
+    projection = {"session_id": 1, "vlm_chat_history": 1, "status_history": 1}
+    while True:
+        sessions = await db.sessions.find(query, projection).limit(batch_size).to_list(length=batch_size)
+        if not sessions:
+            return migrated
+
+        chat_ops, status_ops, session_ops = [], [], []
+        for session_doc in sessions:
+            session_id = session_doc["session_id"]
+            chat = session_doc.get("vlm_chat_history") or []
+            history = session_doc.get("status_history") or []
+            for seq, message in enumerate(chat, start=1 - len(chat)):
+                chat_ops.append(UpdateOne(
+                    {"session_id": session_id, "seq": seq},
+                    {"$setOnInsert": message},
+                    upsert=True
+                ))
+            for seq, entry in enumerate(history, start=1 - len(history)):
+                status_ops.append(UpdateOne(
+                    {"session_id": session_id, "seq": seq},
+                    {"$setOnInsert": entry},
+                    upsert=True
+                ))
+            session_ops.append(UpdateOne(
+                {"_id": session_doc["_id"], **query},
+                {
+                    "$inc": {"vlm_chat_count": len(chat), "status_event_count": len(history)},
+                    "$unset": {"vlm_chat_history": "", "status_history": ""}
+                }
+            ))
+
+        if chat_ops:
+            await db.session_chat_messages.bulk_write(chat_ops, ordered=False)
+        if status_ops:
+            await db.session_status_events.bulk_write(status_ops, ordered=False)
+        await db.sessions.bulk_write(session_ops, ordered=False)
+        migrated += len(session_ops)
@@ -0,0 +1,316 @@
+"""
+Previews and thumbnails of imaging uploads
+
+Opening a session shouldn't mean downloading every full-resolution X-ray to
+see what was uploaded. After an X-ray, CT or other image is uploaded, a
+background task (derivative_tasks.generate_file_derivatives) renders a
+preview (DERIVATIVE_PREVIEW_MAX_PX on the longest edge) and a thumbnail
+(DERIVATIVE_THUMBNAIL_MAX_PX) as JPEGs, stores them next to the original and
+lists them on the file's ``derivatives`` (and ``pyramid``).
+
+Rendering works on NumPy arrays: high bit depth radiographs are windowed to
+8 bits between their 0.5th and 99.5th percentiles in one vectorized pass,
+large reductions are done by averaging whole pixel blocks with a reshape,
+and only the last step of at most 2x is left to Pillow's Lanczos filter.
+The thumbnail is reduced from the preview rather than from the original.
+
+X-rays and CT slices larger than a preview also get a deep zoom pyramid
+(see app/utils/deep_zoom.py): each level halved from the one above by
+averaging 2 x 2 blocks, cut into DZI_TILE_SIZE tiles and stored under
+``{name}_files/`` next to a ``{name}.dzi`` descriptor, so viewers fetch
+only the tiles in view (GET /sessions/{id}/files/{file_id}/tiles.dzi).
+
+Derivatives belong to the stored copy, so files sharing a blob (see
+blob_store) reuse the first one's and go with the blob's last reference.
+Formats Pillow can't read (DICOM, PDF) are marked "unsupported".
+"""
+import asyncio
+import io
+import logging
+import tempfile
+from pathlib import PurePosixPath
+from typing import BinaryIO, Dict, List, Optional, Tuple
+import numpy as np
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from PIL import Image, ImageOps, UnidentifiedImageError
+from app.core.config import settings
+from app.models.session import DerivativeKind, FileDerivative, FileType, TilePyramid
+from app.services import blob_store
+from app.services.storage_service import storage_service
+from app.utils import deep_zoom
+
+logger = logging.getLogger(__name__)
+
+IMAGING_FILE_TYPES = {FileType.xray, FileType.ct}
+
+# Modes holding more than 8 bits per sample (16-bit PNG/TIFF radiographs)
+_HIGH_BIT_DEPTH_MODES = {"I", "I;16", "I;16B", "I;16L", "F"}
+
+# Every n-th pixel in each direction is enough to place the window
+_WINDOW_SAMPLE_STEP = 4
+
+DZI_TILE_FORMAT = "jpg"
+
+
+def wants_derivatives(file_type: FileType, mime_type: str) -> bool:
+    return settings.DERIVATIVES_ENABLED and (
+        file_type in IMAGING_FILE_TYPES or mime_type.startswith("image/")
+    )
+
+
+def to_display_pixels(image: Image.Image) -> np.ndarray:
+    """8-bit grayscale (h, w) or RGB (h, w, 3) pixels of an image"""
+    if image.mode in _HIGH_BIT_DEPTH_MODES:
+        pixels = np.asarray(image)
+        low, high = np.percentile(pixels[::_WINDOW_SAMPLE_STEP, ::_WINDOW_SAMPLE_STEP], (0.5, 99.5))
+        scale = 255.0 / max(high - low, 1e-6)
+        windowed = (pixels.astype(np.float32) - low) * scale
+        return np.clip(windowed, 0, 255).astype(np.uint8)
+    if image.mode not in ("L", "RGB"):
+        image = image.convert("L" if image.mode in ("1", "LA") else "RGB")
+    return np.asarray(image)
+
+
+def box_reduce(pixels: np.ndarray, factor: int) -> np.ndarray:
+    """Average factor x factor blocks of pixels (edge rows/columns that
+    don't fill a block are dropped)"""
+    if factor <= 1:
+        return pixels
+    height = pixels.shape[0] - pixels.shape[0] % factor
+    width = pixels.shape[1] - pixels.shape[1] % factor
+    blocks = pixels[:height, :width].reshape(
+        height // factor, factor, width // factor, factor, *pixels.shape[2:]
+    )
+    return blocks.mean(axis=(1, 3), dtype=np.float32).round().astype(np.uint8)
+
+
+def downscale(pixels: np.ndarray, max_px: int) -> np.ndarray:
+    """Shrink so the longest edge is at most max_px, keeping the aspect ratio"""
+    height, width = pixels.shape[:2]
+    longest = max(height, width)
+    if longest <= max_px:
+        return pixels
+
+    pixels = box_reduce(pixels, longest // (2 * max_px))
+    height, width = pixels.shape[:2]
+    scale = max_px / max(height, width)
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return np.asarray(Image.fromarray(pixels).resize(size, Image.LANCZOS))
+
+
+def encode_jpeg(pixels: np.ndarray, progressive: bool = True) -> bytes:
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(
+        buffer,
+        "JPEG",
+        quality=settings.DERIVATIVE_JPEG_QUALITY,
+        optimize=True,
+        progressive=progressive
+    )
+    return buffer.getvalue()
+
+
+def decode_pixels(source: BinaryIO, max_px: Optional[int] = None) -> np.ndarray:
+    """Display pixels of an image file (see to_display_pixels)
+
+    Raises UnidentifiedImageError for anything Pillow can't read. Multi-frame
+    images (TIFF stacks) are decoded from their first frame. With ``max_px``,
+    JPEGs are decoded straight at the smallest fraction of their size still
+    covering it.
+    """
+    with Image.open(source) as image:
+        if max_px:
+            image.draft(image.mode, (max_px, max_px))
+        image = ImageOps.exif_transpose(image)
+        return to_display_pixels(image)
+
+
+def render_derivatives(pixels: np.ndarray) -> List[Tuple[DerivativeKind, bytes, int, int]]:
+    """Preview and thumbnail JPEGs of an image: (kind, data, width, height)"""
+    rendered = []
+    for kind, max_px in [
+        (DerivativeKind.preview, settings.DERIVATIVE_PREVIEW_MAX_PX),
+        (DerivativeKind.thumbnail, settings.DERIVATIVE_THUMBNAIL_MAX_PX),
+    ]:
+        pixels = downscale(pixels, max_px)
+        rendered.append((kind, encode_jpeg(pixels), pixels.shape[1], pixels.shape[0]))
+    return rendered
+
+
+def halve(pixels: np.ndarray) -> np.ndarray:
+    """The next pyramid level down: half the size, odd edges rounded up"""
+    pad = [(0, pixels.shape[0] % 2), (0, pixels.shape[1] % 2)] + [(0, 0)] * (pixels.ndim - 2)
+    return box_reduce(np.pad(pixels, pad, mode="edge"), 2)
+
+
+def encode_tiles(pixels: np.ndarray) -> List[Tuple[int, int, bytes]]:
+    """JPEG tiles (col, row, data) of one pyramid level"""
+    height, width = pixels.shape[:2]
+    cols, rows = deep_zoom.tile_grid(width, height, settings.DZI_TILE_SIZE)
+    tiles = []
+    for col in range(cols):
+        for row in range(rows):
+            left, top, right, bottom = deep_zoom.tile_bounds(
+                col, row, width, height, settings.DZI_TILE_SIZE, settings.DZI_TILE_OVERLAP
+            )
+            tiles.append((col, row, encode_jpeg(pixels[top:bottom, left:right], progressive=False)))
+    return tiles
+
+
+def derivative_destination(file_path: str, suffix: str) -> str:
+    """Storage path of a derivative, next to the original"""
+    original = PurePosixPath(storage_service.storage_path(file_path))
+    return str(original.with_name(f"{original.stem}{suffix}"))
+
+
+def wants_pyramid(file_type: FileType, pixels: np.ndarray) -> bool:
+    """Radiographs and CT slices too big to see whole in a preview"""
+    return file_type in IMAGING_FILE_TYPES and max(pixels.shape[:2]) > settings.DERIVATIVE_PREVIEW_MAX_PX
+
+
+async def _store_pyramid(file_path: str, pixels: np.ndarray) -> TilePyramid:
+    """Cut and store every level of a deep zoom pyramid, then its descriptor"""
+    loop = asyncio.get_running_loop()
+    height, width = pixels.shape[:2]
+    descriptor_path = derivative_destination(file_path, ".dzi")
+
+    tile_count = 0
+    for level in range(deep_zoom.max_level(width, height), -1, -1):
+        tiles = await loop.run_in_executor(None, encode_tiles, pixels)
+        await asyncio.gather(*[
+            storage_service.upload_file(
+                data,
+                deep_zoom.tile_path(descriptor_path, level, col, row, DZI_TILE_FORMAT),
+                "image/jpeg"
+            )
+            for col, row, data in tiles
+        ])
+        tile_count += len(tiles)
+        if level > 0:
+            pixels = await loop.run_in_executor(None, halve, pixels)
+
+    # Stored last, so a descriptor is only ever found next to all its tiles
+    descriptor = deep_zoom.descriptor(
+        width, height, settings.DZI_TILE_SIZE, settings.DZI_TILE_OVERLAP, DZI_TILE_FORMAT
+    )
+    stored_path = await storage_service.upload_file(descriptor.encode(), descriptor_path, "application/xml")
+    return TilePyramid(
+        file_path=stored_path,
+        width=width,
+        height=height,
+        tile_size=settings.DZI_TILE_SIZE,
+        overlap=settings.DZI_TILE_OVERLAP,
+        format=DZI_TILE_FORMAT,
+        tile_count=tile_count
+    )
+
+
+async def _render_and_store(
+    file_path: str,
+    file_type: FileType
+) -> Tuple[List[FileDerivative], Optional[TilePyramid]]:
+    loop = asyncio.get_running_loop()
+    # Pyramids need the full resolution; previews alone don't
+    max_px = None if file_type in IMAGING_FILE_TYPES else settings.DERIVATIVE_PREVIEW_MAX_PX
+    with tempfile.TemporaryFile() as source:
+        async for chunk in storage_service.download_stream(file_path):
+            source.write(chunk)
+        source.seek(0)
+        # CPU bound; keep the event loop free meanwhile
+        pixels = await loop.run_in_executor(None, decode_pixels, source, max_px)
+    rendered = await loop.run_in_executor(None, render_derivatives, pixels)
+
+    derivatives = []
+    for kind, data, width, height in rendered:
+        stored_path = await storage_service.upload_file(
+            data,
+            derivative_destination(file_path, f"_{kind.value}.jpg"),
+            "image/jpeg"
+        )
+        derivatives.append(FileDerivative(
+            kind=kind,
+            file_path=stored_path,
+            mime_type="image/jpeg",
+            width=width,
+            height=height,
+            size_bytes=len(data)
+        ))
+
+    pyramid = await _store_pyramid(file_path, pixels) if wants_pyramid(file_type, pixels) else None
+    return derivatives, pyramid
+
+
+async def _delete_all(stored: Dict) -> None:
+    await asyncio.gather(*[
+        storage_service.delete_file(path) for path in blob_store.derivative_paths(stored)
+    ])
+
+
+async def generate_file_derivatives(
+    db: AsyncIOMotorDatabase,
+    session_id: str,
+    file_id: str
+) -> Optional[str]:
+    """Render, store and record a file's derivatives; returns the file's
+    derivatives_status, or None if the file no longer exists"""
+    session_doc = await db.sessions.find_one(
+        {"session_id": session_id},
+        {"uploaded_files": {"$elemMatch": {"file_id": file_id}}}
+    )
+    files = (session_doc or {}).get("uploaded_files", [])
+    if not files:
+        return None
+    file_path = files[0]["file_path"]
+    sha256 = files[0].get("sha256")
+
+    blobs = db[blob_store.BLOBS_COLLECTION]
+    blob = None
+    if sha256:
+        blob = await blobs.find_one(
+            {"_id": sha256, "file_path": file_path},
+            {"derivatives": 1, "pyramid": 1, "derivatives_status": 1}
+        )
+
+    if blob and blob.get("derivatives_status"):
+        # Already rendered for another file sharing this blob
+        rendered = {
+            "derivatives": blob.get("derivatives", []),
+            "pyramid": blob.get("pyramid"),
+            "derivatives_status": blob["derivatives_status"]
+        }
+    else:
+        try:
+            derivatives, pyramid = await _render_and_store(file_path, FileType(files[0]["file_type"]))
+            rendered = {
+                "derivatives": [derivative.model_dump() for derivative in derivatives],
+                "pyramid": pyramid.model_dump() if pyramid else None,
+                "derivatives_status": "ready"
+            }
+        except (UnidentifiedImageError, Image.DecompressionBombError) as e:
+            logger.info(f"No derivatives for {file_id}: {e}")
+            rendered = {"derivatives": [], "pyramid": None, "derivatives_status": "unsupported"}
+
+        if blob:
+            result = await blobs.update_one({"_id": sha256, "file_path": file_path}, {"$set": rendered})
+            if result.matched_count == 0:
+                # The blob lost its last reference while rendering
+                await _delete_all(rendered)
+                return None
+
+    result = await db.sessions.update_one(
+        {"session_id": session_id, "uploaded_files.file_id": file_id},
+        {"$set": {f"uploaded_files.$.{field}": value for field, value in rendered.items()}}
+    )
+    if result.matched_count == 0:
+        # Deleted while rendering; a blob's derivatives go with the blob
+        if not blob:
+            await _delete_all(rendered)
+        return None
+    return rendered["derivatives_status"]
+
+
+async def mark_failed(db: AsyncIOMotorDatabase, session_id: str, file_id: str) -> None:
+    await db.sessions.update_one(
+        {"session_id": session_id, "uploaded_files.file_id": file_id},
+        {"$set": {"uploaded_files.$.derivatives_status": "failed"}}
+    )
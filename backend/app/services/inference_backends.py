@@ -0,0 +1,296 @@
+"""
+Text generation backends behind MedGemmaService
+
+MedGemmaService builds the prompts, hedges and falls back between models,
+and parses the answers; a backend only turns a (prompt, model) pair into
+text. VLM_BACKEND selects one (when unset: hf if HF_TOKEN is set, else mock,
+so a development setup without a token still answers):
+
+  hf      Hugging Face Inference API (needs HF_TOKEN)
+  mock    the rule-based mock VLM, with its random processing delays
+  local   offline and deterministic: answers depend only on the prompt and
+          model, latencies come from a seeded distribution plus generated
+          tokens / VLM_LOCAL_TOKENS_PER_SECOND; for load tests and benchmarks
+"""
+import hashlib
+import math
+import random
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from huggingface_hub import InferenceClient
+from app.core.config import settings
+from app.services.vlm_service import mock_vlm_service
+
+
+class InferenceBackend:
+    """Interface of a text generation backend"""
+
+    name = "base"
+
+    # Backends with native batched generation set this and override generate_batch
+    supports_batching = False
+
+    def generate(self, prompt: str, model: str, **params) -> str:
+        raise NotImplementedError
+
+    def generate_stream(self, prompt: str, model: str, **params) -> Iterator[str]:
+        """Yield the completion token by token"""
+        raise NotImplementedError
+
+    def generate_batch(self, prompts: List[str], model: str, **params) -> List[Any]:
+        """Generate a completion (or the Exception raised) for each prompt
+        in one call; only used when supports_batching is set"""
+        raise NotImplementedError(f"{self.name} backend has no batched generation")
+
+    def reconnect(self) -> None:
+        """Drop connections, e.g. in a freshly forked worker process"""
+
+    def configuration_error(self) -> Optional[str]:
+        """Why this backend can't serve requests, if it can't"""
+        return None
+
+
+class HFInferenceBackend(InferenceBackend):
+    """Hugging Face Inference API"""
+
+    name = "hf"
+
+    def __init__(self):
+        self.client = InferenceClient(token=settings.HF_TOKEN)
+
+    def generate(self, prompt: str, model: str, **params) -> str:
+        return self.client.text_generation(prompt, model=model, **params)
+
+    def generate_stream(self, prompt: str, model: str, **params) -> Iterator[str]:
+        return self.client.text_generation(prompt, model=model, stream=True, **params)
+
+    def reconnect(self) -> None:
+        self.client = InferenceClient(token=settings.HF_TOKEN)
+
+    def configuration_error(self) -> Optional[str]:
+        if not settings.HF_TOKEN:
+            return "HF_TOKEN not configured. VLM processing requires valid Hugging Face token."
+        return None
+
+
+def _prompt_field(prompt: str, pattern: str) -> Optional[str]:
+    match = re.search(pattern, prompt, re.MULTILINE | re.DOTALL)
+    return match.group(1).strip() if match else None
+
+
+def _prompt_list(prompt: str, label: str) -> List[str]:
+    value = _prompt_field(prompt, rf"^- {label}: (.*?)$")
+    return [] if not value or value == "None" else value.split(", ")
+
+
+def _render_sections(sections: Dict[str, Any]) -> str:
+    """Format an analysis the way the initial prompt asks the model to"""
+    text = ""
+    for header, value in sections.items():
+        if isinstance(value, list):
+            value = "\n".join(f"{n}. {item}" for n, item in enumerate(value, 1))
+        text += f"{header}:\n{value}\n\n"
+    return text.strip() + "\n"
+
+
+class MockInferenceBackend(InferenceBackend):
+    """The rule-based mock VLM, answering MedGemmaService's prompts"""
+
+    name = "mock"
+
+    def generate(self, prompt: str, model: str, **params) -> str:
+        if "PRESENTING COMPLAINT:" not in prompt:
+            return mock_vlm_service.process_doctor_query({}, {}, self._doctor_query(prompt), [])["findings"]
+
+        age = _prompt_field(prompt, r"^- Age: (\d+) years$")
+        files_count = _prompt_field(prompt, r"^NOTE: (\d+) medical file")
+        output = mock_vlm_service.process_initial_session(
+            patient_context={
+                "age": int(age) if age else "unknown",
+                "sex": _prompt_field(prompt, r"^- Sex: (.*?)$") or "unknown",
+                "chronic_diseases": _prompt_list(prompt, "Chronic Conditions"),
+                "current_medications": _prompt_list(prompt, "Current Medications"),
+            },
+            chief_complaint=_prompt_field(prompt, r"^PRESENTING COMPLAINT:\n(.*?)\n\nCURRENT STATE:") or "",
+            current_state=_prompt_field(prompt, r"^CURRENT STATE:\n(.*?)\n\n") or "",
+            files_count=int(files_count) if files_count else 0
+        )
+        return _render_sections({
+            "FINDINGS": output["findings"],
+            "KEY OBSERVATIONS": output["key_observations"],
+            "TECHNICAL ASSESSMENT": output["technical_assessment"],
+            "SUGGESTED CONSIDERATIONS": output["suggested_considerations"],
+            "DIFFERENTIAL PATTERNS": output["differential_patterns"],
+        })
+
+    def generate_stream(self, prompt: str, model: str, **params) -> Iterator[str]:
+        if "PRESENTING COMPLAINT:" not in prompt:
+            return mock_vlm_service.stream_doctor_query({}, {}, self._doctor_query(prompt), [])
+        return iter(re.findall(r"\S+\s*", self.generate(prompt, model, **params)))
+
+    def _doctor_query(self, prompt: str) -> str:
+        return _prompt_field(prompt, r".*\nDoctor: (.*?)\n\nAI Assistant:") or prompt
+
+
+class LocalInferenceBackend(InferenceBackend):
+    """Offline backend with reproducible answers and latencies
+
+    The answer is a pure function of the prompt and model. A call takes a
+    time to first token drawn from the latency distribution, then one token
+    per 1 / tokens_per_second. A native batch pays the time to first token
+    once and decodes its prompts in lockstep, so it takes as long as its
+    longest answer. With a failure_rate, that fraction of calls raises
+    TimeoutError (a transient error) after the time to first token.
+    """
+
+    name = "local"
+    supports_batching = True
+
+    DISTRIBUTIONS = ("constant", "uniform", "normal", "lognormal")
+
+    FINDINGS = [
+        "Presentation is consistent with a self-limiting process.",
+        "Symptom pattern and duration warrant structured follow-up.",
+        "No red-flag features are evident from the reported history.",
+        "History suggests an inflammatory component.",
+        "Findings are compatible with an early infectious process.",
+        "Chronic conditions may modify the course of the presenting complaint.",
+    ]
+    OBSERVATIONS = [
+        "Symptom onset and progression documented",
+        "Vital signs should be reassessed at review",
+        "Medication history relevant to differential",
+        "Age-appropriate risk factors considered",
+        "No reported systemic involvement",
+        "Pattern of symptoms varies through the day",
+    ]
+    CONSIDERATIONS = [
+        "Basic laboratory panel",
+        "Imaging if symptoms persist",
+        "Review of current medications",
+        "Symptomatic management and safety-netting",
+        "Specialist referral if no improvement",
+        "Repeat examination within one week",
+    ]
+    DIFFERENTIALS = [
+        "Viral infection",
+        "Bacterial infection",
+        "Reactive airway disease",
+        "Gastroesophageal reflux",
+        "Musculoskeletal strain",
+        "Medication side effect",
+    ]
+
+    def __init__(
+        self,
+        distribution: str = "lognormal",
+        latency_mean_seconds: float = 0.5,
+        latency_spread: float = 0.5,
+        tokens_per_second: float = 40.0,
+        failure_rate: float = 0.0,
+        seed: int = 42
+    ):
+        if distribution not in self.DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution {distribution!r}; choose from {', '.join(self.DISTRIBUTIONS)}")
+        if tokens_per_second <= 0:
+            raise ValueError("tokens_per_second must be positive")
+        self.distribution = distribution
+        self.latency_mean_seconds = latency_mean_seconds
+        self.latency_spread = latency_spread
+        self.tokens_per_second = tokens_per_second
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls) -> "LocalInferenceBackend":
+        return cls(
+            distribution=settings.VLM_LOCAL_LATENCY_DISTRIBUTION,
+            latency_mean_seconds=settings.VLM_LOCAL_LATENCY_MEAN_SECONDS,
+            latency_spread=settings.VLM_LOCAL_LATENCY_SPREAD,
+            tokens_per_second=settings.VLM_LOCAL_TOKENS_PER_SECOND,
+            failure_rate=settings.VLM_LOCAL_FAILURE_RATE,
+            seed=settings.VLM_LOCAL_SEED
+        )
+
+    def generate(self, prompt: str, model: str, **params) -> str:
+        tokens = self._answer_tokens(prompt, model, params.get("max_new_tokens"))
+        self._first_token()
+        time.sleep(len(tokens) / self.tokens_per_second)
+        return "".join(tokens)
+
+    def generate_stream(self, prompt: str, model: str, **params) -> Iterator[str]:
+        tokens = self._answer_tokens(prompt, model, params.get("max_new_tokens"))
+        self._first_token()
+        for token in tokens:
+            time.sleep(1 / self.tokens_per_second)
+            yield token
+
+    def generate_batch(self, prompts: List[str], model: str, **params) -> List[Any]:
+        answers = [self._answer_tokens(prompt, model, params.get("max_new_tokens")) for prompt in prompts]
+        self._first_token()
+        time.sleep(max((len(tokens) for tokens in answers), default=0) / self.tokens_per_second)
+        return ["".join(tokens) for tokens in answers]
+
+    def _first_token(self) -> None:
+        """Wait out a sampled time to first token, then maybe fail"""
+        with self._lock:
+            delay = self._sample_latency()
+            failed = self._rng.random() < self.failure_rate
+        time.sleep(delay)
+        if failed:
+            raise TimeoutError("local backend: simulated timeout")
+
+    def _sample_latency(self) -> float:
+        mean, spread = self.latency_mean_seconds, self.latency_spread
+        if self.distribution == "uniform":
+            delay = self._rng.uniform(mean - spread, mean + spread)
+        elif self.distribution == "normal":
+            delay = self._rng.gauss(mean, spread)
+        elif self.distribution == "lognormal":
+            # Parameterized so the distribution's mean is latency_mean_seconds
+            delay = self._rng.lognormvariate(math.log(mean) - spread ** 2 / 2, spread) if mean > 0 else 0.0
+        else:
+            delay = mean
+        return max(delay, 0.0)
+
+    def _answer_tokens(self, prompt: str, model: str, max_new_tokens: Optional[int]) -> List[str]:
+        seed = hashlib.sha256(f"{model}\n{prompt}".encode()).digest()
+        rng = random.Random(seed)
+
+        if "PRESENTING COMPLAINT:" in prompt:
+            complaint = _prompt_field(prompt, r"^PRESENTING COMPLAINT:\n(.*?)\n\nCURRENT STATE:") or "the presenting complaint"
+            text = _render_sections({
+                "FINDINGS": f"Patient presents with {complaint.lower()}. " + " ".join(rng.sample(self.FINDINGS, 2)),
+                "KEY OBSERVATIONS": rng.sample(self.OBSERVATIONS, 3),
+                "TECHNICAL ASSESSMENT": (
+                    f"Assessment based on reported history ({model}, reference {seed.hex()[:12]}). "
+                    + rng.choice(self.FINDINGS)
+                ),
+                "SUGGESTED CONSIDERATIONS": rng.sample(self.CONSIDERATIONS, 3),
+                "DIFFERENTIAL PATTERNS": rng.sample(self.DIFFERENTIALS, 3),
+            })
+        else:
+            text = " ".join(rng.sample(self.FINDINGS, 2)) + " Consider: " + "; ".join(
+                rng.sample(self.CONSIDERATIONS, 3)
+            ).lower() + "."
+
+        tokens = re.findall(r"\S+\s*", text)
+        return tokens[:max_new_tokens] if max_new_tokens else tokens
+
+
+BACKENDS: Dict[str, Callable[[], InferenceBackend]] = {
+    "hf": HFInferenceBackend,
+    "mock": MockInferenceBackend,
+    "local": LocalInferenceBackend.from_settings,
+}
+
+
+def create_backend(name: Optional[str] = None) -> InferenceBackend:
+    """Instantiate the named backend (VLM_BACKEND by default)"""
+    name = name or settings.VLM_BACKEND or ("hf" if settings.HF_TOKEN else "mock")
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown VLM_BACKEND {name!r}; choose from {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
@@ -1,23 +1,73 @@
 """
-MedGemma VLM Service using Hugging Face Inference API
+MedGemma VLM Service, by default on the Hugging Face Inference API
+
+The inference backend (see app/services/inference_backends.py) is chosen by
+VLM_BACKEND.
 """
+import threading
 import time
-from typing import Dict, List, Any, Optional
-from huggingface_hub import InferenceClient
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Any, Optional, Tuple
 from app.core.config import settings
+from app.core.resilience import AllModelsFailed, CircuitOpen, ModelHealth, hedged_call
+from app.services.inference_backends import InferenceBackend, create_backend
+from app.services.response_parser import InitialResponseParser
+from app.services import vlm_cache
 import logging
 
 logger = logging.getLogger(__name__)
 
 
 class MedGemmaService:
-    """Real MedGemma VLM service using Hugging Face Inference API with fallback"""
+    """Real MedGemma VLM service using Hugging Face Inference API with fallback
+    
+    Calls go through a per-model circuit breaker, and a primary call still
+    running at its p95 latency is hedged with the fallback (see
+    app/core/resilience.py).
+    """
+    
+    # Generation parameters of the initial analysis (part of its cache key)
+    INITIAL_GENERATION_PARAMS = {
+        "max_new_tokens": 1000,
+        "temperature": 0.7,
+        "top_p": 0.9,
+        "repetition_penalty": 1.1,
+    }
+    CHAT_GENERATION_PARAMS = {**INITIAL_GENERATION_PARAMS, "max_new_tokens": 500}
     
-    def __init__(self):
+    def __init__(self, backend: Optional[InferenceBackend] = None):
         self.primary_model = settings.MEDGEMMA_MODEL
         self.fallback_model = settings.BIOGPT_MODEL
-        self.client = InferenceClient(token=settings.HF_TOKEN)
-        logger.info(f"Initialized MedGemma service - Primary: {self.primary_model}, Fallback: {self.fallback_model}")
+        self.backend = backend or create_backend()
+        self.health = {
+            model: ModelHealth(
+                model,
+                window=settings.VLM_HEALTH_WINDOW,
+                failure_threshold=settings.VLM_BREAKER_FAILURE_THRESHOLD,
+                cooldown_seconds=settings.VLM_BREAKER_COOLDOWN_SECONDS
+            )
+            for model in [self.primary_model, self.fallback_model]
+        }
+        self._pool: Optional[ThreadPoolExecutor] = None
+        logger.info(
+            f"Initialized MedGemma service ({self.backend.name} backend) - "
+            f"Primary: {self.primary_model}, Fallback: {self.fallback_model}"
+        )
+    
+    @property
+    def supports_batching(self) -> bool:
+        return self.backend.supports_batching
+    
+    def reconnect(self):
+        """Reset the backend's connections, e.g. in a freshly forked worker
+        process that must not reuse its parent's connections"""
+        self.backend.reconnect()
+        # Threads don't survive a fork either
+        self._pool = None
+    
+    def health_snapshot(self) -> List[Dict[str, Any]]:
+        """Rolling latency/error stats and breaker state of each model"""
+        return [health.snapshot() for health in self.health.values()]
     
     def process_initial_session(
         self,
@@ -25,86 +75,272 @@ class MedGemmaService:
         chief_complaint: str,
         current_state: str,
         last_session_summary: Optional[str] = None,
-        files_count: int = 0
+        files_count: int = 0,
+        on_partial: Optional[Callable[[Dict[str, Any]], None]] = None
     ) -> Dict[str, Any]:
-        """Generate VLM initial output for a session using MedGemma with fallback to BioGPT"""
+        """Generate VLM initial output for a session using MedGemma with fallback to BioGPT
+        
+        With ``on_partial`` the answer is streamed, and the callback gets the
+        output parsed so far each time a section is complete. Streamed or
+        not, the primary is hedged with the fallback at its p95 latency, and
+        the analysis fails after VLM_INITIAL_TIMEOUT_SECONDS.
+        """
         
         start_time = time.time()
         
-        # Try primary model first (MedGemma-4B)
+        # Construct medical prompt
+        prompt = self._build_initial_prompt(
+            patient_context,
+            chief_complaint,
+            current_state,
+            last_session_summary,
+            files_count
+        )
+        
+        logger.info(f"Requesting initial analysis from {self.primary_model} (prompt length: {len(prompt)} chars)")
+        
         try:
-            # Construct medical prompt
-            prompt = self._build_initial_prompt(
-                patient_context,
-                chief_complaint,
-                current_state,
-                last_session_summary,
-                files_count
-            )
-            
-            logger.info(f"Trying primary model {self.primary_model} (prompt length: {len(prompt)} chars)")
+            if on_partial is None:
+                model_used, response = self._generate(
+                    prompt,
+                    self.INITIAL_GENERATION_PARAMS,
+                    timeout=settings.VLM_INITIAL_TIMEOUT_SECONDS
+                )
+                parser = self._parse_response(response)
+            else:
+                model_used, parser = self._generate_sections(prompt, on_partial, start_time)
+        except AllModelsFailed as e:
+            # Both models failed - raise so the task retries or marks VLM as failed
+            logger.error(str(e))
+            raise
+        
+        logger.info(f"SUCCESS: Received response from {model_used} model (length: {len(parser.text)} chars)")
+        
+        # Structured output, with defaults for what the model left out
+        parsed_output = self._finish_initial_output(parser, patient_context, chief_complaint)
+        parsed_output["processing_time_seconds"] = int(time.time() - start_time)
+        parsed_output.update(self._model_labels(model_used))
+        
+        return parsed_output
+    
+    def process_initial_batch(
+        self,
+        requests: List[Dict[str, Any]],
+        on_partial: Optional[Callable[[int, Dict[str, Any]], None]] = None
+    ) -> List[Any]:
+        """Generate initial outputs for several sessions in one dispatch
+        
+        Each request holds the keyword arguments of process_initial_session.
+        Returns, in request order, either the output or the Exception that
+        session should fail with. ``on_partial`` gets the request's index
+        and its partial output, for requests that are streamed (only done
+        without native batching).
+        
+        The Inference API takes one prompt per request, so without native
+        batching in the backend the prompts are sent concurrently (each hedged on its own)
+        and the endpoint's continuous batching groups them. With native
+        batching, requests the primary model fails on are retried together
+        on the fallback.
+        """
+        
+        if not self.supports_batching:
+            def process(i: int) -> Any:
+                partial = None
+                if on_partial is not None:
+                    partial = lambda output: on_partial(i, output)
+                try:
+                    return self.process_initial_session(**requests[i], on_partial=partial)
+                except Exception as e:
+                    return e
             
-            # Call Hugging Face Inference API with primary model
-            response = self.client.text_generation(
-                prompt,
-                model=self.primary_model,
-                max_new_tokens=1000,
-                temperature=0.7,
-                top_p=0.9,
-                repetition_penalty=1.1,
+            if len(requests) == 1:
+                return [process(0)]
+            with ThreadPoolExecutor(max_workers=len(requests)) as pool:
+                return list(pool.map(process, range(len(requests))))
+        
+        start_time = time.time()
+        prompts = [
+            self._build_initial_prompt(
+                r["patient_context"],
+                r["chief_complaint"],
+                r["current_state"],
+                r.get("last_session_summary"),
+                r.get("files_count", 0)
             )
+            for r in requests
+        ]
+        results: List[Any] = [None] * len(requests)
+        errors: Dict[int, Dict[str, Exception]] = {i: {} for i in range(len(requests))}
+        pending = list(range(len(requests)))
+        
+        for model, model_used in [(self.primary_model, "primary"), (self.fallback_model, "fallback")]:
+            if not pending:
+                break
+            health = self.health[model]
+            if not health.allow_request():
+                for i in pending:
+                    errors[i][model_used] = CircuitOpen(model)
+                continue
             
-            logger.info(f"SUCCESS: Received response from {self.primary_model} (length: {len(response)} chars)")
-            
-            # Parse the response into structured format
-            parsed_output = self._parse_initial_response(response, patient_context, chief_complaint)
-            
-            processing_time = int(time.time() - start_time)
-            parsed_output["processing_time_seconds"] = processing_time
-            parsed_output["model_version"] = self.primary_model
-            parsed_output["model_used"] = "primary"
-            
-            return parsed_output
-            
-        except Exception as e1:
-            logger.warning(f"Primary model {self.primary_model} failed: {str(e1)}")
-            logger.info(f"Attempting fallback to {self.fallback_model}")
-            
-            # Try fallback model (BioGPT)
+            logger.info(f"Sending batch of {len(pending)} initial analyses to {model}")
+            batch_start = time.monotonic()
             try:
-                prompt = self._build_initial_prompt(
-                    patient_context,
-                    chief_complaint,
-                    current_state,
-                    last_session_summary,
-                    files_count
-                )
-                
-                response = self.client.text_generation(
-                    prompt,
-                    model=self.fallback_model,
-                    max_new_tokens=1000,
-                    temperature=0.7,
-                    top_p=0.9,
-                    repetition_penalty=1.1,
+                responses = self._generate_batch([prompts[i] for i in pending], model)
+            except Exception as e:
+                responses = [e] * len(pending)
+            health.record(
+                time.monotonic() - batch_start,
+                ok=not all(isinstance(response, Exception) for response in responses)
+            )
+            
+            failed = []
+            for i, response in zip(pending, responses):
+                if isinstance(response, Exception):
+                    logger.warning(f"Model {model} failed in batch: {str(response)}")
+                    errors[i][model_used] = response
+                    failed.append(i)
+                    continue
+                parsed_output = self._finish_initial_output(
+                    self._parse_response(response),
+                    requests[i]["patient_context"],
+                    requests[i]["chief_complaint"]
                 )
-                
-                logger.info(f"SUCCESS: Fallback model {self.fallback_model} responded (length: {len(response)} chars)")
-                
-                # Parse the response
-                parsed_output = self._parse_initial_response(response, patient_context, chief_complaint)
-                
-                processing_time = int(time.time() - start_time)
-                parsed_output["processing_time_seconds"] = processing_time
-                parsed_output["model_version"] = f"{self.fallback_model} (fallback)"
-                parsed_output["model_used"] = "fallback"
-                
-                return parsed_output
-                
-            except Exception as e2:
-                logger.error(f"Fallback model {self.fallback_model} also failed: {str(e2)}")
-                # Both models failed - raise exception to mark VLM as failed
-                raise Exception(f"All VLM models failed. Primary: {str(e1)}, Fallback: {str(e2)}")
+                parsed_output["processing_time_seconds"] = int(time.time() - start_time)
+                parsed_output.update(self._model_labels(model_used))
+                results[i] = parsed_output
+            pending = failed
+        
+        for i in pending:
+            results[i] = AllModelsFailed(errors[i])
+        
+        return results
+    
+    def _generate_batch(self, prompts: List[str], model: str) -> List[Any]:
+        """Generate a completion (or the Exception raised) for each prompt
+        in one call; only used when supports_batching is set"""
+        return self.backend.generate_batch(prompts, model, **self.INITIAL_GENERATION_PARAMS)
+    
+    def _hedge_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=settings.VLM_HEDGE_MAX_THREADS)
+        return self._pool
+    
+    def _generate(
+        self,
+        prompt: str,
+        params: Dict[str, Any],
+        timeout: Optional[float] = None
+    ) -> Tuple[str, str]:
+        """Generate with the primary model, hedged by and falling back to the
+        fallback model; returns ("primary" or "fallback", response)"""
+        
+        def call(model: str):
+            return lambda: self.backend.generate(prompt, model, **params)
+        
+        model_used, response = hedged_call(
+            self._hedge_pool(),
+            [
+                ("primary", self.health[self.primary_model], call(self.primary_model)),
+                ("fallback", self.health[self.fallback_model], call(self.fallback_model)),
+            ],
+            self._hedge_after,
+            timeout
+        )
+        if model_used != "primary":
+            logger.warning(f"Answer came from fallback model {self.fallback_model}")
+        return model_used, response
+    
+    def _generate_sections(
+        self,
+        prompt: str,
+        on_partial: Callable[[Dict[str, Any]], None],
+        start_time: float
+    ) -> Tuple[str, InitialResponseParser]:
+        """Stream an initial analysis through the parser, hedged like _generate
+        
+        Each completed section publishes the output so far, from whichever
+        model completes a section first. If the other model's stream wins,
+        its final output replaces those sections. Nothing is published once
+        the winner is known: the losing stream is left to finish in the
+        background, as in hedged_call.
+        """
+        publish_lock = threading.Lock()
+        publishing = {"model_used": None, "done": False}
+        
+        def call(model: str, model_used: str):
+            def stream() -> InitialResponseParser:
+                parser = InitialResponseParser()
+                for token in self.backend.generate_stream(prompt, model, **self.INITIAL_GENERATION_PARAMS):
+                    if parser.feed(token):
+                        with publish_lock:
+                            if publishing["done"] or publishing["model_used"] not in (None, model_used):
+                                continue
+                            publishing["model_used"] = model_used
+                            self._publish_partial(on_partial, parser, model_used, start_time)
+                parser.close()
+                return parser
+            return stream
+        
+        try:
+            return hedged_call(
+                self._hedge_pool(),
+                [
+                    ("primary", self.health[self.primary_model], call(self.primary_model, "primary")),
+                    ("fallback", self.health[self.fallback_model], call(self.fallback_model, "fallback")),
+                ],
+                self._hedge_after,
+                settings.VLM_INITIAL_TIMEOUT_SECONDS
+            )
+        finally:
+            with publish_lock:
+                publishing["done"] = True
+    
+    def _publish_partial(
+        self,
+        on_partial: Callable[[Dict[str, Any]], None],
+        parser: InitialResponseParser,
+        model_used: str,
+        start_time: float
+    ):
+        partial_output = parser.sections()
+        partial_output["processing_time_seconds"] = int(time.time() - start_time)
+        partial_output.update(self._model_labels(model_used))
+        try:
+            on_partial(partial_output)
+        except Exception as e:
+            # Partial output is best effort; the final output is still stored
+            logger.warning(f"Could not publish partial initial output: {str(e)}")
+    
+    def _hedge_after(self, health: ModelHealth) -> Optional[float]:
+        """Seconds to wait on a model before hedging with the next one"""
+        if not settings.VLM_HEDGING_ENABLED:
+            return None
+        p95 = health.latency_percentile(95)
+        return p95 if p95 is not None else settings.VLM_HEDGE_DEFAULT_AFTER_SECONDS
+    
+    def _model_labels(self, model_used: str) -> Dict[str, str]:
+        if model_used == "primary":
+            return {"model_version": self.primary_model, "model_used": "primary"}
+        return {"model_version": f"{self.fallback_model} (fallback)", "model_used": "fallback"}
+    
+    
+    def initial_cache_key(
+        self,
+        patient_context: Dict[str, Any],
+        chief_complaint: str,
+        current_state: str,
+        last_session_summary: Optional[str] = None,
+        files_count: int = 0
+    ) -> str:
+        """Cache key of the primary-model request process_initial_session sends"""
+        prompt = self._build_initial_prompt(
+            patient_context,
+            chief_complaint,
+            current_state,
+            last_session_summary,
+            files_count
+        )
+        return vlm_cache.cache_key(prompt, self.primary_model, self.INITIAL_GENERATION_PARAMS)
     
     def process_doctor_query(
         self,
@@ -128,26 +364,8 @@ class MedGemmaService:
             
             logger.info(f"Sending doctor query to MedGemma")
             
-            # Call Hugging Face Inference API (try primary first)
-            try:
-                response = self.client.text_generation(
-                    prompt,
-                    model=self.primary_model,
-                    max_new_tokens=500,
-                    temperature=0.7,
-                    top_p=0.9,
-                    repetition_penalty=1.1,
-                )
-            except Exception as e_primary:
-                logger.warning(f"Primary model failed in chat: {str(e_primary)}, trying fallback")
-                response = self.client.text_generation(
-                    prompt,
-                    model=self.fallback_model,
-                    max_new_tokens=500,
-                    temperature=0.7,
-                    top_p=0.9,
-                    repetition_penalty=1.1,
-                )
+            # Call the inference backend (primary, hedged by fallback)
+            _, response = self._generate(prompt, self.CHAT_GENERATION_PARAMS)
             
             processing_time = int(time.time() - start_time)
             
@@ -161,6 +379,62 @@ class MedGemmaService:
             # Don't return fake response - raise exception
             raise Exception(f"VLM chat failed: {str(e)}")
     
+    def stream_doctor_query(
+        self,
+        patient_context: Dict[str, Any],
+        session_context: Dict[str, Any],
+        doctor_query: str,
+        previous_chat: List[Dict[str, Any]]
+    ) -> Iterator[str]:
+        """Stream the VLM response to doctor's question token by token
+        
+        Models whose circuit is open are skipped, and each stream's duration
+        and outcome go into its model's health. Falls back to BioGPT only if
+        MedGemma fails before producing a token; a failure mid-stream is
+        raised, as the doctor has already seen part of the answer.
+        """
+        
+        prompt = self._build_chat_prompt(
+            patient_context,
+            session_context,
+            doctor_query,
+            previous_chat
+        )
+        
+        errors: Dict[str, Exception] = {}
+        for model, model_used in [(self.primary_model, "primary"), (self.fallback_model, "fallback")]:
+            health = self.health[model]
+            if not health.allow_request():
+                errors[model_used] = CircuitOpen(model)
+                continue
+            
+            streamed = False
+            call_start = time.monotonic()
+            try:
+                logger.info(f"Streaming doctor query from {model}")
+                for token in self.backend.generate_stream(
+                    prompt,
+                    model,
+                    **self.CHAT_GENERATION_PARAMS
+                ):
+                    streamed = True
+                    yield token
+            except GeneratorExit:
+                # The client went away; the model was answering
+                health.record(time.monotonic() - call_start, ok=True)
+                raise
+            except Exception as e:
+                health.record(time.monotonic() - call_start, ok=False)
+                if streamed:
+                    raise Exception(f"VLM chat failed: {str(e)}")
+                logger.warning(f"Model {model} failed in chat stream: {str(e)}")
+                errors[model_used] = e
+                continue
+            health.record(time.monotonic() - call_start, ok=True)
+            return
+        
+        raise Exception(f"VLM chat failed: {str(AllModelsFailed(errors))}")
+    
     def _build_initial_prompt(
         self,
         patient_context: Dict,
@@ -251,61 +525,26 @@ CHIEF COMPLAINT: {session_context.get('chief_complaint', 'N/A')}
         
         return prompt
     
-    def _parse_initial_response(
+    def _parse_response(self, response: str) -> InitialResponseParser:
+        """Parse a complete MedGemma response in one go"""
+        parser = InitialResponseParser()
+        parser.feed(response)
+        parser.close()
+        return parser
+    
+    def _finish_initial_output(
         self,
-        response: str,
+        parser: InitialResponseParser,
         patient_context: Dict,
         chief_complaint: str
     ) -> Dict[str, Any]:
-        """Parse MedGemma response into structured format"""
-        
-        # Initialize default structure
-        parsed = {
-            "findings": "",
-            "key_observations": [],
-            "technical_assessment": "",
-            "suggested_considerations": [],
-            "differential_patterns": []
-        }
+        """Structured output of a fully parsed MedGemma response"""
         
-        # Try to extract sections
-        sections = {
-            "FINDINGS:": "findings",
-            "KEY OBSERVATIONS:": "key_observations",
-            "TECHNICAL ASSESSMENT:": "technical_assessment",
-            "SUGGESTED CONSIDERATIONS:": "suggested_considerations",
-            "DIFFERENTIAL PATTERNS:": "differential_patterns"
-        }
-        
-        current_section = None
-        lines = response.split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            
-            # Check if this line is a section header
-            for header, section_name in sections.items():
-                if header in line.upper():
-                    current_section = section_name
-                    break
-            else:
-                # Add content to current section
-                if current_section and line:
-                    if current_section in ["key_observations", "suggested_considerations", "differential_patterns"]:
-                        # Remove numbering and bullet points
-                        cleaned = line.lstrip('0123456789.-•* ')
-                        if cleaned:
-                            parsed[current_section].append(cleaned)
-                    else:
-                        # Append to string fields
-                        if parsed[current_section]:
-                            parsed[current_section] += " " + line
-                        else:
-                            parsed[current_section] = line
+        parsed = parser.sections()
         
         # Fallback: if parsing failed, use the whole response as findings
         if not parsed["findings"]:
-            parsed["findings"] = response.strip()
+            parsed["findings"] = parser.text.strip()
         
         # Ensure we have at least some observations
         if not parsed["key_observations"]:
@@ -2,8 +2,19 @@ from datetime import datetime, date
 from typing import List, Optional, Dict
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from fastapi import HTTPException, status
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from app.models.patient import PatientCreate, PatientUpdate, Patient, PatientSearchResult
+from app.models.session import SessionSummary
 from app.core.database import get_next_sequence
+from app.services import search_service
+from app.utils.projection import model_projection
+from app.utils.pagination import fetch_page
+
+SESSION_SUMMARY_PROJECTION = model_projection(SessionSummary)
+
+# Newest first; session_id breaks ties so keyset pagination is stable
+PORTFOLIO_SORT = [("session_date", -1), ("session_id", -1)]
 
 
 def calculate_age(birth_date: date) -> int:
@@ -19,14 +30,6 @@ async def create_patient(
     created_by: str
 ) -> Patient:
     """Create a new patient"""
-    # Check if national_id already exists
-    existing_patient = await db.patients.find_one({"national_id": patient_create.national_id})
-    if existing_patient:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Patient with this national ID already exists"
-        )
-    
     # Generate patient_id
     sequence = await get_next_sequence("patient_id")
     patient_id = f"P-{sequence:05d}"
@@ -44,7 +47,8 @@ async def create_patient(
         "last_updated_by": created_by,
         "total_sessions": 0,
         "last_session_id": None,
-        "last_session_date": None
+        "last_session_date": None,
+        "search": search_service.build_search_keys(patient_dict)
     })
     
     # Convert date objects to ISO format for MongoDB
@@ -64,14 +68,21 @@ async def create_patient(
     if patient_dict.get("smoking_details") and patient_dict["smoking_details"].get("quit_date"):
         patient_dict["smoking_details"]["quit_date"] = patient_dict["smoking_details"]["quit_date"].isoformat()
     
-    await db.patients.insert_one(patient_dict)
+    # The unique national_id index rejects duplicates, no need to check first
+    try:
+        await db.patients.insert_one(patient_dict)
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Patient with this national ID already exists"
+        )
     
-    return await get_patient(db, patient_id)
+    return Patient(**patient_dict)
 
 
 async def get_patient(db: AsyncIOMotorDatabase, patient_id: str) -> Patient:
     """Get patient by patient_id"""
-    patient_doc = await db.patients.find_one({"patient_id": patient_id})
+    patient_doc = await db.patients.find_one({"patient_id": patient_id}, {"_id": 0, "search": 0})
     
     if not patient_doc:
         raise HTTPException(
@@ -79,60 +90,80 @@ async def get_patient(db: AsyncIOMotorDatabase, patient_id: str) -> Patient:
             detail="Patient not found"
         )
     
-    # Remove MongoDB _id
-    patient_doc.pop("_id", None)
-    
     return Patient(**patient_doc)
 
 
-async def update_patient(
+async def get_patient_fields(
     db: AsyncIOMotorDatabase,
     patient_id: str,
-    patient_update: PatientUpdate,
-    updated_by: str
-) -> Patient:
-    """Update patient information"""
-    # Check if patient exists
-    existing_patient = await db.patients.find_one({"patient_id": patient_id})
-    if not existing_patient:
+    projection: Dict[str, int]
+) -> Dict:
+    """Get only the projected fields of a patient (sparse fieldsets)"""
+    patient_doc = await db.patients.find_one({"patient_id": patient_id}, projection)
+    
+    if not patient_doc:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Patient not found"
         )
     
+    return patient_doc
+
+
+async def update_patient(
+    db: AsyncIOMotorDatabase,
+    patient_id: str,
+    patient_update: PatientUpdate,
+    updated_by: str
+) -> Patient:
+    """Update patient information"""
     # Prepare update data
     update_data = patient_update.model_dump(exclude_unset=True)
     
-    if update_data:
-        # Update age if date_of_birth changed
-        if "date_of_birth" in update_data:
-            update_data["age"] = calculate_age(update_data["date_of_birth"])
-            update_data["date_of_birth"] = update_data["date_of_birth"].isoformat()
-        
-        # Convert nested dates
-        if "current_medications" in update_data:
-            for med in update_data["current_medications"]:
-                if med.get("start_date"):
-                    med["start_date"] = med["start_date"].isoformat()
-        
-        if "surgical_history" in update_data:
-            for surgery in update_data["surgical_history"]:
-                if surgery.get("date"):
-                    surgery["date"] = surgery["date"].isoformat()
-        
-        if "smoking_details" in update_data and update_data["smoking_details"]:
-            if update_data["smoking_details"].get("quit_date"):
-                update_data["smoking_details"]["quit_date"] = update_data["smoking_details"]["quit_date"].isoformat()
-        
-        update_data["last_updated"] = datetime.utcnow()
-        update_data["last_updated_by"] = updated_by
-        
-        await db.patients.update_one(
-            {"patient_id": patient_id},
-            {"$set": update_data}
+    if not update_data:
+        return await get_patient(db, patient_id)
+    
+    # Update age if date_of_birth changed
+    if "date_of_birth" in update_data:
+        update_data["age"] = calculate_age(update_data["date_of_birth"])
+        update_data["date_of_birth"] = update_data["date_of_birth"].isoformat()
+    
+    # Convert nested dates
+    if "current_medications" in update_data:
+        for med in update_data["current_medications"]:
+            if med.get("start_date"):
+                med["start_date"] = med["start_date"].isoformat()
+    
+    if "surgical_history" in update_data:
+        for surgery in update_data["surgical_history"]:
+            if surgery.get("date"):
+                surgery["date"] = surgery["date"].isoformat()
+    
+    if "smoking_details" in update_data and update_data["smoking_details"]:
+        if update_data["smoking_details"].get("quit_date"):
+            update_data["smoking_details"]["quit_date"] = update_data["smoking_details"]["quit_date"].isoformat()
+    
+    # Keep the normalized search keys in step with name/phone changes
+    update_data.update(search_service.search_key_updates(update_data))
+    
+    update_data["last_updated"] = datetime.utcnow()
+    update_data["last_updated_by"] = updated_by
+    
+    # Update and read back in one round trip; no match means no such patient
+    patient_doc = await db.patients.find_one_and_update(
+        {"patient_id": patient_id},
+        {"$set": update_data},
+        projection={"_id": 0, "search": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    
+    if not patient_doc:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Patient not found"
         )
     
-    return await get_patient(db, patient_id)
+    return Patient(**patient_doc)
 
 
 async def search_patients(
@@ -141,54 +172,37 @@ async def search_patients(
     limit: int = 20
 ) -> List[PatientSearchResult]:
     """Search patients by name, phone, or national_id"""
-    # Create search filter
-    search_filter = {
-        "$or": [
-            {"name": {"$regex": query, "$options": "i"}},
-            {"phone_primary": {"$regex": query}},
-            {"phone_secondary": {"$regex": query}},
-            {"national_id": {"$regex": query}},
-        ]
-    }
-    
-    cursor = db.patients.find(search_filter).limit(limit)
-    patients = await cursor.to_list(length=limit)
-    
-    results = []
-    for patient in patients:
-        results.append(PatientSearchResult(
-            patient_id=patient["patient_id"],
-            name=patient["name"],
-            age=patient["age"],
-            phone_primary=patient["phone_primary"],
-            national_id=patient["national_id"],
-            last_session_date=patient.get("last_session_date"),
-            total_sessions=patient.get("total_sessions", 0)
-        ))
-    
-    return results
+    return await search_service.search_patients(db, query, limit)
 
 
 async def get_patient_portfolio(
     db: AsyncIOMotorDatabase,
-    patient_id: str
+    patient_id: str,
+    session_projection: Optional[Dict[str, int]] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None
 ) -> Dict:
-    """Get patient with all their sessions"""
-    patient = await get_patient(db, patient_id)
-    
-    # Get all sessions for this patient
-    sessions_cursor = db.sessions.find(
-        {"patient_id": patient_id}
-    ).sort("session_date", -1)
+    """Get patient with one page of their sessions, newest first
     
-    sessions = await sessions_cursor.to_list(length=None)
+    Sessions are listed with their summary fields unless session_projection
+    asks for others. Pass next_cursor back as cursor to get the next page;
+    total_count is only filled in on the first page.
+    """
+    patient = await get_patient(db, patient_id)
     
-    # Remove MongoDB _id from sessions
-    for session in sessions:
-        session.pop("_id", None)
+    page = await fetch_page(
+        db.sessions,
+        {"patient_id": patient_id},
+        session_projection or SESSION_SUMMARY_PROJECTION,
+        PORTFOLIO_SORT,
+        limit,
+        cursor
+    )
     
     return {
         "patient": patient.model_dump(),
-        "sessions": sessions
+        "sessions": page.items,
+        "next_cursor": page.next_cursor,
+        "total_count": page.total_count
     }
 
@@ -0,0 +1,97 @@
+"""
+Incremental parser for the sectioned initial VLM analysis
+
+The initial prompt asks the model for FINDINGS, KEY OBSERVATIONS, TECHNICAL
+ASSESSMENT, SUGGESTED CONSIDERATIONS and DIFFERENTIAL PATTERNS sections.
+InitialResponseParser consumes the response while it is being generated, in
+chunks of any size (single tokens included), and looks at each line once:
+one regex search tells whether it is a header, anything else is added to the
+current section. ``feed`` reports when a section is complete (the next
+header has arrived), so what has been parsed so far can be published before
+the rest of the answer exists.
+"""
+import re
+from typing import Any, Dict, List, Optional
+
+SECTION_HEADERS = {
+    "FINDINGS:": "findings",
+    "KEY OBSERVATIONS:": "key_observations",
+    "TECHNICAL ASSESSMENT:": "technical_assessment",
+    "SUGGESTED CONSIDERATIONS:": "suggested_considerations",
+    "DIFFERENTIAL PATTERNS:": "differential_patterns",
+}
+LIST_SECTIONS = {"key_observations", "suggested_considerations", "differential_patterns"}
+
+_HEADER_PATTERN = re.compile("|".join(re.escape(header) for header in SECTION_HEADERS))
+# Numbering and bullet points stripped from list items
+_LIST_MARKERS = "0123456789.-•* "
+
+
+class InitialResponseParser:
+    def __init__(self):
+        self.completed: List[str] = []  # Sections followed by another header (or the end)
+        self._lines: Dict[str, List[str]] = {name: [] for name in SECTION_HEADERS.values()}
+        self._current: Optional[str] = None
+        self._chunks: List[str] = []
+        self._pending: List[str] = []  # Pieces of the line still being generated
+        self._closed = False
+
+    def feed(self, chunk: str) -> bool:
+        """Consume the next piece of the response; returns whether it
+        completed a section"""
+        self._chunks.append(chunk)
+        if "\n" not in chunk:
+            self._pending.append(chunk)
+            return False
+
+        lines = chunk.split("\n")
+        if self._pending:
+            lines[0] = "".join(self._pending) + lines[0]
+        # The text after the last newline waits for the rest of its line
+        self._pending = [lines.pop()]
+
+        completed = len(self.completed)
+        for line in lines:
+            self._consume(line)
+        return len(self.completed) > completed
+
+    def close(self) -> bool:
+        """Consume the last line once the response has ended; returns
+        whether that completed a section"""
+        if self._closed:
+            return False
+        self._closed = True
+        completed = len(self.completed)
+        self._consume("".join(self._pending))
+        self._pending = []
+        self._complete_current()
+        return len(self.completed) > completed
+
+    @property
+    def text(self) -> str:
+        """The response consumed so far"""
+        return "".join(self._chunks)
+
+    def sections(self) -> Dict[str, Any]:
+        """Sections parsed so far (a line still being generated excluded)"""
+        return {
+            name: list(lines) if name in LIST_SECTIONS else " ".join(lines)
+            for name, lines in self._lines.items()
+        }
+
+    def _consume(self, line: str) -> None:
+        line = line.strip()
+        match = _HEADER_PATTERN.search(line.upper())
+        if match:
+            self._complete_current()
+            self._current = SECTION_HEADERS[match.group()]
+        elif self._current and line:
+            if self._current in LIST_SECTIONS:
+                line = line.lstrip(_LIST_MARKERS)
+                if not line:
+                    return
+            self._lines[self._current].append(line)
+
+    def _complete_current(self) -> None:
+        if self._current is not None and self._current not in self.completed:
+            self.completed.append(self._current)
@@ -0,0 +1,171 @@
+"""
+Indexed patient search
+
+Normalized search keys are written under ``search`` on each patient at
+create/update time, one key per source field so an update never needs the
+rest of the document:
+
+    search.name_tokens      lower-cased, accent-stripped name tokens
+    search.phone_primary    digits of phone_primary
+    search.phone_secondary  digits of phone_secondary
+    search.national_id      upper-cased alphanumerics of national_id
+
+Queries are anchored prefix lookups on those indexed keys, run as three
+tiers and merged by relevance: exact patient/national ID, then phone or
+national-ID prefix, then name tokens.
+"""
+import asyncio
+import re
+import unicodedata
+from typing import Dict, List, Optional
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from app.models.patient import PatientSearchResult
+from app.utils.projection import model_projection
+
+# Source field -> search key derived from it
+SEARCH_KEY_SOURCES = {
+    "name": "search.name_tokens",
+    "phone_primary": "search.phone_primary",
+    "phone_secondary": "search.phone_secondary",
+    "national_id": "search.national_id",
+}
+
+# Prefix lookups on fewer digits than this would match most of the collection
+MIN_DIGIT_PREFIX = 3
+
+SEARCH_RESULT_PROJECTION = {**model_projection(PatientSearchResult), "search.name_tokens": 1}
+
+
+def name_tokens(name: Optional[str]) -> List[str]:
+    """Split a name into lower-cased tokens with accents removed"""
+    if not name:
+        return []
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return re.findall(r"\w+", stripped.casefold())
+
+
+def digits(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return None
+    return re.sub(r"\D", "", value) or None
+
+
+def normalize_national_id(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return None
+    return re.sub(r"[^0-9A-Za-z]", "", value).upper() or None
+
+
+def _search_key(source_field: str, value) -> object:
+    if source_field == "name":
+        return name_tokens(value)
+    if source_field == "national_id":
+        return normalize_national_id(value)
+    return digits(value)
+
+
+def search_key_updates(fields: Dict) -> Dict:
+    """$set entries for the search keys derived from the given patient fields"""
+    return {
+        key: _search_key(source, fields[source])
+        for source, key in SEARCH_KEY_SOURCES.items()
+        if source in fields
+    }
+
+
+def build_search_keys(patient: Dict) -> Dict:
+    """The full ``search`` subdocument for a new patient document"""
+    return {
+        key.split(".", 1)[1]: value
+        for key, value in search_key_updates(
+            {source: patient.get(source) for source in SEARCH_KEY_SOURCES}
+        ).items()
+    }
+
+
+def _prefix(value: str) -> Dict:
+    return {"$regex": f"^{re.escape(value)}"}
+
+
+async def _find(db: AsyncIOMotorDatabase, search_filter: Optional[Dict], limit: int) -> List[Dict]:
+    if search_filter is None:
+        return []
+    cursor = db.patients.find(search_filter, SEARCH_RESULT_PROJECTION).limit(limit)
+    return await cursor.to_list(length=limit)
+
+
+async def search_patients(
+    db: AsyncIOMotorDatabase,
+    query: str,
+    limit: int = 20
+) -> List[PatientSearchResult]:
+    """Search patients by patient ID, national ID, phone or name, best matches first"""
+    query = query.strip()
+    query_digits = digits(query)
+    query_nid = normalize_national_id(query)
+    query_tokens = name_tokens(query)
+
+    exact_filter = {"$or": [{"patient_id": query.upper()}]}
+    if query_nid:
+        exact_filter["$or"].append({"search.national_id": query_nid})
+
+    prefix_filter = None
+    if query_digits and len(query_digits) >= MIN_DIGIT_PREFIX:
+        prefix_filter = {"$or": [
+            {"search.phone_primary": _prefix(query_digits)},
+            {"search.phone_secondary": _prefix(query_digits)},
+            {"search.national_id": _prefix(query_nid)},
+        ]}
+
+    name_filter = None
+    if query_tokens and not query_digits:
+        name_filter = {"$and": [{"search.name_tokens": _prefix(token)} for token in query_tokens]}
+
+    exact, by_prefix, by_name = await asyncio.gather(
+        _find(db, exact_filter, limit),
+        _find(db, prefix_filter, limit),
+        _find(db, name_filter, limit),
+    )
+
+    # Within the name tier, whole-token matches rank above prefix-only matches
+    by_name.sort(
+        key=lambda p: -len(set(query_tokens) & set(p.get("search", {}).get("name_tokens", [])))
+    )
+
+    results = []
+    seen = set()
+    for patient in [*exact, *by_prefix, *by_name]:
+        if patient["patient_id"] in seen:
+            continue
+        seen.add(patient["patient_id"])
+        patient.pop("search", None)
+        results.append(PatientSearchResult(**{"total_sessions": 0, **patient}))
+        if len(results) == limit:
+            break
+
+    return results
+
+
+async def backfill_search_keys(db: AsyncIOMotorDatabase, batch_size: int = 1000) -> int:
+    """Write search keys on patients created before they existed; returns the count"""
+    updated = 0
+    batch = []
+    projection = {source: 1 for source in SEARCH_KEY_SOURCES}
+    # Any key missing, not just the whole subdocument: update_patient sets only
+    # the keys of the fields it changes, so an edited legacy patient has some
+    missing_keys = {"$or": [{key: {"$exists": False}} for key in SEARCH_KEY_SOURCES.values()]}
+    async for patient in db.patients.find(missing_keys, projection):
+        batch.append(UpdateOne(
+            {"_id": patient["_id"]},
+            {"$set": {"search": build_search_keys(patient)}}
+        ))
+        if len(batch) == batch_size:
+            await db.patients.bulk_write(batch, ordered=False)
+            updated += len(batch)
+            batch = []
+    if batch:
+        await db.patients.bulk_write(batch, ordered=False)
+        updated += len(batch)
+    return updated
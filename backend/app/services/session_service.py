@@ -2,6 +2,7 @@ from datetime import datetime
 from typing import List, Optional, Dict
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from fastapi import HTTPException, status, UploadFile
+from pymongo import ReturnDocument
 from app.models.session import (
     SessionCreate,
     SessionUpdate,
@@ -10,13 +11,35 @@ from app.models.session import (
     SessionStatus,
     UploadedFile,
     FileType,
+    FileUrlKind,
     StatusHistoryEntry,
     EditHistoryEntry
 )
+from app.core.cache import TTLCache
+from app.core.config import settings
 from app.core.database import get_next_sequence
+from app.core.security import sign_path, verify_signed_path
 from app.services.storage_service import storage_service
+from app.services import blob_store, history_service, image_derivatives, session_state, stats_service
+from app.utils import deep_zoom
+from app.utils.projection import model_projection
+from app.utils.pagination import Page, fetch_page
+from app.utils.uploads import StreamedUpload
+from urllib.parse import urlencode
+import asyncio
+import time
 import uuid
 
+# Fields needed to build a SessionSummary (queue and portfolio listings)
+SUMMARY_PROJECTION = model_projection(SessionSummary)
+
+# Oldest first; session_id breaks ties so keyset pagination is stable
+QUEUE_SORT = [("session_date", 1), ("session_id", 1)]
+
+# Tile pyramids by (session_id, file_id): a viewer asks for dozens of tiles
+# of a file per zoom, and pyramids never change once recorded
+_pyramid_cache = TTLCache(ttl_seconds=300, max_entries=4096)
+
 
 async def create_session(
     db: AsyncIOMotorDatabase,
@@ -25,8 +48,13 @@ async def create_session(
     created_by_name: str
 ) -> Session:
     """Create a new session"""
+    # Look up patient and doctor concurrently
+    patient, doctor = await asyncio.gather(
+        db.patients.find_one({"patient_id": session_create.patient_id}, {"name": 1}),
+        db.users.find_one({"user_id": session_create.assigned_doctor_id}, {"role": 1, "full_name": 1})
+    )
+    
     # Verify patient exists
-    patient = await db.patients.find_one({"patient_id": session_create.patient_id})
     if not patient:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -34,7 +62,6 @@ async def create_session(
         )
     
     # Verify doctor exists
-    doctor = await db.users.find_one({"user_id": session_create.assigned_doctor_id})
     if not doctor or doctor["role"] != "doctor":
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -65,7 +92,7 @@ async def create_session(
         "vlm_initial_completed_at": None,
         "vlm_initial_input": None,
         "vlm_initial_output": None,
-        "vlm_chat_history": [],
+        "vlm_chat_count": 0,
         "doctor_id": None,
         "doctor_name": None,
         "doctor_opened_at": None,
@@ -78,19 +105,24 @@ async def create_session(
         "last_updated": now,
         "last_updated_by": created_by,
         "edit_history": [],
-        "status_history": [
-            {"status": SessionStatus.draft, "timestamp": now, "user_id": created_by}
-        ]
+        "status_event_count": 1
     })
     
     await db.sessions.insert_one(session_dict)
+    await asyncio.gather(
+        history_service.record_status_event(
+            db, session_id, 1,
+            {"status": SessionStatus.draft.value, "timestamp": now, "user_id": created_by}
+        ),
+        stats_service.record_session_change(db, None, session_dict)
+    )
     
-    return await get_session(db, session_id)
+    return Session(**session_dict)
 
 
 async def get_session(db: AsyncIOMotorDatabase, session_id: str) -> Session:
     """Get session by session_id"""
-    session_doc = await db.sessions.find_one({"session_id": session_id})
+    session_doc = await db.sessions.find_one({"session_id": session_id}, {"_id": 0})
     
     if not session_doc:
         raise HTTPException(
@@ -98,10 +130,26 @@ async def get_session(db: AsyncIOMotorDatabase, session_id: str) -> Session:
             detail="Session not found"
         )
     
-    session_doc.pop("_id", None)
     return Session(**session_doc)
 
 
+async def get_session_fields(
+    db: AsyncIOMotorDatabase,
+    session_id: str,
+    projection: Dict[str, int]
+) -> Dict:
+    """Get only the projected fields of a session (sparse fieldsets)"""
+    session_doc = await db.sessions.find_one({"session_id": session_id}, projection)
+    
+    if not session_doc:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Session not found"
+        )
+    
+    return session_doc
+
+
 async def update_session(
     db: AsyncIOMotorDatabase,
     session_id: str,
@@ -109,38 +157,55 @@ async def update_session(
     updated_by: str
 ) -> Session:
     """Update session (only in draft status)"""
-    session_doc = await db.sessions.find_one({"session_id": session_id})
+    update_data = session_update.model_dump(exclude_unset=True)
     
-    if not session_doc:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Session not found"
+    if not update_data:
+        session = await get_session(db, session_id)
+        if session.session_status != SessionStatus.draft:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Can only update sessions in draft status"
+            )
+        return session
+    
+    # If doctor changed, update doctor name
+    if "assigned_doctor_id" in update_data:
+        doctor = await db.users.find_one(
+            {"user_id": update_data["assigned_doctor_id"]},
+            {"full_name": 1}
         )
+        if doctor:
+            update_data["assigned_doctor_name"] = doctor["full_name"]
+    
+    update_data["last_updated"] = datetime.utcnow()
+    update_data["last_updated_by"] = updated_by
+    
+    # The draft check is part of the write filter; the pre-update document
+    # comes back in the same round trip (needed for the counter deltas)
+    before = await db.sessions.find_one_and_update(
+        {"session_id": session_id, "session_status": SessionStatus.draft},
+        {"$set": update_data},
+        projection={"_id": 0},
+        return_document=ReturnDocument.BEFORE
+    )
     
-    if session_doc["session_status"] != SessionStatus.draft:
+    if not before:
+        if not await db.sessions.find_one({"session_id": session_id}, {"_id": 1}):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Session not found"
+            )
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
+            status_code=status.HTTP_409_CONFLICT,
             detail="Can only update sessions in draft status"
         )
     
-    update_data = session_update.model_dump(exclude_unset=True)
+    session_doc = {**before, **update_data}
     
-    if update_data:
-        # If doctor changed, update doctor name
-        if "assigned_doctor_id" in update_data:
-            doctor = await db.users.find_one({"user_id": update_data["assigned_doctor_id"]})
-            if doctor:
-                update_data["assigned_doctor_name"] = doctor["full_name"]
-        
-        update_data["last_updated"] = datetime.utcnow()
-        update_data["last_updated_by"] = updated_by
-        
-        await db.sessions.update_one(
-            {"session_id": session_id},
-            {"$set": update_data}
-        )
+    if "assigned_doctor_id" in update_data:
+        await stats_service.record_session_change(db, before, session_doc)
     
-    return await get_session(db, session_id)
+    return Session(**session_doc)
 
 
 async def upload_session_file(
@@ -151,7 +216,7 @@ async def upload_session_file(
     uploaded_by: str
 ) -> UploadedFile:
     """Upload file for a session"""
-    session_doc = await db.sessions.find_one({"session_id": session_id})
+    session_doc = await db.sessions.find_one({"session_id": session_id}, {"session_status": 1})
     
     if not session_doc:
         raise HTTPException(
@@ -168,15 +233,13 @@ async def upload_session_file(
     # Generate file_id
     file_id = f"F-{uuid.uuid4().hex[:8]}"
     
-    # Read file content
-    file_content = await file.read()
-    file_size_mb = len(file_content) / (1024 * 1024)
-    
-    # Upload to storage
-    destination_path = f"sessions/{session_id}/{file_id}_{file.filename}"
-    file_path = await storage_service.upload_file(
-        file_content,
-        destination_path,
+    # Stored once per content: a file already stored (in any session) is
+    # referenced instead of written again
+    upload = StreamedUpload(file)
+    file_path, _ = await blob_store.store(
+        db,
+        upload,
+        f"{file_id}_{file.filename}",
         file.content_type or "application/octet-stream"
     )
     
@@ -187,11 +250,15 @@ async def upload_session_file(
         file_type=file_type,
         file_path=file_path,
         mime_type=file.content_type or "application/octet-stream",
-        file_size_mb=round(file_size_mb, 2),
+        file_size_mb=round(upload.size_mb, 2),
+        sha256=upload.sha256,
         upload_timestamp=datetime.utcnow(),
         uploaded_by=uploaded_by,
         can_delete=True
     )
+    render = image_derivatives.wants_derivatives(file_type, uploaded_file.mime_type)
+    if render:
+        uploaded_file.derivatives_status = "pending"
     
     # Add to session
     await db.sessions.update_one(
@@ -199,6 +266,16 @@ async def upload_session_file(
         {"$push": {"uploaded_files": uploaded_file.model_dump()}}
     )
     
+    if render:
+        # Previews and thumbnails are rendered in the background
+        from app.tasks.derivative_tasks import generate_file_derivatives
+        try:
+            generate_file_derivatives.apply_async(args=(session_id, file_id))
+        except Exception as e:
+            print(f"Error queueing derivatives of {file_id}: {str(e)}")
+            await image_derivatives.mark_failed(db, session_id, file_id)
+            uploaded_file.derivatives_status = "failed"
+    
     return uploaded_file
 
 
@@ -208,7 +285,10 @@ async def delete_session_file(
     file_id: str
 ) -> bool:
     """Delete file from session (only in draft status)"""
-    session_doc = await db.sessions.find_one({"session_id": session_id})
+    session_doc = await db.sessions.find_one(
+        {"session_id": session_id},
+        {"session_status": 1, "uploaded_files": {"$elemMatch": {"file_id": file_id}}}
+    )
     
     if not session_doc:
         raise HTTPException(
@@ -235,8 +315,9 @@ async def delete_session_file(
             detail="File not found"
         )
     
-    # Delete from storage
-    await storage_service.delete_file(file_to_delete["file_path"])
+    # Drop its reference to the stored copy (deleted with the last one)
+    await blob_store.release(db, file_to_delete)
+    _pyramid_cache.delete((session_id, file_id))
     
     # Remove from session
     await db.sessions.update_one(
@@ -253,7 +334,10 @@ async def get_file_signed_url(
     file_id: str
 ) -> str:
     """Get signed URL for file access"""
-    session_doc = await db.sessions.find_one({"session_id": session_id})
+    session_doc = await db.sessions.find_one(
+        {"session_id": session_id},
+        {"uploaded_files": {"$elemMatch": {"file_id": file_id}}}
+    )
     
     if not session_doc:
         raise HTTPException(
@@ -272,13 +356,21 @@ async def get_file_signed_url(
     )
 
 
-async def submit_session(
+async def get_file_pyramid(
     db: AsyncIOMotorDatabase,
     session_id: str,
-    submitted_by: str
-) -> Session:
-    """Submit session for VLM processing"""
-    session_doc = await db.sessions.find_one({"session_id": session_id})
+    file_id: str
+) -> Dict:
+    """Get the deep zoom tile pyramid of a file (TilePyramid fields)"""
+    key = (session_id, file_id)
+    pyramid = _pyramid_cache.get(key)
+    if pyramid is not None:
+        return pyramid
+    
+    session_doc = await db.sessions.find_one(
+        {"session_id": session_id},
+        {"uploaded_files": {"$elemMatch": {"file_id": file_id}}}
+    )
     
     if not session_doc:
         raise HTTPException(
@@ -286,38 +378,235 @@ async def submit_session(
             detail="Session not found"
         )
     
-    if session_doc["session_status"] != SessionStatus.draft:
+    files = session_doc.get("uploaded_files", [])
+    if not files:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Session already submitted"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File not found"
         )
     
-    now = datetime.utcnow()
+    pyramid = files[0].get("pyramid")
+    if not pyramid:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File has no tile pyramid"
+        )
     
-    # Update status to submitted
-    await db.sessions.update_one(
-        {"session_id": session_id},
-        {
-            "$set": {
-                "session_status": SessionStatus.submitted,
-                "last_updated": now,
-                "last_updated_by": submitted_by
-            },
-            "$push": {
-                "status_history": {
-                    "status": SessionStatus.submitted,
-                    "timestamp": now,
-                    "user_id": submitted_by
-                }
-            }
-        }
+    _pyramid_cache.set(key, pyramid)
+    return pyramid
+
+
+async def get_file_tile(
+    db: AsyncIOMotorDatabase,
+    session_id: str,
+    file_id: str,
+    level: int,
+    col: int,
+    row: int
+) -> bytes:
+    """Get one tile of a file's deep zoom pyramid"""
+    pyramid = await get_file_pyramid(db, session_id, file_id)
+    if not deep_zoom.has_tile(pyramid, level, col, row):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Tile not found"
+        )
+    
+    tile_path = deep_zoom.tile_path(pyramid["file_path"], level, col, row, pyramid["format"])
+    try:
+        return await storage_service.read_file(tile_path)
+    except FileNotFoundError:
+        # The file was deleted since its pyramid was cached
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Tile not found"
+        )
+
+
+def _tiles_path(session_id: str, file_id: str) -> str:
+    """API path of a file's deep zoom descriptor, without the .dzi"""
+    return f"sessions/{session_id}/files/{file_id}/tiles"
+
+
+def signed_tiles_url(session_id: str, file_id: str) -> str:
+    """Signed URL of a file's deep zoom descriptor
+    
+    The signature covers the whole pyramid: deep zoom viewers repeat the
+    descriptor URL's query on every tile they fetch, so tiles loaded as
+    plain <img> requests need no login header. The expiry is rounded to
+    a window, like a cached storage URL, so the URL (and the tiles browsers
+    keep under it) stays the same until it is within the refresh margin
+    of expiring.
+    """
+    path = _tiles_path(session_id, file_id)
+    margin = settings.SIGNED_URL_REFRESH_MARGIN_SECONDS
+    window = max(settings.SIGNED_URL_EXPIRATION_MINUTES * 60 - margin, 1)
+    expires = (int(time.time()) // window + 1) * window + margin
+    query = urlencode({"expires": expires, "signature": sign_path(path, expires)})
+    return f"{settings.PUBLIC_BASE_URL}{settings.API_V1_PREFIX}/{path}.dzi?{query}"
+
+
+def verify_tiles_url(session_id: str, file_id: str, expires: int, signature: str) -> bool:
+    """Whether the query of a descriptor or tile request is a valid signed_tiles_url's"""
+    return verify_signed_path(_tiles_path(session_id, file_id), expires, signature)
+
+
+def _signed_paths(file: Dict, kind: Optional[FileUrlKind]) -> List[str]:
+    if kind is None:
+        return [file["file_path"]]
+    if kind == FileUrlKind.tiles:
+        return [file["pyramid"]["file_path"]] if file.get("pyramid") else []
+    return [d["file_path"] for d in file.get("derivatives", []) if d["kind"] == kind.value]
+
+
+async def get_file_signed_urls(
+    db: AsyncIOMotorDatabase,
+    session_ids: List[str],
+    kind: Optional[FileUrlKind] = None
+) -> Dict[str, Dict[str, str]]:
+    """Get signed URLs for every file of the given sessions
+    
+    One query for all sessions, fetching only file ids and paths, and the
+    files signed concurrently. Returns {session_id: {file_id: url}}; the
+    ids must be distinct. With ``kind``, the URLs are of that derivative
+    (preview or thumbnail) or of the deep zoom descriptor (tiles), for the
+    files that have one.
+    """
+    fields = {
+        None: ["uploaded_files.file_path"],
+        FileUrlKind.tiles: ["uploaded_files.pyramid.file_path"],
+    }.get(kind, ["uploaded_files.derivatives"])
+    cursor = db.sessions.find(
+        {"session_id": {"$in": session_ids}},
+        {"_id": 0, "session_id": 1, "uploaded_files.file_id": 1, **{field: 1 for field in fields}}
     )
+    session_docs = await cursor.to_list(length=None)
     
-    # Trigger VLM processing task
-    from app.tasks.vlm_tasks import process_session_vlm
-    process_session_vlm.delay(session_id)
+    if len(session_docs) != len(session_ids):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Session not found"
+        )
     
-    return await get_session(db, session_id)
+    files = [
+        (doc["session_id"], f["file_id"], path)
+        for doc in session_docs
+        for f in doc.get("uploaded_files", [])
+        for path in _signed_paths(f, kind)
+    ]
+    if kind == FileUrlKind.tiles:
+        # Tiles are served by the API, which checks its own signature
+        urls = [signed_tiles_url(session_id, file_id) for session_id, file_id, _ in files]
+    else:
+        urls = await asyncio.gather(*[storage_service.get_signed_url(path) for _, _, path in files])
+    
+    signed: Dict[str, Dict[str, str]] = {session_id: {} for session_id in session_ids}
+    for (session_id, file_id, _), url in zip(files, urls):
+        signed[session_id][file_id] = url
+    return signed
+
+
+async def submit_session(
+    db: AsyncIOMotorDatabase,
+    session_id: str,
+    submitted_by: str,
+    bypass_cache: bool = False
+) -> Session:
+    """Submit session for VLM processing
+    
+    bypass_cache forces a fresh model call even if an identical request
+    has a cached analysis.
+    """
+    # Only one concurrent submit can win the draft -> submitted transition,
+    # so the VLM task is queued exactly once
+    session_doc = await session_state.transition(
+        db,
+        session_id,
+        SessionStatus.submitted,
+        submitted_by,
+        fields={"last_updated_by": submitted_by},
+        projection={"_id": 0},
+        conflict_detail="Session already submitted"
+    )
+    
+    # Trigger VLM processing task, ahead of routine work if urgent
+    from app.tasks.vlm_tasks import initial_priority, process_session_vlm
+    process_session_vlm.apply_async(
+        args=(session_id,),
+        kwargs={"bypass_cache": bypass_cache},
+        priority=initial_priority(session_doc)
+    )
+    
+    return Session(**session_doc)
+
+
+async def requeue_failed_sessions(
+    db: AsyncIOMotorDatabase,
+    requeued_by: str,
+    limit: int = 100,
+    max_in_flight: int = 4,
+    poll_seconds: float = 5.0,
+    max_wait_seconds: Optional[float] = None
+) -> Dict:
+    """Move vlm_failed sessions back to submitted and re-queue their VLM task
+    
+    Oldest first. At most max_in_flight of this sweep's sessions wait for or
+    are in VLM processing at any time, so a large backlog doesn't flood the
+    queue ahead of newly submitted sessions. If no slot frees up within
+    max_wait_seconds (default VLM_REQUEUE_MAX_WAIT_SECONDS), the sweep stops
+    there and reports stalled, rather than hold its worker indefinitely.
+    """
+    if max_wait_seconds is None:
+        max_wait_seconds = settings.VLM_REQUEUE_MAX_WAIT_SECONDS
+    from app.tasks.vlm_tasks import initial_priority, process_session_vlm
+    
+    sweep_id = uuid.uuid4().hex
+    candidates = await db.sessions.find(
+        {"session_status": SessionStatus.vlm_failed.value},
+        {"session_id": 1, "session_type": 1, "parent_session_id": 1, "urgent": 1}
+    ).sort([("session_date", 1), ("session_id", 1)]).limit(limit).to_list(length=None)
+    
+    in_flight_filter = {
+        "session_status": {"$in": [SessionStatus.submitted.value, SessionStatus.vlm_processing.value]},
+        "vlm_sweep_id": sweep_id
+    }
+    requeued = 0
+    stalled = False
+    loop = asyncio.get_running_loop()
+    for candidate in candidates:
+        wait_until = loop.time() + max_wait_seconds
+        while await db.sessions.count_documents(in_flight_filter) >= max_in_flight:
+            if loop.time() >= wait_until:
+                stalled = True
+                break
+            await asyncio.sleep(poll_seconds)
+        if stalled:
+            break
+        
+        try:
+            await session_state.transition(
+                db,
+                candidate["session_id"],
+                SessionStatus.submitted,
+                requeued_by,
+                fields={
+                    "vlm_initial_status": "pending",
+                    "vlm_error_message": None,
+                    "vlm_sweep_id": sweep_id,
+                    "last_updated_by": requeued_by
+                }
+            )
+        except HTTPException:
+            # Opened by a doctor (or deleted) since the sweep started
+            continue
+        
+        process_session_vlm.apply_async(
+            args=(candidate["session_id"],),
+            priority=initial_priority(candidate)
+        )
+        requeued += 1
+    
+    return {"sweep_id": sweep_id, "candidates": len(candidates), "requeued": requeued, "stalled": stalled}
 
 
 async def delete_session(
@@ -326,42 +615,45 @@ async def delete_session(
     deleted_by: str
 ) -> Dict:
     """Delete a session (only if not completed)"""
-    session_doc = await db.sessions.find_one({"session_id": session_id})
+    # Deleted in one step so the counters are adjusted from the document that
+    # was actually removed, not a copy read before a concurrent transition
+    session_doc = await db.sessions.find_one_and_delete(
+        {"session_id": session_id, "session_status": {"$ne": SessionStatus.completed.value}},
+        projection={
+            **stats_service.COUNTER_FIELDS,
+            "uploaded_files.file_id": 1,
+            "uploaded_files.file_path": 1,
+            "uploaded_files.sha256": 1,
+            "uploaded_files.derivatives.file_path": 1,
+            "uploaded_files.pyramid": 1
+        }
+    )
     
     if not session_doc:
+        if await db.sessions.count_documents({"session_id": session_id}, limit=1):
+            # Only allow deletion if session is not completed
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Cannot delete a completed session"
+            )
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Session not found"
         )
     
-    # Only allow deletion if session is not completed
-    if session_doc["session_status"] == SessionStatus.completed:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Cannot delete a completed session"
-        )
+    await stats_service.record_session_change(db, session_doc, None)
+    await history_service.delete_history(db, session_id)
     
-    # Delete all uploaded files from storage
+    # Release all uploaded files (stored copies go with their last reference)
     for file in session_doc.get("uploaded_files", []):
         try:
-            # Delete from cloud storage if file_path exists
             if file.get("file_path"):
-                # TODO: Implement actual file deletion from GCS
-                # storage_service.delete_file(file["file_path"])
-                pass
+                await blob_store.release(db, file)
+                _pyramid_cache.delete((session_id, file["file_id"]))
         except Exception as e:
             # Log error but continue with deletion
             print(f"Error deleting file {file.get('file_id')}: {str(e)}")
     
-    # Delete the session document
-    result = await db.sessions.delete_one({"session_id": session_id})
-    
-    if result.deleted_count == 0:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to delete session"
-        )
-    
     return {
         "success": True,
         "message": f"Session {session_id} deleted successfully",
@@ -369,21 +661,12 @@ async def delete_session(
     }
 
 
-async def get_sessions_for_doctor_queue(
-    db: AsyncIOMotorDatabase,
-    doctor_id: Optional[str] = None,
-    status_filter: Optional[List[SessionStatus]] = None,
-    current_doctor_id: Optional[str] = None
-) -> List[SessionSummary]:
-    """Get sessions for doctor queue
-    
-    Args:
-        db: Database connection
-        doctor_id: Optional doctor ID to filter by assigned doctor (for awaiting_doctor/vlm_failed)
-        status_filter: Optional list of statuses to filter by. 
-                      Defaults to [awaiting_doctor, vlm_failed]
-        current_doctor_id: Current doctor's ID to include their doctor_reviewing sessions
-    """
+def _doctor_queue_filter(
+    doctor_id: Optional[str],
+    status_filter: Optional[List[SessionStatus]],
+    current_doctor_id: Optional[str]
+) -> Dict:
+    """Build the doctor queue filter (see get_sessions_for_doctor_queue)"""
     if status_filter is None:
         status_filter = [SessionStatus.awaiting_doctor, SessionStatus.vlm_failed]
     
@@ -401,22 +684,45 @@ async def get_sessions_for_doctor_queue(
         query_reviewing["doctor_id"] = current_doctor_id
     
     # Combine both queries using $or
-    combined_query = {"$or": [query_pending, query_reviewing]}
-    
-    cursor = db.sessions.find(combined_query).sort("session_date", 1)
-    sessions = await cursor.to_list(length=None)
-    
-    results = []
-    for session in sessions:
-        results.append(SessionSummary(
-            session_id=session["session_id"],
-            patient_id=session["patient_id"],
-            patient_name=session["patient_name"],
-            session_date=session["session_date"],
-            session_type=session["session_type"],
-            session_status=session["session_status"],
-            chief_complaint=session["chief_complaint"],
-            assigned_doctor_name=session["assigned_doctor_name"]
-        ))
-    
-    return results
+    return {"$or": [query_pending, query_reviewing]}
+
+
+async def get_sessions_for_doctor_queue(
+    db: AsyncIOMotorDatabase,
+    doctor_id: Optional[str] = None,
+    status_filter: Optional[List[SessionStatus]] = None,
+    current_doctor_id: Optional[str] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None
+) -> Page:
+    """Get one page of sessions for doctor queue
+    
+    Args:
+        db: Database connection
+        doctor_id: Optional doctor ID to filter by assigned doctor (for awaiting_doctor/vlm_failed)
+        status_filter: Optional list of statuses to filter by. 
+                      Defaults to [awaiting_doctor, vlm_failed]
+        current_doctor_id: Current doctor's ID to include their doctor_reviewing sessions
+        limit: Maximum number of sessions in the page
+        cursor: Continuation token from the previous page's next_cursor
+    """
+    page = await get_doctor_queue_fields(
+        db, SUMMARY_PROJECTION, doctor_id, status_filter, current_doctor_id, limit, cursor
+    )
+    page.items = [SessionSummary(**session) for session in page.items]
+    return page
+
+
+async def get_doctor_queue_fields(
+    db: AsyncIOMotorDatabase,
+    projection: Dict[str, int],
+    doctor_id: Optional[str] = None,
+    status_filter: Optional[List[SessionStatus]] = None,
+    current_doctor_id: Optional[str] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None
+) -> Page:
+    """Get one page of the doctor queue with only the projected fields (sparse fieldsets)"""
+    combined_query = _doctor_queue_filter(doctor_id, status_filter, current_doctor_id)
+    
+    return await fetch_page(db.sessions, combined_query, projection, QUEUE_SORT, limit, cursor)
@@ -0,0 +1,120 @@
+"""
+Session state machine
+
+Every session status change goes through `transition`, which applies it as
+one conditional find_one_and_update: the filter only matches while the
+session is in a status the transition table allows leaving for the target,
+and the same write bumps status_event_count, which numbers the status event
+then stored by history_service. Two doctors opening the same session, a
+double submit or a late VLM result can't both win; the loser gets a 409
+carrying the session's current status.
+"""
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from fastapi import HTTPException, status
+from pymongo import ReturnDocument
+from app.models.session import SessionStatus
+from app.services import history_service, stats_service
+
+# Status -> statuses it may move to
+TRANSITIONS: Dict[SessionStatus, Set[SessionStatus]] = {
+    SessionStatus.draft: {SessionStatus.submitted},
+    SessionStatus.submitted: {SessionStatus.vlm_processing, SessionStatus.vlm_failed},
+    SessionStatus.vlm_processing: {SessionStatus.awaiting_doctor, SessionStatus.vlm_failed},
+    SessionStatus.awaiting_doctor: {SessionStatus.doctor_reviewing},
+    SessionStatus.vlm_failed: {SessionStatus.doctor_reviewing, SessionStatus.submitted},
+    SessionStatus.doctor_reviewing: {SessionStatus.completed, SessionStatus.pending_tests},
+    SessionStatus.completed: set(),
+    SessionStatus.pending_tests: set(),
+}
+
+
+def _with_counter_fields(projection: Optional[Dict]) -> Dict:
+    """Widen an inclusion projection to the fields the counters and history need"""
+    if projection and not any(value for field, value in projection.items() if field != "_id"):
+        # Exclusion projection (e.g. {"_id": 0}); the counter fields are kept
+        return projection
+    return {**stats_service.COUNTER_FIELDS, "status_event_count": 1, **(projection or {})}
+
+
+def allowed_sources(target: SessionStatus) -> List[str]:
+    """Statuses a session may be in to move to `target`"""
+    return [source.value for source, targets in TRANSITIONS.items() if target in targets]
+
+
+class TransitionConflict(HTTPException):
+    """The session exists but is not in a status that allows the transition"""
+
+    def __init__(self, current: Dict, target: SessionStatus, detail: Optional[str] = None):
+        self.current = current
+        self.target = target
+        super().__init__(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=detail or (
+                f"Session is {SessionStatus(current['session_status']).value}, "
+                f"cannot move to {target.value}"
+            )
+        )
+
+
+async def transition(
+    db: AsyncIOMotorDatabase,
+    session_id: str,
+    target: SessionStatus,
+    user_id: str,
+    fields: Optional[Dict] = None,
+    conditions: Optional[Dict] = None,
+    projection: Optional[Dict] = None,
+    conflict_detail: Optional[str] = None
+) -> Dict:
+    """Move a session to `target` in a single conditional write
+
+    `fields` are $set alongside the new status and `conditions` further
+    restrict which sessions match (e.g. the reviewing doctor). Returns the
+    session as it is after the write, limited to `projection` (pass
+    {"_id": 0} for the whole document) plus the counter fields.
+
+    Raises 404 if the session doesn't exist and TransitionConflict (409) if
+    it isn't in an allowed source status.
+    """
+    now = datetime.utcnow()
+    history_entry = {"status": target.value, "timestamp": now, "user_id": user_id}
+    update_fields = {"last_updated": now, **(fields or {}), "session_status": target.value}
+
+    before = await db.sessions.find_one_and_update(
+        {
+            "session_id": session_id,
+            "session_status": {"$in": allowed_sources(target)},
+            **(conditions or {})
+        },
+        {
+            "$set": update_fields,
+            "$inc": {"status_event_count": 1}
+        },
+        projection=_with_counter_fields(projection),
+        return_document=ReturnDocument.BEFORE
+    )
+
+    if not before:
+        current = await db.sessions.find_one(
+            {"session_id": session_id},
+            {"_id": 0, "session_status": 1, "doctor_id": 1}
+        )
+        if not current:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Session not found"
+            )
+        raise TransitionConflict(current, target, conflict_detail)
+
+    seq = before.get("status_event_count", 0) + 1
+    after = {**before, **update_fields, "status_event_count": seq}
+
+    await asyncio.gather(
+        history_service.record_status_event(db, session_id, seq, history_entry),
+        stats_service.record_session_change(db, before, after)
+    )
+
+    return after
@@ -0,0 +1,136 @@
+"""
+Materialized session counters for the dashboard
+
+Every session insert, status transition, reassignment and deletion applies
+$inc deltas to small documents in the ``session_counters`` collection, so
+dashboard stats are a handful of _id lookups no matter how many sessions
+exist. Counter keys:
+
+    status:{status}                          sessions per status
+    assigned:{doctor_id}:status:{status}     per assigned doctor and status
+    assigned:{doctor_id}:total               all sessions ever assigned
+    reviewer:{doctor_id}:status:{status}     per reviewing doctor and status
+    created:{YYYY-MM-DD}:{user_id}           sessions created per day and user
+    closed:{YYYY-MM-DD}                      sessions closed per day
+    closed:{YYYY-MM-DD}:reviewer:{doctor_id} sessions closed per day and doctor
+
+Existing data can be (re)counted with scripts/rebuild_session_counters.py.
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from app.models.session import SessionStatus
+
+# Fields a session document must carry for its counter deltas to be computed
+COUNTER_FIELDS = {
+    "session_status": 1,
+    "assigned_doctor_id": 1,
+    "doctor_id": 1,
+    "created_by": 1,
+    "created_at": 1,
+    "session_closed_at": 1,
+}
+
+CLOSED_STATUSES = {SessionStatus.completed.value, SessionStatus.pending_tests.value}
+
+
+def _day(value: datetime) -> str:
+    return value.strftime("%Y-%m-%d")
+
+
+def _status(doc: Dict) -> str:
+    return SessionStatus(doc["session_status"]).value
+
+
+def _counter_keys(doc: Dict) -> List[str]:
+    """Counters a session contributes to, apart from per-day closures"""
+    status = _status(doc)
+    keys = [f"status:{status}"]
+    if doc.get("assigned_doctor_id"):
+        keys.append(f"assigned:{doc['assigned_doctor_id']}:status:{status}")
+        keys.append(f"assigned:{doc['assigned_doctor_id']}:total")
+    if doc.get("doctor_id"):
+        keys.append(f"reviewer:{doc['doctor_id']}:status:{status}")
+    if doc.get("created_at") and doc.get("created_by"):
+        keys.append(f"created:{_day(doc['created_at'])}:{doc['created_by']}")
+    return keys
+
+
+def _closed_keys(doc: Dict) -> List[str]:
+    """Per-day closure counters of a closed session"""
+    day = _day(doc.get("session_closed_at") or datetime.utcnow())
+    keys = [f"closed:{day}"]
+    if doc.get("doctor_id"):
+        keys.append(f"closed:{day}:reviewer:{doc['doctor_id']}")
+    return keys
+
+
+def session_deltas(before: Optional[Dict], after: Optional[Dict]) -> Dict[str, int]:
+    """Counter deltas for a session going from `before` to `after`
+
+    Pass before=None for an insert and after=None for a deletion.
+    """
+    deltas = defaultdict(int)
+    for doc, sign in ((before, -1), (after, 1)):
+        if doc:
+            for key in _counter_keys(doc):
+                deltas[key] += sign
+
+    # Closures are counted once, on the day the session was closed, and
+    # taken back when a closed session is deleted
+    closed_before = before is not None and _status(before) in CLOSED_STATUSES
+    if after is not None and _status(after) in CLOSED_STATUSES and not closed_before:
+        for key in _closed_keys(after):
+            deltas[key] += 1
+    elif after is None and closed_before:
+        for key in _closed_keys(before):
+            deltas[key] -= 1
+
+    return {key: delta for key, delta in deltas.items() if delta}
+
+
+async def apply_deltas(db: AsyncIOMotorDatabase, deltas: Dict[str, int]) -> None:
+    """Apply counter deltas in a single unordered bulk write"""
+    if not deltas:
+        return
+    await db.session_counters.bulk_write(
+        [
+            UpdateOne({"_id": key}, {"$inc": {"count": delta}}, upsert=True)
+            for key, delta in deltas.items()
+        ],
+        ordered=False
+    )
+
+
+async def record_session_change(
+    db: AsyncIOMotorDatabase,
+    before: Optional[Dict],
+    after: Optional[Dict]
+) -> None:
+    """Update the counters for a session insert, change or deletion"""
+    await apply_deltas(db, session_deltas(before, after))
+
+
+async def get_counts(db: AsyncIOMotorDatabase, keys: Iterable[str]) -> Dict[str, int]:
+    """Read several counters in one round trip (missing counters are 0)"""
+    keys = list(keys)
+    counts = {key: 0 for key in keys}
+    async for doc in db.session_counters.find({"_id": {"$in": keys}}):
+        counts[doc["_id"]] = doc["count"]
+    return counts
+
+
+async def rebuild_session_counters(db: AsyncIOMotorDatabase) -> int:
+    """Recount every session from scratch; returns the number of sessions seen"""
+    totals = defaultdict(int)
+    sessions_seen = 0
+    async for session in db.sessions.find({}, COUNTER_FIELDS):
+        sessions_seen += 1
+        for key, delta in session_deltas(None, session).items():
+            totals[key] += delta
+
+    await db.session_counters.delete_many({})
+    await apply_deltas(db, dict(totals))
+    return sessions_seen
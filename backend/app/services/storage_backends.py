@@ -0,0 +1,227 @@
+"""
+File storage backends behind StorageService
+
+STORAGE_BACKEND selects one:
+
+  gcs     Google Cloud Storage. The client library blocks on every round
+          trip, so each call runs on the bounded storage thread pool and
+          the event loop never waits on GCS; the client's HTTP session keeps
+          a pooled connection per pool thread for reuse.
+  local   files under LOCAL_STORAGE_DIR, downloaded from GET
+          /api/v1/storage/... with HMAC-signed, expiring URLs; for
+          development and offline benchmarks
+  auto    gcs if GOOGLE_APPLICATION_CREDENTIALS points at a file, else local
+
+Stored files are addressed by URIs of the backend's scheme
+(gs://bucket/path, local://path), which is what UploadedFile.file_path holds.
+"""
+import os
+import time
+import uuid
+from datetime import timedelta
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, Optional
+from urllib.parse import quote, urlencode
+from google.api_core.exceptions import NotFound
+from google.cloud import storage
+from requests.adapters import HTTPAdapter
+from app.core.config import settings
+from app.core.executor import storage_executor
+from app.core.security import sign_path, verify_signed_path
+
+MB = 1024 * 1024
+
+
+class StorageBackend:
+    """Interface of a file storage backend"""
+
+    scheme = "base"
+
+    async def upload_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        destination_path: str,
+        content_type: str
+    ) -> str:
+        """Store the chunks as they arrive; returns the file's URI
+
+        If ``chunks`` raises, nothing is stored under destination_path.
+        """
+        raise NotImplementedError
+
+    def download_stream(self, file_path: str) -> AsyncIterator[bytes]:
+        """Read a stored file in chunks; FileNotFoundError if there is none"""
+        raise NotImplementedError
+
+    async def get_signed_url(self, file_path: str, expiration_minutes: int = 30) -> str:
+        raise NotImplementedError
+
+    async def delete(self, file_path: str) -> bool:
+        raise NotImplementedError
+
+    def owns(self, file_path: str) -> bool:
+        return file_path.startswith(f"{self.scheme}://")
+
+    def storage_path(self, file_path: str) -> str:
+        """Path of a stored file's URI within the backend (as uploaded to)"""
+        return file_path[len(f"{self.scheme}://"):]
+
+
+class GCSStorageBackend(StorageBackend):
+    scheme = "gs"
+
+    def __init__(self):
+        self.bucket_name = settings.GCS_BUCKET_NAME
+        self.client = storage.Client()
+        # Room for a kept-alive connection per storage thread
+        self.client._http.mount("https://", HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=settings.STORAGE_MAX_CONCURRENCY
+        ))
+        self.bucket = self.client.bucket(self.bucket_name)
+
+    def storage_path(self, file_path: str) -> str:
+        return file_path.replace(f"gs://{self.bucket_name}/", "")
+
+    def _blob(self, file_path: str) -> storage.Blob:
+        return self.bucket.blob(self.storage_path(file_path))
+
+    async def upload_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        destination_path: str,
+        content_type: str
+    ) -> str:
+        # Resumable upload, GCS_UPLOAD_CHUNK_SIZE_MB per request; it is
+        # only finalized by close(), so an aborted stream creates no object
+        writer = self.bucket.blob(destination_path).open(
+            "wb",
+            chunk_size=settings.GCS_UPLOAD_CHUNK_SIZE_MB * MB,
+            content_type=content_type
+        )
+        async for chunk in chunks:
+            await storage_executor.run(writer.write, chunk)
+        await storage_executor.run(writer.close)
+
+        return f"gs://{self.bucket_name}/{destination_path}"
+
+    async def download_stream(self, file_path: str) -> AsyncIterator[bytes]:
+        reader = self._blob(file_path).open("rb", chunk_size=settings.GCS_UPLOAD_CHUNK_SIZE_MB * MB)
+        try:
+            while True:
+                chunk = await storage_executor.run(reader.read, settings.UPLOAD_CHUNK_SIZE_MB * MB)
+                if not chunk:
+                    return
+                yield chunk
+        except NotFound as e:
+            raise FileNotFoundError(file_path) from e
+        finally:
+            reader.close()
+
+    async def get_signed_url(self, file_path: str, expiration_minutes: int = 30) -> str:
+        return await storage_executor.run(
+            self._blob(file_path).generate_signed_url,
+            version="v4",
+            expiration=timedelta(minutes=expiration_minutes),
+            method="GET"
+        )
+
+    async def delete(self, file_path: str) -> bool:
+        try:
+            await storage_executor.run(self._blob(file_path).delete)
+            return True
+        except Exception:
+            return False
+
+
+class LocalStorageBackend(StorageBackend):
+    """Files on the local filesystem
+
+    Files are written to a temporary name and renamed into place once
+    complete. Signed URLs point at this API's storage route and carry an
+    expiry time and an HMAC of path and expiry keyed with SECRET_KEY.
+    """
+
+    scheme = "local"
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = Path(root or settings.LOCAL_STORAGE_DIR).resolve()
+
+    def local_path(self, file_path: str) -> Path:
+        """Filesystem path of a local:// URI (or a bare storage path)"""
+        relative = self.storage_path(file_path) if self.owns(file_path) else file_path
+        path = (self.root / relative).resolve()
+        if not path.is_relative_to(self.root):
+            raise ValueError(f"Path escapes the storage root: {file_path}")
+        return path
+
+    async def upload_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        destination_path: str,
+        content_type: str
+    ) -> str:
+        path = self.local_path(destination_path)
+        partial = path.with_name(f".{path.name}.{uuid.uuid4().hex}.part")
+        await storage_executor.run(path.parent.mkdir, parents=True, exist_ok=True)
+
+        f = await storage_executor.run(open, partial, "wb")
+        try:
+            async for chunk in chunks:
+                await storage_executor.run(f.write, chunk)
+            await storage_executor.run(f.close)
+            await storage_executor.run(os.replace, partial, path)
+        except BaseException:
+            f.close()
+            partial.unlink(missing_ok=True)
+            raise
+
+        return f"local://{destination_path}"
+
+    async def download_stream(self, file_path: str) -> AsyncIterator[bytes]:
+        f = await storage_executor.run(open, self.local_path(file_path), "rb")
+        try:
+            while True:
+                chunk = await storage_executor.run(f.read, settings.UPLOAD_CHUNK_SIZE_MB * MB)
+                if not chunk:
+                    return
+                yield chunk
+        finally:
+            f.close()
+
+    async def get_signed_url(self, file_path: str, expiration_minutes: int = 30) -> str:
+        relative = str(self.local_path(file_path).relative_to(self.root))
+        expires = int(time.time()) + expiration_minutes * 60
+        query = urlencode({"expires": expires, "signature": self.signature(relative, expires)})
+        return f"{settings.PUBLIC_BASE_URL}{settings.API_V1_PREFIX}/storage/{quote(relative)}?{query}"
+
+    def signature(self, relative_path: str, expires: int) -> str:
+        return sign_path(relative_path, expires)
+
+    def verify(self, relative_path: str, expires: int, signature: str) -> bool:
+        """Whether a signed URL's parameters are authentic and unexpired"""
+        return verify_signed_path(relative_path, expires, signature)
+
+    async def delete(self, file_path: str) -> bool:
+        try:
+            await storage_executor.run(self.local_path(file_path).unlink)
+            return True
+        except (OSError, ValueError):
+            return False
+
+
+BACKENDS: Dict[str, Callable[[], StorageBackend]] = {
+    "gcs": GCSStorageBackend,
+    "local": LocalStorageBackend,
+}
+
+
+def create_backend(name: Optional[str] = None) -> StorageBackend:
+    """Instantiate the named backend (STORAGE_BACKEND by default)"""
+    name = name or settings.STORAGE_BACKEND
+    if name == "auto":
+        credentials = settings.GOOGLE_APPLICATION_CREDENTIALS
+        name = "gcs" if credentials and os.path.exists(credentials) else "local"
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown STORAGE_BACKEND {name!r}; choose from auto, {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
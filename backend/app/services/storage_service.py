@@ -1,20 +1,31 @@
-from google.cloud import storage
-from datetime import timedelta
-from typing import Optional
+from typing import AsyncIterator, Optional
+from app.core.cache import TTLCache
 from app.core.config import settings
-import os
+from app.services.storage_backends import StorageBackend, create_backend
+
+
+async def _single_chunk(content: bytes) -> AsyncIterator[bytes]:
+    yield content
 
 
 class StorageService:
-    def __init__(self):
-        self.bucket_name = settings.GCS_BUCKET_NAME
-        self.client = None
-        self.bucket = None
-        
-        # Initialize GCS client if credentials are provided
-        if settings.GOOGLE_APPLICATION_CREDENTIALS and os.path.exists(settings.GOOGLE_APPLICATION_CREDENTIALS):
-            self.client = storage.Client()
-            self.bucket = self.client.bucket(self.bucket_name)
+    """Session file storage on the backend chosen by STORAGE_BACKEND
+    
+    Files uploaded before storage backends existed, without GCS credentials,
+    have mock:// paths and were never stored; those paths are handed back
+    as their own URL and deleting them succeeds, as before.
+    
+    Signed URLs are cached per file and handed out again until they are
+    within SIGNED_URL_REFRESH_MARGIN_SECONDS of expiring, so viewers polling
+    a session's files don't cost a signature per file per poll.
+    """
+    
+    def __init__(self, backend: Optional[StorageBackend] = None):
+        self.backend = backend or create_backend()
+        self._url_cache = TTLCache(
+            ttl_seconds=settings.SIGNED_URL_EXPIRATION_MINUTES * 60 - settings.SIGNED_URL_REFRESH_MARGIN_SECONDS,
+            max_entries=settings.SIGNED_URL_CACHE_MAX_ENTRIES
+        )
     
     async def upload_file(
         self,
@@ -22,55 +33,57 @@ class StorageService:
         destination_path: str,
         content_type: str
     ) -> str:
-        """Upload file to Google Cloud Storage"""
-        if not self.client:
-            # Mock mode for development without GCS
-            return f"mock://storage/{destination_path}"
-        
-        blob = self.bucket.blob(destination_path)
-        blob.upload_from_string(file_content, content_type=content_type)
-        
-        return f"gs://{self.bucket_name}/{destination_path}"
+        """Upload file held in memory"""
+        return await self.backend.upload_stream(_single_chunk(file_content), destination_path, content_type)
     
-    async def get_signed_url(self, file_path: str, expiration_minutes: int = 30) -> str:
-        """Generate a signed URL for file access"""
-        if file_path.startswith("mock://"):
-            # Return mock URL for development
-            return file_path
-        
-        if not self.client:
+    async def upload_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        destination_path: str,
+        content_type: str
+    ) -> str:
+        """Upload file as its chunks arrive; if ``chunks`` raises, nothing
+        is stored"""
+        return await self.backend.upload_stream(chunks, destination_path, content_type)
+    
+    def download_stream(self, file_path: str) -> AsyncIterator[bytes]:
+        """Read a stored file in chunks; FileNotFoundError if there is none"""
+        return self.backend.download_stream(file_path)
+    
+    async def read_file(self, file_path: str) -> bytes:
+        """Read a small stored file (a preview, a tile) whole"""
+        return b"".join([chunk async for chunk in self.backend.download_stream(file_path)])
+    
+    def storage_path(self, file_path: str) -> str:
+        """Path of a stored file within the backend, for storing files next to it"""
+        return self.backend.storage_path(file_path)
+    
+    async def get_signed_url(self, file_path: str, expiration_minutes: Optional[int] = None) -> str:
+        """Signed URL for file access, valid for at least the refresh margin"""
+        if not self.backend.owns(file_path):
+            # mock:// paths (or another backend's) can't be signed here
             return file_path
         
-        # Extract blob name from gs:// path
-        blob_name = file_path.replace(f"gs://{self.bucket_name}/", "")
-        blob = self.bucket.blob(blob_name)
-        
-        url = blob.generate_signed_url(
-            version="v4",
-            expiration=timedelta(minutes=expiration_minutes),
-            method="GET"
-        )
+        expiration_minutes = expiration_minutes or settings.SIGNED_URL_EXPIRATION_MINUTES
+        cache_ttl = expiration_minutes * 60 - settings.SIGNED_URL_REFRESH_MARGIN_SECONDS
+        cached = self._url_cache.get(file_path)
+        if cached and cached[0] == expiration_minutes:
+            return cached[1]
         
+        url = await self.backend.get_signed_url(file_path, expiration_minutes)
+        if cache_ttl > 0:
+            self._url_cache.set(file_path, (expiration_minutes, url), ttl_seconds=cache_ttl)
         return url
     
     async def delete_file(self, file_path: str) -> bool:
-        """Delete file from Google Cloud Storage"""
-        if file_path.startswith("mock://"):
-            # Mock deletion for development
-            return True
+        """Delete file from storage"""
+        if not self.backend.owns(file_path):
+            # Mock deletion for development (mock:// paths stored nothing)
+            return file_path.startswith("mock://")
         
-        if not self.client:
-            return True
-        
-        try:
-            blob_name = file_path.replace(f"gs://{self.bucket_name}/", "")
-            blob = self.bucket.blob(blob_name)
-            blob.delete()
-            return True
-        except Exception:
-            return False
+        self._url_cache.delete(file_path)
+        return await self.backend.delete(file_path)
 
 
 # Singleton instance
 storage_service = StorageService()
-
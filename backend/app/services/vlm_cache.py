@@ -0,0 +1,97 @@
+"""
+Content-addressed cache of initial VLM analyses
+
+Re-submissions, re-runs after vlm_failed and training sessions often send
+the model a prompt it has already answered. Analyses are stored in the
+``vlm_analysis_cache`` collection under the sha256 of the normalized prompt,
+the model name and the generation parameters, so only a byte-identical
+request (modulo whitespace) can hit. Entries expire after
+VLM_CACHE_TTL_SECONDS (TTL index on ``expires_at``) and, past
+VLM_CACHE_MAX_ENTRIES, the least recently used ones are evicted.
+
+Hits, misses and bypasses are counted per day in ``vlm_cache_stats``.
+"""
+import hashlib
+import json
+import re
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from app.core.config import settings
+
+CACHE_COLLECTION = "vlm_analysis_cache"
+STATS_COLLECTION = "vlm_cache_stats"
+
+OUTCOMES = ("hits", "misses", "bypassed")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse runs of spaces/tabs and blank lines, strip line ends"""
+    lines = [re.sub(r"[ \t]+", " ", line).strip() for line in prompt.strip().splitlines()]
+    normalized = []
+    for line in lines:
+        if line or (normalized and normalized[-1]):
+            normalized.append(line)
+    return "\n".join(normalized)
+
+
+def cache_key(prompt: str, model: str, params: Dict[str, Any]) -> str:
+    payload = json.dumps(
+        {"prompt": normalize_prompt(prompt), "model": model, "params": params},
+        sort_keys=True,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+async def record(db: AsyncIOMotorDatabase, outcome: str) -> None:
+    """Count a lookup outcome ("hits", "misses" or "bypassed") for today"""
+    await db[STATS_COLLECTION].update_one(
+        {"_id": datetime.utcnow().strftime("%Y-%m-%d")},
+        {"$inc": {outcome: 1}},
+        upsert=True
+    )
+
+
+async def get(db: AsyncIOMotorDatabase, key: str) -> Optional[Dict[str, Any]]:
+    """Cached analysis for ``key``, or None; records the hit or miss"""
+    now = datetime.utcnow()
+    entry = await db[CACHE_COLLECTION].find_one_and_update(
+        # The TTL monitor only runs once a minute, so check expiry here too
+        {"_id": key, "expires_at": {"$gt": now}},
+        {"$set": {"last_used_at": now}, "$inc": {"hits": 1}},
+        projection={"_id": 0, "output": 1}
+    )
+    await record(db, "hits" if entry else "misses")
+    return entry["output"] if entry else None
+
+
+async def put(db: AsyncIOMotorDatabase, key: str, model: str, output: Dict[str, Any]) -> None:
+    """Store an analysis and evict the least recently used entries past the limit"""
+    now = datetime.utcnow()
+    collection = db[CACHE_COLLECTION]
+    await collection.update_one(
+        {"_id": key},
+        {
+            "$set": {
+                "model": model,
+                "output": output,
+                "last_used_at": now,
+                "expires_at": now + timedelta(seconds=settings.VLM_CACHE_TTL_SECONDS)
+            },
+            "$setOnInsert": {"created_at": now, "hits": 0}
+        },
+        upsert=True
+    )
+
+    excess = await collection.estimated_document_count() - settings.VLM_CACHE_MAX_ENTRIES
+    if excess > 0:
+        oldest = collection.find({}, {"_id": 1}).sort("last_used_at", 1).limit(excess)
+        keys = [doc["_id"] async for doc in oldest]
+        await collection.delete_many({"_id": {"$in": keys}})
+
+
+async def get_stats(db: AsyncIOMotorDatabase, day: str) -> Dict[str, int]:
+    """Hit/miss/bypass counts for a day (YYYY-MM-DD)"""
+    doc = await db[STATS_COLLECTION].find_one({"_id": day}) or {}
+    return {outcome: doc.get(outcome, 0) for outcome in OUTCOMES}
@@ -1,6 +1,7 @@
 import random
+import re
 import time
-from typing import Dict, List, Any
+from typing import Dict, Iterator, List, Any
 from datetime import datetime
 
 
@@ -136,6 +137,33 @@ class MockVLMService:
         start_time = time.time()
         time.sleep(random.uniform(1, 3))  # Simulate 1-3 seconds processing
         
+        findings = self._chat_findings(doctor_query)
+        
+        processing_time = int(time.time() - start_time)
+        
+        return {
+            "findings": findings,
+            "processing_time": processing_time
+        }
+    
+    def stream_doctor_query(
+        self,
+        patient_context: Dict[str, Any],
+        session_context: Dict[str, Any],
+        doctor_query: str,
+        previous_chat: List[Dict[str, Any]]
+    ) -> Iterator[str]:
+        """Generate mock VLM response to doctor's question, token by token"""
+        
+        time.sleep(random.uniform(0.2, 0.6))  # Simulate prompt processing before the first token
+        
+        for token in re.findall(r"\S+\s*", self._chat_findings(doctor_query)):
+            time.sleep(random.uniform(0.02, 0.05))  # Simulate per-token decoding
+            yield token
+    
+    def _chat_findings(self, doctor_query: str) -> str:
+        """Contextual mock answer to a doctor's question"""
+        
         query_lower = doctor_query.lower()
         
         # Generate contextual response based on query
@@ -167,12 +195,7 @@ class MockVLMService:
                 "worsen, 3) Patient education regarding warning signs."
             )
         
-        processing_time = int(time.time() - start_time)
-        
-        return {
-            "findings": findings,
-            "processing_time": processing_time
-        }
+        return findings
     
     def _generate_findings(
         self,
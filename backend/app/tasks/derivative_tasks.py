@@ -0,0 +1,27 @@
+from celery_app import celery_app
+from app.core.resilience import backoff_delay, is_transient
+from app.services import image_derivatives
+from app.tasks import worker
+from app.tasks.worker import DatabaseTask
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Retries of a storage hiccup before the file is marked failed
+MAX_RETRIES = 3
+
+
+@celery_app.task(bind=True, base=DatabaseTask, name='derivative_tasks.generate_file_derivatives')
+def generate_file_derivatives(self, session_id: str, file_id: str):
+    """Render and store the preview and thumbnail of an uploaded image"""
+    try:
+        derivatives_status = worker.run(image_derivatives.generate_file_derivatives(self.db, session_id, file_id))
+    except Exception as e:
+        if is_transient(e) and self.request.retries < MAX_RETRIES:
+            raise self.retry(exc=e, countdown=backoff_delay(self.request.retries + 1, 5.0, 60.0))
+        logger.error(f"Derivatives of {file_id} in session {session_id} failed: {e}")
+        worker.run(image_derivatives.mark_failed(self.db, session_id, file_id))
+        return {"success": False, "error": str(e)}
+
+    logger.info(f"Derivatives of {file_id} in session {session_id}: {derivatives_status}")
+    return {"success": derivatives_status is not None, "derivatives_status": derivatives_status}
@@ -0,0 +1,48 @@
+from celery_app import celery_app
+from app.services.history_service import migrate_embedded_history
+from app.services.search_service import backfill_search_keys
+from app.services.session_service import requeue_failed_sessions
+from app.services.stats_service import rebuild_session_counters
+from app.tasks import worker
+from app.tasks.worker import DatabaseTask
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(bind=True, base=DatabaseTask, name='maintenance_tasks.rebuild_session_counters')
+def rebuild_session_counters_task(self):
+    """Recount the dashboard counters (see scripts/rebuild_session_counters.py)"""
+    sessions_seen = worker.run(rebuild_session_counters(self.db))
+    logger.info(f"Rebuilt session counters from {sessions_seen} sessions")
+    return {"success": True, "sessions_seen": sessions_seen}
+
+
+@celery_app.task(bind=True, base=DatabaseTask, name='maintenance_tasks.backfill_patient_search')
+def backfill_patient_search_task(self, batch_size: int = 1000):
+    """Fill in missing patient search keys (see scripts/backfill_patient_search.py)"""
+    updated = worker.run(backfill_search_keys(self.db, batch_size))
+    logger.info(f"Backfilled search keys for {updated} patients")
+    return {"success": True, "updated": updated}
+
+
+@celery_app.task(bind=True, base=DatabaseTask, name='maintenance_tasks.migrate_session_history')
+def migrate_session_history_task(self, batch_size: int = 500):
+    """Move embedded chat/status history to their collections (see scripts/migrate_session_history.py)"""
+    migrated = worker.run(migrate_embedded_history(self.db, batch_size))
+    logger.info(f"Migrated embedded history of {migrated} sessions")
+    return {"success": True, "migrated": migrated}
+
+
+@celery_app.task(bind=True, base=DatabaseTask, name='maintenance_tasks.requeue_failed_vlm')
+def requeue_failed_vlm_task(self, requeued_by: str, limit: int = 100, max_in_flight: int = 4):
+    """Re-run the VLM on vlm_failed sessions (see session_service.requeue_failed_sessions)"""
+    result = worker.run(requeue_failed_sessions(self.db, requeued_by, limit, max_in_flight))
+    if result["stalled"]:
+        logger.warning(
+            f"Requeue sweep {result['sweep_id']} stopped after {result['requeued']} of "
+            f"{result['candidates']} vlm_failed sessions: its requeued sessions stopped leaving VLM processing"
+        )
+    else:
+        logger.info(f"Requeued {result['requeued']} of {result['candidates']} vlm_failed sessions")
+    return {"success": True, **result}
@@ -1,67 +1,108 @@
-from celery import Task
-from celery_app import celery_app
-from motor.motor_asyncio import AsyncIOMotorClient
+from celery_app import celery_app, PRIORITY_URGENT, PRIORITY_PENDING_TESTS, PRIORITY_ROUTINE
 from app.core.config import settings
+from app.core.resilience import backoff_delay, is_transient
 from app.services.medgemma_service import medgemma_service
 from app.models.session import SessionStatus
-from datetime import datetime
+from app.services import session_state, vlm_cache
+from app.tasks import worker
+from app.tasks.worker import DatabaseTask
+from fastapi import HTTPException
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
 import asyncio
+import functools
 import logging
+import uuid
 
 logger = logging.getLogger(__name__)
 
+# Initial analyses waiting for the batching stage
+PENDING_COLLECTION = "vlm_pending_analyses"
+# Analyses given up on, with the error of every attempt
+DEAD_LETTER_COLLECTION = "vlm_dead_letters"
 
-class DatabaseTask(Task):
-    """Base task with database connection"""
-    _db_client = None
-    
-    @property
-    def db_client(self):
-        if self._db_client is None:
-            self._db_client = AsyncIOMotorClient(settings.MONGODB_URL)
-        return self._db_client
-    
-    @property
-    def db(self):
-        return self.db_client[settings.MONGODB_DB_NAME]
+
+def initial_priority(session: Dict) -> int:
+    """Queue priority of a session's initial analysis"""
+    if session.get("urgent"):
+        return PRIORITY_URGENT
+    if session.get("session_type") == "follow_up" and session.get("parent_session_id"):
+        # Follow-ups are opened by the closing doctor when tests are pending
+        return PRIORITY_PENDING_TESTS
+    return PRIORITY_ROUTINE
 
 
 @celery_app.task(bind=True, base=DatabaseTask, name='vlm_tasks.process_session')
-def process_session_vlm(self, session_id: str):
-    """Process session with VLM (mock implementation)"""
+def process_session_vlm(
+    self,
+    session_id: str,
+    bypass_cache: bool = False,
+    attempt: int = 0,
+    error_history: Optional[List[Dict]] = None
+):
+    """Process session with VLM (mock implementation)
+    
+    With bypass_cache the model is always called, even if an identical
+    request has a cached analysis (the new answer still refreshes the cache).
+    Transient failures are retried with backoff: ``attempt`` counts the
+    failed attempts so far and ``error_history`` records their errors.
+    """
+    
+    retry = {"bypass_cache": bypass_cache, "attempt": attempt, "error_history": error_history or []}
     
     async def _process():
+        priority = PRIORITY_ROUTINE
         try:
-            # Update status to vlm_processing
-            now = datetime.utcnow()
-            await self.db.sessions.update_one(
+            if attempt == 0:
+                # Update status to vlm_processing; a duplicate delivery of this
+                # task finds the session already past submitted and stops here,
+                # unless the earlier delivery died mid-run (acks_late redelivers
+                # it) and nothing else will finish the session
+                try:
+                    await session_state.transition(
+                        self.db,
+                        session_id,
+                        SessionStatus.vlm_processing,
+                        "system",
+                        fields={
+                            "vlm_initial_status": "processing",
+                            "vlm_initial_triggered_at": datetime.utcnow()
+                        }
+                    )
+                except session_state.TransitionConflict:
+                    if not await _take_over(self, session_id, bypass_cache):
+                        raise
+            elif not await _claim_retry(self.db, session_id, attempt) and not await _take_over(
+                self, session_id, bypass_cache
+            ):
+                # A retry resumes the session its failed attempt left in vlm_processing
+                logger.warning(f"VLM retry skipped for session {session_id}: no longer in vlm_processing")
+                return {"success": False, "session_id": session_id, "error": "Session no longer in vlm_processing"}
+            
+            # Get session data
+            session = await self.db.sessions.find_one(
                 {"session_id": session_id},
                 {
-                    "$set": {
-                        "session_status": SessionStatus.vlm_processing,
-                        "vlm_initial_status": "processing",
-                        "vlm_initial_triggered_at": now,
-                        "last_updated": now
-                    },
-                    "$push": {
-                        "status_history": {
-                            "status": SessionStatus.vlm_processing,
-                            "timestamp": now,
-                            "user_id": "system"
-                        }
-                    }
+                    "patient_id": 1,
+                    "session_type": 1,
+                    "parent_session_id": 1,
+                    "chief_complaint": 1,
+                    "current_state_description": 1,
+                    "uploaded_files.file_id": 1,
+                    "urgent": 1
                 }
             )
-            
-            # Get session data
-            session = await self.db.sessions.find_one({"session_id": session_id})
             if not session:
                 raise Exception(f"Session {session_id} not found")
             
             # Get patient data
-            patient = await self.db.patients.find_one({"patient_id": session["patient_id"]})
+            patient = await self.db.patients.find_one(
+                {"patient_id": session["patient_id"]},
+                {"age": 1, "sex": 1, "chronic_diseases": 1, "current_medications.name": 1}
+            )
             if not patient:
                 raise Exception(f"Patient {session['patient_id']} not found")
+            priority = initial_priority(session)
             
             # Prepare patient context
             patient_context = {
@@ -75,7 +116,8 @@ def process_session_vlm(self, session_id: str):
             last_session_summary = None
             if session.get("session_type") == "follow_up" and session.get("parent_session_id"):
                 last_session = await self.db.sessions.find_one(
-                    {"session_id": session["parent_session_id"]}
+                    {"session_id": session["parent_session_id"]},
+                    {"diagnosis": 1}
                 )
                 if last_session and last_session.get("diagnosis"):
                     diagnosis = last_session["diagnosis"]
@@ -84,20 +126,6 @@ def process_session_vlm(self, session_id: str):
                         f"Notes: {diagnosis.get('doctor_notes', 'N/A')}"
                     )
             
-            # Check if HF_TOKEN is set - fail immediately if not
-            if not settings.HF_TOKEN:
-                raise Exception("HF_TOKEN not configured. VLM processing requires valid Hugging Face token.")
-            
-            # Process with real VLM only (MedGemma or BioGPT)
-            logger.info(f"Processing session {session_id} with real VLM (MedGemma/BioGPT)")
-            vlm_output = medgemma_service.process_initial_session(
-                patient_context=patient_context,
-                chief_complaint=session["chief_complaint"],
-                current_state=session["current_state_description"],
-                last_session_summary=last_session_summary,
-                files_count=len(session.get("uploaded_files", []))
-            )
-            
             # Prepare VLM input for record
             vlm_input = {
                 "patient_context": patient_context,
@@ -107,58 +135,350 @@ def process_session_vlm(self, session_id: str):
                 "files_count": len(session.get("uploaded_files", []))
             }
             
-            # Update session with VLM results
-            now = datetime.utcnow()
-            await self.db.sessions.update_one(
-                {"session_id": session_id},
-                {
-                    "$set": {
-                        "session_status": SessionStatus.awaiting_doctor,
-                        "vlm_initial_status": "completed",
-                        "vlm_initial_completed_at": now,
-                        "vlm_initial_input": vlm_input,
-                        "vlm_initial_output": vlm_output,
-                        "last_updated": now
-                    },
-                    "$push": {
-                        "status_history": {
-                            "status": SessionStatus.awaiting_doctor,
-                            "timestamp": now,
-                            "user_id": "system"
-                        }
-                    }
-                }
+            # Reuse the analysis of an identical earlier request, if any
+            cache_key = medgemma_service.initial_cache_key(**vlm_input)
+            vlm_output = None
+            if bypass_cache or not settings.VLM_CACHE_ENABLED:
+                await vlm_cache.record(self.db, "bypassed")
+            else:
+                vlm_output = await vlm_cache.get(self.db, cache_key)
+            
+            if vlm_output is not None:
+                logger.info(f"Session {session_id} served from the VLM analysis cache")
+                vlm_output["processing_time_seconds"] = 0
+                vlm_output["cache_hit"] = True
+                return await _complete_analysis(self.db, session_id, vlm_input, vlm_output)
+            
+            # Fail immediately if the inference backend can't serve requests (e.g. no HF_TOKEN)
+            configuration_error = medgemma_service.backend.configuration_error()
+            if configuration_error:
+                raise Exception(configuration_error)
+            
+            if settings.VLM_BATCH_MAX_SIZE > 1:
+                # Hand over to the batching stage (process_vlm_batch)
+                await _enqueue_analysis(self.db, session_id, vlm_input, cache_key, priority, retry)
+                return {"success": True, "session_id": session_id, "vlm_status": "queued"}
+            
+            # Process with real VLM only (MedGemma or BioGPT), off the event
+            # loop so partial output can be stored while it generates
+            logger.info(f"Processing session {session_id} with real VLM (MedGemma/BioGPT)")
+            publish = _partial_output_publisher(self.db, lambda i: session_id)
+            vlm_output = await asyncio.get_running_loop().run_in_executor(
+                None,
+                functools.partial(
+                    medgemma_service.process_initial_session,
+                    **vlm_input,
+                    on_partial=functools.partial(publish, 0) if publish else None
+                )
             )
+            await _store_in_cache(self.db, cache_key, vlm_output)
+            
+            return await _complete_analysis(self.db, session_id, vlm_input, vlm_output)
             
-            return {"success": True, "session_id": session_id}
+        except HTTPException as e:
+            # Session gone or no longer in a status this task may move it from
+            logger.warning(f"VLM processing skipped for session {session_id}: {e.detail}")
+            return {"success": False, "session_id": session_id, "error": e.detail}
             
         except Exception as e:
-            # Update status to vlm_failed with error details
-            error_message = str(e)
-            logger.error(f"VLM processing failed for session {session_id}: {error_message}")
-            now = datetime.utcnow()
-            await self.db.sessions.update_one(
-                {"session_id": session_id},
-                {
-                    "$set": {
-                        "session_status": SessionStatus.vlm_failed,
-                        "vlm_initial_status": "failed",
-                        "vlm_error_message": error_message,
-                        "last_updated": now
-                    },
-                    "$push": {
-                        "status_history": {
-                            "status": SessionStatus.vlm_failed,
-                            "timestamp": now,
-                            "user_id": "system"
-                        }
-                    }
-                }
-            )
-            # Don't re-raise - task succeeded in marking as failed
-            return {"success": True, "session_id": session_id, "vlm_status": "failed"}
+            return await _handle_failure(self.db, session_id, e, retry, priority)
     
-    # Run async function
-    loop = asyncio.get_event_loop()
-    return loop.run_until_complete(_process())
+    # Run on the worker process's long-lived event loop
+    return worker.run(_process())
 
+
+@celery_app.task(bind=True, base=DatabaseTask, name='vlm_tasks.process_batch')
+def process_vlm_batch(self):
+    """Run the queued initial analyses through the model in batches
+    
+    Scheduled by every enqueue, so most runs find their window's analyses
+    already taken by an earlier one and return at once.
+    """
+    
+    async def _process():
+        processed = 0
+        while True:
+            batch = await _claim_batch(self.db)
+            if not batch:
+                return {"success": True, "processed": processed}
+            
+            try:
+                outputs = await asyncio.get_running_loop().run_in_executor(
+                    None,
+                    medgemma_service.process_initial_batch,
+                    [item["vlm_input"] for item in batch],
+                    _partial_output_publisher(self.db, lambda i: batch[i]["session_id"])
+                )
+            except Exception as e:
+                # The dispatch itself failed: so did every analysis in it
+                logger.error(f"VLM batch of {len(batch)} analyses failed: {str(e)}")
+                outputs = [e] * len(batch)
+            
+            for item, vlm_output in zip(batch, outputs):
+                session_id = item["session_id"]
+                try:
+                    if isinstance(vlm_output, Exception):
+                        raise vlm_output
+                    await _store_in_cache(self.db, item["cache_key"], vlm_output)
+                    await _complete_analysis(self.db, session_id, item["vlm_input"], vlm_output)
+                except HTTPException as e:
+                    logger.warning(f"VLM processing skipped for session {session_id}: {e.detail}")
+                except Exception as e:
+                    await _handle_failure(self.db, session_id, e, item["retry"], item["priority"])
+            
+            await self.db[PENDING_COLLECTION].delete_many({"_id": {"$in": [item["_id"] for item in batch]}})
+            processed += len(batch)
+    
+    return worker.run(_process())
+
+
+async def _claim_retry(db, session_id: str, attempt: int) -> bool:
+    """Claim the session for the retry its failed attempt scheduled"""
+    claimed = await db.sessions.update_one(
+        {
+            "session_id": session_id,
+            "session_status": SessionStatus.vlm_processing.value,
+            "vlm_initial_status": "retry_scheduled",
+            "vlm_retry_count": attempt
+        },
+        {"$set": {"vlm_initial_status": "processing", "vlm_initial_triggered_at": datetime.utcnow()}}
+    )
+    return bool(claimed.modified_count)
+
+
+async def _take_over(task, session_id: str, bypass_cache: bool) -> bool:
+    """Claim a session in vlm_processing that an earlier delivery left behind
+    
+    vlm_initial_triggered_at is the claim: it is stamped by whichever
+    delivery starts the analysis, and one older than VLM_RESUME_AFTER_SECONDS
+    (more than the task time limit) belongs to a delivery that can no
+    longer be running. Taking it over is a compare-and-set on that stamp,
+    so of several redeliveries exactly one resumes the session. A fresh
+    claim may still be running, so the check is repeated once it goes
+    stale. Sessions with a result, a retry scheduled or an analysis
+    waiting in the batching stage (which reclaims its own abandoned
+    batches) are not taken over.
+    """
+    db = task.db
+    if await db[PENDING_COLLECTION].count_documents({"session_id": session_id}, limit=1):
+        return False
+    
+    now = datetime.utcnow()
+    stale_before = now - timedelta(seconds=settings.VLM_RESUME_AFTER_SECONDS)
+    in_progress = {
+        "session_id": session_id,
+        "session_status": SessionStatus.vlm_processing.value,
+        "vlm_initial_status": {"$in": ["processing", "streaming"]}
+    }
+    claimed = await db.sessions.update_one(
+        {**in_progress, "vlm_initial_triggered_at": {"$lt": stale_before}},
+        {"$set": {"vlm_initial_status": "processing", "vlm_initial_output": None, "vlm_initial_triggered_at": now}}
+    )
+    if claimed.modified_count:
+        logger.warning(f"Resuming VLM processing of session {session_id} left by an earlier delivery")
+        return True
+    
+    session = await db.sessions.find_one(in_progress, {"vlm_initial_triggered_at": 1})
+    if session and session.get("vlm_initial_triggered_at"):
+        wait = (session["vlm_initial_triggered_at"] - stale_before).total_seconds()
+        logger.info(f"Session {session_id} may still be processing elsewhere; checking again in {wait:.0f}s")
+        process_session_vlm.apply_async(
+            args=(session_id,),
+            kwargs={"bypass_cache": bypass_cache},
+            countdown=wait,
+            priority=(task.request.delivery_info or {}).get("priority")
+        )
+    return False
+
+
+async def _enqueue_analysis(
+    db,
+    session_id: str,
+    vlm_input: Dict,
+    cache_key: str,
+    priority: int,
+    retry: Dict
+) -> None:
+    """Queue an analysis for the batching stage and schedule a flush
+    
+    The flush runs once the batching window has passed, or straight away
+    if the analysis is urgent or enough are waiting to fill a batch.
+    """
+    await db[PENDING_COLLECTION].insert_one({
+        "session_id": session_id,
+        "vlm_input": vlm_input,
+        "cache_key": cache_key,
+        "priority": priority,
+        "retry": retry,
+        "batch_id": None,
+        "enqueued_at": datetime.utcnow()
+    })
+    waiting = await db[PENDING_COLLECTION].count_documents({"batch_id": None})
+    if priority == PRIORITY_URGENT or waiting >= settings.VLM_BATCH_MAX_SIZE:
+        countdown = 0
+    else:
+        countdown = settings.VLM_BATCH_WINDOW_SECONDS
+    process_vlm_batch.apply_async(countdown=countdown, priority=priority)
+
+
+async def _claim_batch(db) -> List[Dict]:
+    """Claim up to VLM_BATCH_MAX_SIZE queued analyses, by priority then age
+    
+    Analyses claimed longer than VLM_BATCH_CLAIM_TIMEOUT_SECONDS ago belong
+    to a batch whose worker died before finishing it (the task time limit
+    is shorter), and are put back in the queue first.
+    """
+    stale_before = datetime.utcnow() - timedelta(seconds=settings.VLM_BATCH_CLAIM_TIMEOUT_SECONDS)
+    released = await db[PENDING_COLLECTION].update_many(
+        {"claimed_at": {"$lt": stale_before}},
+        {"$set": {"batch_id": None}, "$unset": {"claimed_at": ""}}
+    )
+    if released.modified_count:
+        logger.warning(f"Reclaimed {released.modified_count} analyses from abandoned VLM batches")
+    
+    waiting = db[PENDING_COLLECTION].find({"batch_id": None}, {"_id": 1})
+    waiting = waiting.sort([("priority", 1), ("enqueued_at", 1)]).limit(settings.VLM_BATCH_MAX_SIZE)
+    ids = [doc["_id"] async for doc in waiting]
+    if not ids:
+        return []
+    
+    # Another worker may claim some of the same analyses concurrently; the
+    # batch_id condition lets each one go to exactly one batch
+    batch_id = uuid.uuid4().hex
+    await db[PENDING_COLLECTION].update_many(
+        {"_id": {"$in": ids}, "batch_id": None},
+        {"$set": {"batch_id": batch_id, "claimed_at": datetime.utcnow()}}
+    )
+    return await db[PENDING_COLLECTION].find({"batch_id": batch_id}).to_list(length=None)
+
+
+def _partial_output_publisher(
+    db,
+    session_for: Callable[[int], str]
+) -> Optional[Callable[[int, Dict[str, Any]], None]]:
+    """Callback storing partial initial output from the generating thread
+    
+    Takes the index of the request in its batch (0 outside batches), which
+    ``session_for`` maps to the session, and waits for the write so that
+    partials are stored in order and before the final output.
+    """
+    if not settings.VLM_PARTIAL_OUTPUT_ENABLED:
+        return None
+    loop = asyncio.get_running_loop()
+    
+    def publish(i: int, partial_output: Dict[str, Any]) -> None:
+        asyncio.run_coroutine_threadsafe(
+            _store_partial_output(db, session_for(i), partial_output),
+            loop
+        ).result()
+    
+    return publish
+
+
+async def _store_partial_output(db, session_id: str, partial_output: Dict[str, Any]) -> None:
+    """Show the sections generated so far while the session is still processing"""
+    await db.sessions.update_one(
+        {"session_id": session_id, "session_status": SessionStatus.vlm_processing.value},
+        {"$set": {"vlm_initial_status": "streaming", "vlm_initial_output": partial_output}}
+    )
+
+
+async def _store_in_cache(db, cache_key: str, vlm_output: Dict) -> None:
+    # Fallback answers aren't cached, so a re-run gets another chance at
+    # the primary model
+    if settings.VLM_CACHE_ENABLED and vlm_output.get("model_used") == "primary":
+        await vlm_cache.put(db, cache_key, medgemma_service.primary_model, vlm_output)
+
+
+async def _complete_analysis(db, session_id: str, vlm_input: Dict, vlm_output: Dict) -> Dict:
+    """Store the VLM results and move the session to the doctor queue"""
+    now = datetime.utcnow()
+    await session_state.transition(
+        db,
+        session_id,
+        SessionStatus.awaiting_doctor,
+        "system",
+        fields={
+            "vlm_initial_status": "completed",
+            "vlm_initial_completed_at": now,
+            "vlm_initial_input": vlm_input,
+            "vlm_initial_output": vlm_output
+        }
+    )
+    
+    return {"success": True, "session_id": session_id}
+
+
+async def _handle_failure(db, session_id: str, error: Exception, retry: Dict, priority: int) -> Dict:
+    """Retry a transient failure later with backoff and jitter, or give up
+    
+    A session whose retries are exhausted, or whose error isn't transient,
+    is dead-lettered with its error history and marked vlm_failed.
+    """
+    attempt = retry["attempt"] + 1
+    transient = is_transient(error)
+    error_history = retry["error_history"] + [{
+        "attempt": attempt,
+        "error": str(error),
+        "transient": transient,
+        "failed_at": datetime.utcnow().isoformat()
+    }]
+    
+    if transient and attempt <= settings.VLM_MAX_RETRIES:
+        delay = backoff_delay(attempt, settings.VLM_RETRY_BASE_SECONDS, settings.VLM_RETRY_MAX_SECONDS)
+        logger.warning(
+            f"Transient VLM failure for session {session_id} (attempt {attempt}), "
+            f"retrying in {delay:.1f}s: {str(error)}"
+        )
+        await db.sessions.update_one(
+            {"session_id": session_id, "session_status": SessionStatus.vlm_processing.value},
+            {"$set": {
+                "vlm_initial_status": "retry_scheduled",
+                "vlm_initial_output": None,
+                "vlm_error_message": str(error),
+                "vlm_retry_count": attempt
+            }}
+        )
+        process_session_vlm.apply_async(
+            args=(session_id,),
+            kwargs={
+                "bypass_cache": retry["bypass_cache"],
+                "attempt": attempt,
+                "error_history": error_history
+            },
+            countdown=delay,
+            priority=priority
+        )
+        return {"success": True, "session_id": session_id, "vlm_status": "retry_scheduled"}
+    
+    await db[DEAD_LETTER_COLLECTION].insert_one({
+        "session_id": session_id,
+        "task": process_session_vlm.name,
+        "reason": "retries_exhausted" if transient else "permanent_error",
+        "attempts": attempt,
+        "error_history": error_history,
+        "dead_lettered_at": datetime.utcnow()
+    })
+    return await _fail_analysis(db, session_id, str(error))
+
+
+async def _fail_analysis(db, session_id: str, error_message: str) -> Dict:
+    """Update status to vlm_failed with error details"""
+    logger.error(f"VLM processing failed for session {session_id}: {error_message}")
+    try:
+        await session_state.transition(
+            db,
+            session_id,
+            SessionStatus.vlm_failed,
+            "system",
+            fields={
+                "vlm_initial_status": "failed",
+                "vlm_initial_output": None,
+                "vlm_error_message": error_message
+            }
+        )
+    except HTTPException as conflict:
+        logger.warning(f"Could not mark session {session_id} as vlm_failed: {conflict.detail}")
+        return {"success": False, "session_id": session_id, "error": conflict.detail}
+    # Don't re-raise - task succeeded in marking as failed
+    return {"success": True, "session_id": session_id, "vlm_status": "failed"}
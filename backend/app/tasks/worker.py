@@ -0,0 +1,95 @@
+"""
+Per-process resources of a Celery worker
+
+Each worker process owns one long-lived event loop and one pooled Motor
+client bound to it, created by the ``worker_process_init`` hook (after the
+prefork pool has forked, so nothing is shared with the parent), together
+with a fresh inference client. Tasks run their coroutines with ``run``
+instead of creating loops or connections of their own.
+
+The solo pool and eager execution never send ``worker_process_init``, so
+``run`` also starts the resources on first use, and again if it finds
+itself in a different process than the one that created them.
+"""
+import asyncio
+import logging
+import os
+from typing import Any, Coroutine, Optional
+from celery import Task
+from celery.signals import worker_process_init, worker_process_shutdown
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from app.core.config import settings
+from app.services.medgemma_service import medgemma_service
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerResources:
+    pid: Optional[int] = None
+    loop: Optional[asyncio.AbstractEventLoop] = None
+    client: Optional[AsyncIOMotorClient] = None
+
+
+resources = WorkerResources()
+
+
+def start() -> None:
+    """Create this process's event loop, DB client and inference client"""
+    resources.pid = os.getpid()
+    resources.loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(resources.loop)
+    resources.client = AsyncIOMotorClient(
+        settings.MONGODB_URL,
+        maxPoolSize=settings.WORKER_MONGO_POOL_SIZE
+    )
+    medgemma_service.reconnect()
+    logger.info(f"Worker process {resources.pid} ready")
+
+
+def stop() -> None:
+    """Close the DB client and event loop (if this process created them)"""
+    if resources.pid == os.getpid():
+        if resources.client is not None:
+            resources.client.close()
+        if resources.loop is not None and not resources.loop.is_closed():
+            resources.loop.close()
+    resources.pid = None
+    resources.loop = None
+    resources.client = None
+
+
+def _ensure_started() -> None:
+    if resources.pid != os.getpid() or resources.loop is None or resources.loop.is_closed():
+        # Resources inherited from a parent process are unusable here;
+        # drop them without closing the parent's sockets
+        resources.pid = None
+        start()
+
+
+def get_database() -> AsyncIOMotorDatabase:
+    _ensure_started()
+    return resources.client[settings.MONGODB_DB_NAME]
+
+
+def run(coro: Coroutine) -> Any:
+    """Run a coroutine to completion on this process's event loop"""
+    _ensure_started()
+    return resources.loop.run_until_complete(coro)
+
+
+class DatabaseTask(Task):
+    """Base task with the worker process's database connection"""
+
+    @property
+    def db(self) -> AsyncIOMotorDatabase:
+        return get_database()
+
+
+@worker_process_init.connect
+def init_worker_process(**kwargs) -> None:
+    start()
+
+
+@worker_process_shutdown.connect
+def shutdown_worker_process(**kwargs) -> None:
+    stop()
@@ -0,0 +1,77 @@
+"""
+Deep zoom (DZI) tile pyramid geometry
+
+A pyramid of an image W x H has levels 0..N with N = ceil(log2(max(W, H))):
+level N is the full image, each level below it half the size of the next
+(rounded up), down to 1 x 1 at level 0. Each level is cut into
+tile_size x tile_size tiles, column by row, every tile extended by
+``overlap`` pixels into its neighbours. A ``{name}.dzi`` descriptor sits
+next to a ``{name}_files/{level}/{col}_{row}.{format}`` directory of tiles,
+the layout deep zoom viewers (OpenSeadragon and others) expect.
+"""
+import math
+from typing import Dict, Iterator, Tuple
+
+DZI_NAMESPACE = "http://schemas.microsoft.com/deepzoom/2008"
+
+
+def max_level(width: int, height: int) -> int:
+    return math.ceil(math.log2(max(width, height, 1)))
+
+
+def level_size(width: int, height: int, level: int) -> Tuple[int, int]:
+    scale = 2 ** (max_level(width, height) - level)
+    return math.ceil(width / scale), math.ceil(height / scale)
+
+
+def tile_grid(width: int, height: int, tile_size: int) -> Tuple[int, int]:
+    """Columns and rows of tiles covering a level of this size"""
+    return math.ceil(width / tile_size), math.ceil(height / tile_size)
+
+
+def tile_bounds(
+    col: int,
+    row: int,
+    width: int,
+    height: int,
+    tile_size: int,
+    overlap: int
+) -> Tuple[int, int, int, int]:
+    """Pixel box (left, top, right, bottom) of a tile within its level"""
+    return (
+        max(col * tile_size - overlap, 0),
+        max(row * tile_size - overlap, 0),
+        min((col + 1) * tile_size + overlap, width),
+        min((row + 1) * tile_size + overlap, height),
+    )
+
+
+def has_tile(pyramid: Dict, level: int, col: int, row: int) -> bool:
+    if not 0 <= level <= max_level(pyramid["width"], pyramid["height"]):
+        return False
+    cols, rows = tile_grid(*level_size(pyramid["width"], pyramid["height"], level), pyramid["tile_size"])
+    return 0 <= col < cols and 0 <= row < rows
+
+
+def tile_path(descriptor_path: str, level: int, col: int, row: int, tile_format: str) -> str:
+    """Path of a tile, from the path (or URI) of its pyramid's .dzi"""
+    return f"{descriptor_path[:-len('.dzi')]}_files/{level}/{col}_{row}.{tile_format}"
+
+
+def tile_paths(pyramid: Dict) -> Iterator[str]:
+    """Paths of every tile of a pyramid record (TilePyramid fields)"""
+    width, height = pyramid["width"], pyramid["height"]
+    for level in range(max_level(width, height) + 1):
+        cols, rows = tile_grid(*level_size(width, height, level), pyramid["tile_size"])
+        for col in range(cols):
+            for row in range(rows):
+                yield tile_path(pyramid["file_path"], level, col, row, pyramid["format"])
+
+
+def descriptor(width: int, height: int, tile_size: int, overlap: int, tile_format: str) -> str:
+    """The .dzi XML describing a pyramid"""
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<Image xmlns="{DZI_NAMESPACE}" TileSize="{tile_size}" Overlap="{overlap}" Format="{tile_format}">'
+        f'<Size Width="{width}" Height="{height}"/></Image>\n'
+    )
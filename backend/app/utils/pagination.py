@@ -0,0 +1,88 @@
+import asyncio
+import base64
+import binascii
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from bson import json_util
+from fastapi import HTTPException, Response, status
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+SortKeys = List[Tuple[str, int]]
+
+
+@dataclass
+class Page:
+    items: List[Any]
+    next_cursor: Optional[str] = None
+    total_count: Optional[int] = None
+
+
+def encode_cursor(document: Dict[str, Any], sort: SortKeys) -> str:
+    """Opaque continuation token holding the sort key values of the last item"""
+    values = [document[field] for field, _ in sort]
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor: str, sort: SortKeys) -> List[Any]:
+    try:
+        values = json_util.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, binascii.Error):
+        values = None
+    if not isinstance(values, list) or len(values) != len(sort):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+    return values
+
+
+def keyset_filter(sort: SortKeys, values: List[Any]) -> Dict[str, Any]:
+    """Filter matching documents strictly after `values` in `sort` order"""
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        clause = {prev_field: values[j] for j, (prev_field, _) in enumerate(sort[:i])}
+        clause[field] = {"$gt" if direction == 1 else "$lt": values[i]}
+        clauses.append(clause)
+    return {"$or": clauses}
+
+
+async def fetch_page(
+    collection: AsyncIOMotorCollection,
+    query: Dict[str, Any],
+    projection: Dict[str, int],
+    sort: SortKeys,
+    limit: int,
+    cursor: Optional[str] = None
+) -> Page:
+    """Fetch one keyset page of `query` in `sort` order
+
+    The total count is only computed for the first page (no cursor), as a
+    hint for the client; later pages leave it as None.
+    """
+    page_query = query
+    if cursor:
+        page_query = {"$and": [query, keyset_filter(sort, decode_cursor(cursor, sort))]}
+
+    # The sort keys are needed to build the next cursor
+    projection = {**projection, **{field: 1 for field, _ in sort}}
+
+    find = collection.find(page_query, projection).sort(sort).limit(limit + 1).to_list(length=limit + 1)
+    if cursor:
+        items, total_count = await find, None
+    else:
+        items, total_count = await asyncio.gather(find, collection.count_documents(query))
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(items[-1], sort)
+
+    return Page(items=items, next_cursor=next_cursor, total_count=total_count)
+
+
+def set_page_headers(response: Response, page: Page) -> None:
+    """Expose the continuation token and total count of a page as headers"""
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+    if page.total_count is not None:
+        response.headers["X-Total-Count"] = str(page.total_count)
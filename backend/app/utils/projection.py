@@ -0,0 +1,48 @@
+from typing import Dict, Iterable, Optional, Type
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+
+def model_projection(model: Type[BaseModel]) -> Dict[str, int]:
+    """MongoDB projection selecting exactly the fields of a pydantic model"""
+    projection = {name: 1 for name in model.model_fields}
+    projection["_id"] = 0
+    return projection
+
+
+def parse_fields(
+    fields: Optional[str],
+    model: Type[BaseModel],
+    always: Iterable[str] = ()
+) -> Optional[Dict[str, int]]:
+    """Turn a ?fields=a,b.c sparse fieldset into a MongoDB projection
+
+    Returns None when no fieldset was requested. Field names are checked
+    against the model so typos fail with 400 instead of silently returning
+    empty documents.
+    """
+    if not fields:
+        return None
+
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f.split(".")[0] not in model.model_fields]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}"
+        )
+
+    paths = list(dict.fromkeys([*always, *requested]))
+    # MongoDB rejects a projection containing both "a" and "a.b"
+    paths = [p for p in paths if not any(p.startswith(f"{other}.") for other in paths)]
+
+    projection = {path: 1 for path in paths}
+    projection["_id"] = 0
+    return projection
+
+
+def sparse_response(content) -> JSONResponse:
+    """Return a partial document as-is, bypassing the route's response_model"""
+    return JSONResponse(content=jsonable_encoder(content))
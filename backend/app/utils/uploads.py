@@ -0,0 +1,96 @@
+"""
+Chunked reading of uploaded files
+
+Uploads are never read whole. StreamedUpload hands the file out in
+UPLOAD_CHUNK_SIZE_MB pieces, to be passed on to storage as they are read,
+and keeps the size and SHA-256 of what has gone through so far. Going past
+MAX_UPLOAD_SIZE_MB raises 413 in the middle of the stream, before the rest
+is read or stored. hash() makes a pass over the file without storing it,
+for when the hash decides whether to store it at all.
+
+Requests that announce a body over the limit in their Content-Length are
+turned away by UploadSizeLimitMiddleware before the body is received.
+"""
+import hashlib
+from typing import AsyncIterator, Optional
+from fastapi import HTTPException, UploadFile, status
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.core.config import settings
+
+MB = 1024 * 1024
+
+# Room for the multipart boundaries and form fields around the file
+_MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+def _too_large_detail(max_mb: int) -> str:
+    return f"File exceeds the {max_mb} MB upload limit"
+
+
+class StreamedUpload:
+    def __init__(
+        self,
+        file: UploadFile,
+        max_size_mb: Optional[int] = None,
+        chunk_size_mb: Optional[int] = None
+    ):
+        self.file = file
+        self.max_size_mb = max_size_mb or settings.MAX_UPLOAD_SIZE_MB
+        self.chunk_size = (chunk_size_mb or settings.UPLOAD_CHUNK_SIZE_MB) * MB
+        self.size = 0
+        self._digest = hashlib.sha256()
+
+    @property
+    def sha256(self) -> str:
+        """Hex digest of the chunks read so far (the whole file once exhausted)"""
+        return self._digest.hexdigest()
+
+    @property
+    def size_mb(self) -> float:
+        return self.size / MB
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        """The file from its start, in chunks"""
+        await self.file.seek(0)
+        self.size = 0
+        self._digest = hashlib.sha256()
+        while True:
+            chunk = await self.file.read(self.chunk_size)
+            if not chunk:
+                return
+            self.size += len(chunk)
+            if self.size > self.max_size_mb * MB:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=_too_large_detail(self.max_size_mb)
+                )
+            self._digest.update(chunk)
+            yield chunk
+
+    async def hash(self) -> str:
+        """Read the whole file once for its size and SHA-256 (hex)"""
+        async for _ in self.chunks():
+            pass
+        return self.sha256
+
+
+class UploadSizeLimitMiddleware:
+    """Reject requests whose Content-Length is over the upload limit"""
+
+    def __init__(self, app: ASGIApp, max_size_mb: Optional[int] = None):
+        self.app = app
+        self.max_size_mb = max_size_mb or settings.MAX_UPLOAD_SIZE_MB
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            content_length = dict(scope["headers"]).get(b"content-length")
+            if content_length and content_length.isdigit() and \
+                    int(content_length) > self.max_size_mb * MB + _MULTIPART_OVERHEAD_BYTES:
+                response = JSONResponse(
+                    {"detail": _too_large_detail(self.max_size_mb)},
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
@@ -1,11 +1,27 @@
 from celery import Celery
+from kombu import Queue
 from app.core.config import settings
 
+# Queues, each served by its own workers (see docker-compose.yml):
+#   vlm_initial  initial session analyses (long, GPU/API bound)
+#   vlm_chat     chat-side VLM work (short, interactive)
+#   maintenance  backfills, counter rebuilds, migrations
+#   media        previews and thumbnails of uploaded images (CPU bound)
+QUEUE_VLM_INITIAL = "vlm_initial"
+QUEUE_VLM_CHAT = "vlm_chat"
+QUEUE_MAINTENANCE = "maintenance"
+QUEUE_MEDIA = "media"
+
+# Message priorities; with the Redis broker lower values are served first
+PRIORITY_URGENT = 0
+PRIORITY_PENDING_TESTS = 3
+PRIORITY_ROUTINE = 6
+
 celery_app = Celery(
     "medflow",
     broker=settings.REDIS_URL,
     backend=settings.REDIS_URL,
-    include=['app.tasks.vlm_tasks']
+    include=['app.tasks.vlm_tasks', 'app.tasks.maintenance_tasks', 'app.tasks.derivative_tasks']
 )
 
 celery_app.conf.update(
@@ -17,8 +33,31 @@ celery_app.conf.update(
     task_track_started=True,
     task_time_limit=30 * 60,  # 30 minutes
     result_expires=3600,  # 1 hour
+    task_queues=[
+        Queue(QUEUE_VLM_INITIAL),
+        Queue(QUEUE_VLM_CHAT),
+        Queue(QUEUE_MAINTENANCE),
+        Queue(QUEUE_MEDIA),
+    ],
+    task_default_queue=QUEUE_MAINTENANCE,
+    task_routes={
+        'vlm_tasks.*': {'queue': QUEUE_VLM_INITIAL},
+        'chat_tasks.*': {'queue': QUEUE_VLM_CHAT},
+        'maintenance_tasks.*': {'queue': QUEUE_MAINTENANCE},
+        'derivative_tasks.*': {'queue': QUEUE_MEDIA},
+    },
+    task_default_priority=PRIORITY_ROUTINE,
+    broker_transport_options={
+        'queue_order_strategy': 'priority',
+        'priority_steps': list(range(10)),
+        'sep': ':',
+    },
+    # Tasks run for minutes: reserve one message at a time, and acknowledge
+    # it only when done so a crashed worker's task is redelivered (and picks
+    # up the session it left in vlm_processing, see vlm_tasks._take_over)
+    worker_prefetch_multiplier=1,
+    task_acks_late=True,
 )
 
 if __name__ == '__main__':
     celery_app.start()
-
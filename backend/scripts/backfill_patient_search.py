@@ -0,0 +1,31 @@
+"""
+Write normalized search keys on patients registered before indexed search
+
+Safe to re-run: only patients missing one of the ``search`` keys are touched
+(including legacy patients edited since, which carry only the edited keys).
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.core.config import settings
+from app.services.search_service import backfill_search_keys
+
+
+async def main():
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db = client[settings.MONGODB_DB_NAME]
+
+    updated = await backfill_search_keys(db)
+    print(f"Wrote search keys for {updated} patients")
+
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,101 @@
+"""
+Benchmark rendering of image previews and thumbnails
+
+Renders the preview and thumbnail of synthetic radiographs (16-bit grayscale
+PNGs) and photos (RGB JPEGs) two ways, and reports time per image and the
+bytes a viewer loads for the original against its derivatives:
+
+  resize from original   each derivative resized from the full image with
+                         Pillow's Lanczos filter
+  render_derivatives     NumPy block averaging down to within 2x of the
+                         target, Lanczos for the rest, thumbnail from preview
+
+Usage:
+    python scripts/bench_image_derivatives.py [--images 6] [--width 3000] [--height 2500]
+"""
+import argparse
+import io
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+# Add parent directory to path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app.core.config import settings
+from app.services.image_derivatives import decode_pixels, encode_jpeg, render_derivatives, to_display_pixels
+
+
+def synthetic_radiograph(width: int, height: int, seed: int) -> bytes:
+    """Smooth 12-bit structure with noise, stored as a 16-bit PNG"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    body = np.exp(-(((x - width / 2) / (width / 3)) ** 2 + ((y - height / 2) / (height / 2.2)) ** 2))
+    ribs = 0.15 * np.sin(y / (height / 40)) * body
+    pixels = (body + ribs) * 3000 + rng.normal(0, 40, (height, width)) + 500
+    buffer = io.BytesIO()
+    Image.fromarray(np.clip(pixels, 0, 4095).astype(np.uint16)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def synthetic_photo(width: int, height: int, seed: int) -> bytes:
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    pixels = np.stack([x * 255 // width, y * 255 // height, (x + y) * 255 // (width + height)], axis=-1)
+    pixels = np.clip(pixels + rng.normal(0, 8, pixels.shape), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, "JPEG", quality=92)
+    return buffer.getvalue()
+
+
+def resize_from_original(data: bytes):
+    """Each derivative resized from the full-size image, for comparison"""
+    with Image.open(io.BytesIO(data)) as image:
+        pixels = to_display_pixels(image)
+    rendered = []
+    for max_px in (settings.DERIVATIVE_PREVIEW_MAX_PX, settings.DERIVATIVE_THUMBNAIL_MAX_PX):
+        image = Image.fromarray(pixels)
+        scale = max_px / max(image.size)
+        resized = image.resize((round(image.width * scale), round(image.height * scale)), Image.LANCZOS)
+        rendered.append(encode_jpeg(np.asarray(resized)))
+    return rendered
+
+
+def measure(name, render, originals):
+    start = time.perf_counter()
+    results = [render(data) for data in originals]
+    elapsed = time.perf_counter() - start
+    print(f"    {name:<22} {elapsed / len(originals) * 1000:7.1f}ms per image")
+    return results
+
+
+def main(images: int, width: int, height: int):
+    print(f"{images} images of {width}x{height}, preview {settings.DERIVATIVE_PREVIEW_MAX_PX}px, "
+          f"thumbnail {settings.DERIVATIVE_THUMBNAIL_MAX_PX}px")
+    for label, make in [("radiographs (16-bit PNG)", synthetic_radiograph), ("photos (RGB JPEG)", synthetic_photo)]:
+        originals = [make(width, height, seed) for seed in range(images)]
+        print(f"  {label}")
+        measure("resize from original", resize_from_original, originals)
+        rendered = measure(
+            "render_derivatives",
+            lambda data: render_derivatives(decode_pixels(io.BytesIO(data), settings.DERIVATIVE_PREVIEW_MAX_PX)),
+            originals
+        )
+
+        original_kb = sum(map(len, originals)) / len(originals) / 1024
+        preview_kb = sum(len(r[0][1]) for r in rendered) / len(rendered) / 1024
+        thumbnail_kb = sum(len(r[1][1]) for r in rendered) / len(rendered) / 1024
+        print(f"    original {original_kb:8.0f} KB  preview {preview_kb:6.0f} KB  thumbnail {thumbnail_kb:5.0f} KB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=6, help="Images of each kind")
+    parser.add_argument("--width", type=int, default=3000)
+    parser.add_argument("--height", type=int, default=2500)
+    args = parser.parse_args()
+    main(args.images, args.width, args.height)
@@ -0,0 +1,143 @@
+"""
+Benchmark indexed patient search against the legacy unanchored regex scan
+
+Loads synthetic patients into a throwaway database (1M by default; the load
+is skipped when the database already holds enough), then times typical
+PatientSearch queries with both implementations.
+
+Usage:
+    python scripts/bench_patient_search.py [--patients 1000000] [--repeat 20] [--keep]
+"""
+import argparse
+import asyncio
+import math
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Add parent directory to path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.core.config import settings
+from app.core import database
+from app.services.search_service import build_search_keys, search_patients
+
+BENCH_DB_NAME = f"{settings.MONGODB_DB_NAME}_bench_search"
+
+FIRST_NAMES = [
+    "Ahmed", "Mohamed", "Mahmoud", "Omar", "Youssef", "Mostafa", "Karim", "Hassan",
+    "Ali", "Tarek", "Fatma", "Mona", "Sara", "Nour", "Aya", "Mariam", "Hana", "Salma",
+    "Laila", "Dina", "Amr", "Khaled", "Ibrahim", "Yasmin", "Rana", "Heba",
+]
+LAST_NAMES = [
+    "Hassan", "Samir", "Mostafa", "Abdelrahman", "ElSayed", "Fahmy", "Nasser",
+    "Soliman", "Ghoneim", "Farouk", "Kamel", "Shaker", "Ragab", "Zaki", "Lotfy",
+]
+
+
+def synthetic_patient(n: int, rng: random.Random) -> dict:
+    name = " ".join([rng.choice(FIRST_NAMES), rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)])
+    patient = {
+        "patient_id": f"P-{n:07d}",
+        "name": name,
+        "national_id": f"2{rng.randint(10**12, 10**13 - 1)}",
+        "phone_primary": f"01{rng.choice('0125')}{rng.randint(10**7, 10**8 - 1)}",
+        "phone_secondary": None,
+        "age": rng.randint(1, 95),
+        "sex": rng.choice(["male", "female"]),
+        "registration_date": datetime.utcnow(),
+        "total_sessions": 0,
+        "last_session_date": None,
+    }
+    patient["search"] = build_search_keys(patient)
+    return patient
+
+
+async def load_patients(db, count: int, batch_size: int = 10000):
+    existing = await db.patients.estimated_document_count()
+    if existing >= count:
+        print(f"Reusing {existing} existing synthetic patients")
+        return
+    await db.patients.delete_many({})
+    rng = random.Random(42)
+    start = time.perf_counter()
+    for offset in range(0, count, batch_size):
+        batch = [synthetic_patient(n, rng) for n in range(offset + 1, min(offset + batch_size, count) + 1)]
+        await db.patients.insert_many(batch, ordered=False)
+    print(f"Loaded {count} patients in {time.perf_counter() - start:.1f}s")
+
+
+def legacy_filter(query: str) -> dict:
+    """The unanchored, case-insensitive $or used before indexed search"""
+    return {
+        "$or": [
+            {"name": {"$regex": query, "$options": "i"}},
+            {"phone_primary": {"$regex": query}},
+            {"phone_secondary": {"$regex": query}},
+            {"national_id": {"$regex": query}},
+        ]
+    }
+
+
+async def legacy_search(db, query: str, limit: int = 20):
+    return await db.patients.find(legacy_filter(query)).limit(limit).to_list(length=limit)
+
+
+async def time_queries(search, db, queries, repeat: int) -> list:
+    timings = []
+    for _ in range(repeat):
+        for query in queries:
+            start = time.perf_counter()
+            await search(db, query)
+            timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def summarize(timings: list) -> str:
+    timings = sorted(timings)
+    p95 = timings[math.ceil(len(timings) * 0.95) - 1]
+    return f"p50 {statistics.median(timings):8.2f} ms   p95 {p95:8.2f} ms   max {timings[-1]:8.2f} ms"
+
+
+async def main(args):
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    database.db.client = client
+    database.db.db = client[BENCH_DB_NAME]
+    db = database.db.db
+
+    await load_patients(db, args.patients)
+    await database.create_indexes()
+
+    sample = await db.patients.find({}, {"patient_id": 1, "national_id": 1, "phone_primary": 1}).limit(5).to_list(5)
+    query_sets = {
+        "name prefix": ["ahm", "mona sam", "youssef has", "salma"],
+        "phone prefix": [p["phone_primary"][:7] for p in sample],
+        "exact ID": [p["patient_id"] for p in sample] + [p["national_id"] for p in sample],
+        "no match": ["zzzz", "09999999"],
+    }
+
+    # Unanchored regexes scan the whole collection, so keep their repeat count low
+    legacy_repeat = max(1, args.repeat // 10)
+    for label, queries in query_sets.items():
+        print(f"\n{label} ({len(queries)} queries)")
+        indexed = await time_queries(search_patients, db, queries, args.repeat)
+        print(f"  indexed  {summarize(indexed)}")
+        legacy = await time_queries(legacy_search, db, queries, legacy_repeat)
+        print(f"  legacy   {summarize(legacy)}")
+
+    if not args.keep:
+        await client.drop_database(BENCH_DB_NAME)
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patients", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="Keep the synthetic database for later runs")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,131 @@
+"""
+Benchmark parsing of initial VLM analyses
+
+Compares the previous parser, which ran once generation had finished and
+checked every section header against every line, with the incremental
+InitialResponseParser, fed the whole response at once and token by token
+(as when streaming). All three must produce the same sections.
+
+Responses are read from a JSON lines file of recorded answers (one
+{"response": "..."} object, or a plain string, per line), or else built
+from the local inference backend's answers, their sections repeated until each
+is about --size kilobytes.
+
+Usage:
+    python scripts/bench_response_parser.py [--responses recorded.jsonl] [--size 256] [--count 20]
+"""
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app.services.inference_backends import LocalInferenceBackend
+from app.services.response_parser import InitialResponseParser, LIST_SECTIONS, SECTION_HEADERS
+
+PROMPT = """PRESENTING COMPLAINT:
+Persistent dry cough ({n})
+
+CURRENT STATE:
+Worse at night, no fever
+"""
+
+
+def previous_parse(response: str):
+    """The parser used before InitialResponseParser, for comparison"""
+    parsed = {name: [] if name in LIST_SECTIONS else "" for name in SECTION_HEADERS.values()}
+    current_section = None
+    for line in response.split('\n'):
+        line = line.strip()
+        for header, section_name in SECTION_HEADERS.items():
+            if header in line.upper():
+                current_section = section_name
+                break
+        else:
+            if current_section and line:
+                if current_section in LIST_SECTIONS:
+                    cleaned = line.lstrip('0123456789.-•* ')
+                    if cleaned:
+                        parsed[current_section].append(cleaned)
+                elif parsed[current_section]:
+                    parsed[current_section] += " " + line
+                else:
+                    parsed[current_section] = line
+    return parsed
+
+
+def incremental_parse(chunks):
+    parser = InitialResponseParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    parser.close()
+    return parser.sections()
+
+
+def synthetic_responses(count: int, size_kb: int):
+    """Long answers: every section of a local-backend answer grown in turn"""
+    backend = LocalInferenceBackend(distribution="constant", latency_mean_seconds=0.0)
+    responses = []
+    for n in range(count):
+        answer = "".join(backend._answer_tokens(PROMPT.format(n=n), "bench-model", None))
+        sections = re.split(r"\n(?=[A-Z ]+:\n)", answer.strip())
+        body = []
+        while sum(map(len, body)) < size_kb * 1024:
+            for section in sections:
+                header, content = section.split("\n", 1)
+                body.append(f"{header}\n" + "\n".join([content] * 20) + "\n\n")
+        responses.append("".join(body))
+    return responses
+
+
+def recorded_responses(path: Path):
+    responses = []
+    for line in path.read_text().splitlines():
+        if line.strip():
+            record = json.loads(line)
+            responses.append(record["response"] if isinstance(record, dict) else record)
+    return responses
+
+
+def measure(name, parse, inputs, total_bytes):
+    start = time.perf_counter()
+    results = [parse(item) for item in inputs]
+    elapsed = time.perf_counter() - start
+    print(f"  {name:<24} {elapsed * 1000:8.1f}ms  {total_bytes / elapsed / 1e6:7.1f} MB/s")
+    return results
+
+
+def main(responses_file, size_kb: int, count: int):
+    responses = recorded_responses(Path(responses_file)) if responses_file else synthetic_responses(count, size_kb)
+    streamed = [re.findall(r"\S+\s*|\s+", response) for response in responses]
+    total_bytes = sum(len(response.encode()) for response in responses)
+    print(f"{len(responses)} responses, {total_bytes / 1e6:.1f} MB, "
+          f"{sum(map(len, streamed)) / len(streamed):.0f} tokens each on average")
+
+    previous = measure("previous (whole)", previous_parse, responses, total_bytes)
+    whole = measure("incremental (whole)", lambda response: incremental_parse([response]), responses, total_bytes)
+    tokens = measure("incremental (streamed)", incremental_parse, streamed, total_bytes)
+
+    if not previous == whole == tokens:
+        raise SystemExit("Parsers disagree")
+
+    # How far into generation the first section could be published
+    first_section = []
+    for chunks in streamed:
+        parser = InitialResponseParser()
+        first_section.append(next((n for n, chunk in enumerate(chunks, 1) if parser.feed(chunk)), len(chunks)) / len(chunks))
+    print(f"  first section complete after {100 * sum(first_section) / len(first_section):.1f}% of tokens on average")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--responses", help="JSON lines file of recorded responses")
+    parser.add_argument("--size", type=int, default=256, help="Kilobytes per synthetic response")
+    parser.add_argument("--count", type=int, default=20, help="Number of synthetic responses")
+    args = parser.parse_args()
+    main(args.responses, args.size, args.count)
@@ -0,0 +1,85 @@
+"""
+Benchmark per-insert vs block-allocated ID sequences under concurrent writers
+
+Each simulated API worker gets its own SequenceAllocator (as each uvicorn
+process would) and runs several concurrent writers that draw IDs from it.
+Runs against the configured MongoDB in a throwaway database.
+
+Usage:
+    python scripts/bench_sequences.py [--workers 8] [--writers 25] [--ids 40]
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.core.config import settings
+from app.core.database import db, SequenceAllocator
+
+BENCH_DB_NAME = f"{settings.MONGODB_DB_NAME}_bench_sequences"
+
+
+async def run_scenario(block_size: int, workers: int, writers: int, ids_per_writer: int) -> dict:
+    """Draw workers * writers * ids_per_writer IDs and time it"""
+    sequence_name = f"bench_block_{block_size}"
+    await db.db.counters.delete_one({"_id": sequence_name})
+
+    allocators = [SequenceAllocator(block_size) for _ in range(workers)]
+    issued = []
+
+    async def writer(allocator: SequenceAllocator):
+        for _ in range(ids_per_writer):
+            issued.append(await allocator.next_value(sequence_name))
+
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        writer(allocator)
+        for allocator in allocators
+        for _ in range(writers)
+    ])
+    elapsed = time.perf_counter() - start
+
+    if len(set(issued)) != len(issued):
+        raise RuntimeError(f"Duplicate IDs issued with block size {block_size}")
+
+    counter = await db.db.counters.find_one({"_id": sequence_name})
+    return {
+        "block_size": block_size,
+        "ids": len(issued),
+        "seconds": elapsed,
+        "ids_per_second": len(issued) / elapsed,
+        "counter_writes": counter["sequence_value"] // block_size,
+    }
+
+
+async def main(args):
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db.client = client
+    db.db = client[BENCH_DB_NAME]
+
+    print(f"{args.workers} workers x {args.writers} writers x {args.ids} IDs\n")
+    print(f"{'block':>6} {'ids':>8} {'seconds':>9} {'ids/s':>10} {'counter writes':>15}")
+    for block_size in (1, args.block_size):
+        result = await run_scenario(block_size, args.workers, args.writers, args.ids)
+        print(
+            f"{result['block_size']:>6} {result['ids']:>8} {result['seconds']:>9.2f} "
+            f"{result['ids_per_second']:>10.0f} {result['counter_writes']:>15}"
+        )
+
+    await client.drop_database(BENCH_DB_NAME)
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=8, help="Simulated API worker processes")
+    parser.add_argument("--writers", type=int, default=25, help="Concurrent writers per worker")
+    parser.add_argument("--ids", type=int, default=40, help="IDs drawn by each writer")
+    parser.add_argument("--block-size", type=int, default=settings.SEQUENCE_BLOCK_SIZE)
+    asyncio.run(main(parser.parse_args()))
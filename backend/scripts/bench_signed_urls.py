@@ -0,0 +1,137 @@
+"""
+Benchmark signed URL issuance for session file viewers
+
+Simulates a viewer opening (or polling) a session with --files files, --views
+times, against a session in a throwaway database on the configured MongoDB.
+URLs are V4-signed by the GCS backend with a throwaway service account key
+generated for the run, which signs locally (no network, no real credentials
+needed). Three ways of getting a page view's URLs are compared:
+
+  per file, uncached   one URL request per file, each signing afresh, as
+                       before signed URLs were cached
+  per file, cached     one URL request per file, signatures reused
+  batch, cached        GET /sessions/{id}/files/urls: one query for the
+                       session, signatures reused
+
+Reports wall time and CPU time per page view, the first (cold) view
+included in the averages.
+
+Usage:
+    python scripts/bench_signed_urls.py [--files 12] [--views 50]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+# Add parent directory to path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+
+def write_service_account_key(directory: str) -> str:
+    """A service account key file good for signing, and nothing else"""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption()
+    ).decode()
+    path = Path(directory) / "bench-service-account.json"
+    path.write_text(json.dumps({
+        "type": "service_account",
+        "project_id": "medflow-bench",
+        "private_key_id": "bench",
+        "private_key": pem,
+        "client_email": "bench@medflow-bench.iam.gserviceaccount.com",
+        "client_id": "0",
+        "token_uri": "https://oauth2.googleapis.com/token",
+    }))
+    return str(path)
+
+
+key_dir = tempfile.TemporaryDirectory(prefix="medflow-bench-urls-")
+os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = write_service_account_key(key_dir.name)
+
+from app.core.config import settings
+
+settings.MONGODB_DB_NAME = f"{settings.MONGODB_DB_NAME}_bench_urls"
+settings.STORAGE_BACKEND = "gcs"
+settings.GOOGLE_APPLICATION_CREDENTIALS = os.environ["GOOGLE_APPLICATION_CREDENTIALS"]
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.services import session_service
+from app.services.storage_service import storage_service
+
+SESSION_ID = "S-00001"
+
+
+async def per_file_uncached(db, file_ids):
+    async def one(file_id):
+        storage_service._url_cache.clear()
+        return await session_service.get_file_signed_url(db, SESSION_ID, file_id)
+    return await asyncio.gather(*[one(file_id) for file_id in file_ids])
+
+
+async def per_file_cached(db, file_ids):
+    return await asyncio.gather(*[
+        session_service.get_file_signed_url(db, SESSION_ID, file_id) for file_id in file_ids
+    ])
+
+
+async def batch_cached(db, file_ids):
+    return list((await session_service.get_file_signed_urls(db, [SESSION_ID]))[SESSION_ID].values())
+
+
+async def main(files: int, views: int):
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db = client[settings.MONGODB_DB_NAME]
+    await client.drop_database(settings.MONGODB_DB_NAME)
+    now = datetime.utcnow()
+    file_ids = [f"F-{n:05d}" for n in range(files)]
+    await db.sessions.insert_one({
+        "session_id": SESSION_ID, "patient_id": "P-00001", "session_status": "doctor_review",
+        "uploaded_files": [{
+            "file_id": file_id, "file_name": f"scan-{file_id}.png", "file_type": "xray",
+            "file_path": f"gs://{settings.GCS_BUCKET_NAME}/sessions/{SESSION_ID}/{file_id}_scan.png",
+            "file_size_mb": 1.0, "uploaded_at": now, "uploaded_by": "N-00001",
+        } for file_id in file_ids],
+        "created_at": now, "last_updated": now,
+    })
+
+    print(f"{views} page views of a session with {files} files, GCS V4 signing")
+    for name, view in [
+        ("per file, uncached", per_file_uncached),
+        ("per file, cached", per_file_cached),
+        ("batch, cached", batch_cached),
+    ]:
+        storage_service._url_cache.clear()
+        wall = cpu = 0.0
+        for _ in range(views):
+            start, start_cpu = time.perf_counter(), time.process_time()
+            urls = await view(db, file_ids)
+            wall += time.perf_counter() - start
+            cpu += time.process_time() - start_cpu
+            if len(urls) != files:
+                raise RuntimeError(f"{name} returned {len(urls)} URLs for {files} files")
+        print(f"  {name:<20} {wall / views * 1000:7.2f}ms  cpu {cpu / views * 1000:7.2f}ms per view")
+
+    await client.drop_database(settings.MONGODB_DB_NAME)
+    client.close()
+    key_dir.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=12, help="Files in the viewed session")
+    parser.add_argument("--views", type=int, default=50, help="Page views (or polls) of the session")
+    args = parser.parse_args()
+    asyncio.run(main(args.files, args.views))
@@ -0,0 +1,125 @@
+"""
+Benchmark storage upload/download throughput and event loop stalls
+
+Uploads and then downloads a set of files concurrently through the local
+storage backend, in a temporary directory (no network, no credentials
+needed), while a ticker coroutine measures how late the event loop wakes
+it up. Two modes are compared:
+
+  on event loop   file I/O done directly in the coroutines, as the GCS
+                  client calls were before storage backends
+  thread pool     LocalStorageBackend, every blocking call on the bounded
+                  storage thread pool
+
+Usage:
+    python scripts/bench_storage_throughput.py [--files 16] [--size-mb 32]
+"""
+import argparse
+import asyncio
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import AsyncIterator
+
+# Add parent directory to path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app.core.config import settings
+from app.services.storage_backends import LocalStorageBackend
+
+MB = 1024 * 1024
+TICK_SECONDS = 0.01
+
+
+class BlockingLocalBackend(LocalStorageBackend):
+    """Same files, but every read and write blocks the event loop"""
+
+    async def upload_stream(self, chunks, destination_path, content_type):
+        path = self.local_path(destination_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            async for chunk in chunks:
+                f.write(chunk)
+        return f"local://{destination_path}"
+
+    async def download_stream(self, file_path):
+        with open(self.local_path(file_path), "rb") as f:
+            while chunk := f.read(settings.UPLOAD_CHUNK_SIZE_MB * MB):
+                yield chunk
+
+
+def payload_chunks(size_mb: int) -> AsyncIterator[bytes]:
+    block = os.urandom(settings.UPLOAD_CHUNK_SIZE_MB * MB)
+
+    async def chunks():
+        for _ in range(size_mb // settings.UPLOAD_CHUNK_SIZE_MB):
+            yield block
+            await asyncio.sleep(0)
+    return chunks()
+
+
+async def ticker(lags, stop: asyncio.Event):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + TICK_SECONDS
+        await asyncio.sleep(TICK_SECONDS)
+        lags.append(max(loop.time() - expected, 0))
+
+
+async def run_mode(backend: LocalStorageBackend, files: int, size_mb: int):
+    lags = []
+    stop = asyncio.Event()
+    tick = asyncio.create_task(ticker(lags, stop))
+
+    start = time.perf_counter()
+    paths = await asyncio.gather(*[
+        backend.upload_stream(payload_chunks(size_mb), f"bench/file-{n}.bin", "application/octet-stream")
+        for n in range(files)
+    ])
+    upload_seconds = time.perf_counter() - start
+
+    async def download(path):
+        return sum([len(chunk) async for chunk in backend.download_stream(path)])
+
+    start = time.perf_counter()
+    sizes = await asyncio.gather(*[download(path) for path in paths])
+    download_seconds = time.perf_counter() - start
+
+    stop.set()
+    await tick
+    if sum(sizes) != files * size_mb * MB:
+        raise RuntimeError("Downloaded size doesn't match the upload")
+
+    ordered = sorted(lag * 1000 for lag in lags)
+    return {
+        "upload_mb_s": files * size_mb / upload_seconds,
+        "download_mb_s": files * size_mb / download_seconds,
+        "lag_p99_ms": ordered[math.ceil(len(ordered) * 0.99) - 1],
+        "lag_max_ms": ordered[-1],
+    }
+
+
+async def main(files: int, size_mb: int):
+    print(f"{files} files of {size_mb} MB, {settings.UPLOAD_CHUNK_SIZE_MB} MB chunks, "
+          f"{settings.STORAGE_MAX_CONCURRENCY} storage threads")
+    for name, backend_class in [("on event loop", BlockingLocalBackend), ("thread pool", LocalStorageBackend)]:
+        root = tempfile.mkdtemp(prefix="medflow-bench-storage-")
+        try:
+            result = await run_mode(backend_class(root), files, size_mb)
+        finally:
+            shutil.rmtree(root)
+        print(f"  {name:<14} upload {result['upload_mb_s']:7.0f} MB/s  download {result['download_mb_s']:7.0f} MB/s  "
+              f"loop lag p99 {result['lag_p99_ms']:6.1f}ms max {result['lag_max_ms']:6.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=16, help="Files uploaded and downloaded concurrently")
+    parser.add_argument("--size-mb", type=int, default=32, help="Size of each file")
+    args = parser.parse_args()
+    asyncio.run(main(args.files, args.size_mb))
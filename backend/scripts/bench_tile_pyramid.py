@@ -0,0 +1,104 @@
+"""
+Benchmark deep zoom tile pyramids of large radiographs
+
+Builds the pyramid of a synthetic radiograph (a 16-bit grayscale PNG) and
+compares the bytes a viewer downloads with and without it:
+
+  whole file   the original, fetched through its signed URL before any
+               zooming or panning can happen
+  pyramid      the tiles covering a --viewport sized window: the whole image
+               at the level that fits it, then one window's worth at full
+               resolution after zooming in
+
+Also reports the time to cut the pyramid two ways: each level resized from
+the full image with Pillow, and halved from the level above by averaging
+2 x 2 blocks with NumPy (as image_derivatives does).
+
+Usage:
+    python scripts/bench_tile_pyramid.py [--width 4000] [--height 3300] [--viewport 1600x900]
+"""
+import argparse
+import io
+import math
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+# Add parent directory to path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app.core.config import settings
+from app.services.image_derivatives import decode_pixels, encode_tiles, halve
+from app.utils import deep_zoom
+from scripts.bench_image_derivatives import synthetic_radiograph
+
+
+def resized_levels(pixels: np.ndarray):
+    """Every level resized from the full image, for comparison"""
+    height, width = pixels.shape[:2]
+    full = Image.fromarray(pixels)
+    for level in range(deep_zoom.max_level(width, height), -1, -1):
+        size = deep_zoom.level_size(width, height, level)
+        yield level, pixels if size == (width, height) else np.asarray(full.resize(size, Image.BOX))
+
+
+def halved_levels(pixels: np.ndarray):
+    height, width = pixels.shape[:2]
+    for level in range(deep_zoom.max_level(width, height), -1, -1):
+        yield level, pixels
+        if level > 0:
+            pixels = halve(pixels)
+
+
+def build(levels):
+    """Tiles of every level: {(level, col, row): jpeg}"""
+    return {(level, col, row): data for level, pixels in levels for col, row, data in encode_tiles(pixels)}
+
+
+def visible_tiles(width: int, height: int, level: int, left: int, top: int, view_w: int, view_h: int):
+    """Tiles of a level intersecting a window of it"""
+    level_w, level_h = deep_zoom.level_size(width, height, level)
+    size = settings.DZI_TILE_SIZE
+    cols = range(left // size, min(math.ceil((left + view_w) / size), math.ceil(level_w / size)))
+    rows = range(top // size, min(math.ceil((top + view_h) / size), math.ceil(level_h / size)))
+    return [(level, col, row) for col in cols for row in rows]
+
+
+def main(width: int, height: int, viewport: str):
+    view_w, view_h = map(int, viewport.split("x"))
+    original = synthetic_radiograph(width, height, seed=0)
+    pixels = decode_pixels(io.BytesIO(original))
+    print(f"{width}x{height} radiograph, {len(original) / 1024:.0f} KB, "
+          f"{settings.DZI_TILE_SIZE}px tiles, {view_w}x{view_h} viewport")
+
+    for name, levels in [("resize each level", resized_levels), ("halve level above", halved_levels)]:
+        start = time.perf_counter()
+        tiles = build(levels(pixels))
+        print(f"  {name:<18} {(time.perf_counter() - start) * 1000:7.0f}ms  "
+              f"{len(tiles)} tiles, {sum(map(len, tiles.values())) / 1024:.0f} KB")
+
+    fit_level = max(
+        level for level in range(deep_zoom.max_level(width, height) + 1)
+        if all(a <= b for a, b in zip(deep_zoom.level_size(width, height, level), (view_w, view_h)))
+    )
+    overview = visible_tiles(width, height, fit_level, 0, 0, view_w, view_h)
+    zoomed = visible_tiles(
+        width, height, deep_zoom.max_level(width, height),
+        (width - view_w) // 2, (height - view_h) // 2, view_w, view_h
+    )
+    for label, keys in [("whole image in view", overview), ("zoomed to full size", zoomed)]:
+        kb = sum(len(tiles[key]) for key in keys) / 1024
+        print(f"  {label:<20} {len(keys):4d} tiles {kb:7.0f} KB  vs whole file {len(original) / 1024:.0f} KB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3300)
+    parser.add_argument("--viewport", default="1600x900", help="Viewer size, WIDTHxHEIGHT")
+    args = parser.parse_args()
+    main(args.width, args.height, args.viewport)
@@ -0,0 +1,111 @@
+"""
+Benchmark deduplicated uploads of repeated files
+
+Uploads --uploads files of --size-mb each through upload_session_file, to
+draft sessions in a throwaway database on the configured MongoDB, drawn from
+--distinct different contents (so the rest are repeats, as with follow-up
+sessions re-sending an X-ray or a tablet retrying). Reports the time of first
+and duplicate uploads and the blob_stats totals: bytes stored against bytes
+uploaded, and the upload time duplicates saved.
+
+Files are stored with the configured storage backend (the local one writes to
+a temporary directory); --storage-latency-ms adds a delay per stored chunk to
+stand in for a remote store's round trips.
+
+Usage:
+    python scripts/bench_upload_dedup.py [--uploads 40] [--distinct 10] [--size-mb 8] [--storage-latency-ms 20]
+"""
+import argparse
+import asyncio
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Add parent directory to path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app.core.config import settings
+
+settings.MONGODB_DB_NAME = f"{settings.MONGODB_DB_NAME}_bench_dedup"
+settings.LOCAL_STORAGE_DIR = tempfile.mkdtemp(prefix="medflow-bench-dedup-")
+
+from fastapi import UploadFile
+from motor.motor_asyncio import AsyncIOMotorClient
+from starlette.datastructures import Headers
+from app.models.session import FileType
+from app.services import blob_store, session_service
+from app.services.storage_service import storage_service
+
+MB = 1024 * 1024
+
+
+def delay_storage(latency_seconds: float):
+    """Wrap the backend's upload so every chunk costs a round trip"""
+    upload_stream = storage_service.backend.upload_stream
+
+    async def delayed(chunks, destination_path, content_type):
+        async def slow_chunks():
+            async for chunk in chunks:
+                await asyncio.sleep(latency_seconds)
+                yield chunk
+        return await upload_stream(slow_chunks(), destination_path, content_type)
+
+    storage_service.backend.upload_stream = delayed
+
+
+async def main(uploads: int, distinct: int, size_mb: int, latency_ms: float):
+    delay_storage(latency_ms / 1000)
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db = client[settings.MONGODB_DB_NAME]
+    await client.drop_database(settings.MONGODB_DB_NAME)
+    now = datetime.utcnow()
+    await db.sessions.insert_many([{
+        "session_id": f"S-{n:05d}", "patient_id": "P-00001", "session_status": "draft",
+        "uploaded_files": [], "created_at": now, "last_updated": now,
+    } for n in range(uploads)])
+
+    contents = [os.urandom(size_mb * MB) for _ in range(distinct)]
+    timings = {False: [], True: []}
+    for n in range(uploads):
+        upload = UploadFile(
+            io.BytesIO(contents[n % distinct]),
+            filename=f"scan-{n}.png",
+            headers=Headers({"content-type": "image/png"})
+        )
+        stats_before = await blob_store.get_stats(db)
+        start = time.perf_counter()
+        await session_service.upload_session_file(db, f"S-{n:05d}", upload, FileType.xray, "N-00001")
+        elapsed = time.perf_counter() - start
+        duplicate = (await blob_store.get_stats(db))["duplicate_uploads"] > stats_before["duplicate_uploads"]
+        timings[duplicate].append(elapsed)
+
+    stats = await blob_store.get_stats(db)
+    uploaded_mb = uploads * size_mb
+    print(f"{uploads} uploads of {size_mb} MB, {distinct} distinct, "
+          f"{latency_ms:.0f}ms storage latency per {settings.UPLOAD_CHUNK_SIZE_MB} MB chunk")
+    for duplicate, label in [(False, "first copies"), (True, "duplicates")]:
+        if timings[duplicate]:
+            mean = sum(timings[duplicate]) / len(timings[duplicate])
+            print(f"  {label:<13} {len(timings[duplicate]):4d} uploads  {mean * 1000:8.1f}ms each")
+    print(f"  stored {stats['stored_bytes'] / MB:.0f} MB of {uploaded_mb} MB uploaded, "
+          f"{stats['bytes_saved'] / MB:.0f} MB and {stats['upload_seconds_saved']:.1f}s of storage upload saved")
+
+    await client.drop_database(settings.MONGODB_DB_NAME)
+    client.close()
+    shutil.rmtree(settings.LOCAL_STORAGE_DIR)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uploads", type=int, default=40, help="Files uploaded")
+    parser.add_argument("--distinct", type=int, default=10, help="Different contents among them")
+    parser.add_argument("--size-mb", type=int, default=8, help="Size of each file")
+    parser.add_argument("--storage-latency-ms", type=float, default=20.0, help="Delay per stored chunk")
+    args = parser.parse_args()
+    asyncio.run(main(args.uploads, args.distinct, args.size_mb, args.storage_latency_ms))
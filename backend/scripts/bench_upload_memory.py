@@ -0,0 +1,136 @@
+"""
+Benchmark peak memory of concurrent large file uploads
+
+Uploads several large files at once to draft sessions in a throwaway
+database on the configured MongoDB, through upload_session_file, and
+reports how far the process's peak RSS rose above where it stood before the
+uploads. Two modes are compared, each in a fresh subprocess so their peaks
+don't mix:
+
+  buffered   the previous upload path: the whole file read into memory,
+             then handed to storage
+  streamed   upload_session_file: UPLOAD_CHUNK_SIZE_MB chunks passed to
+             storage as they are read, sized and hashed on the way
+
+Files are read from temporary files on disk, as FastAPI's multipart parser
+leaves them, and stored with the configured storage backend (the local one
+writes to a temporary directory).
+
+Usage:
+    python scripts/bench_upload_memory.py [--files 4] [--size-mb 200]
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Add parent directory to path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app.core.config import settings
+
+settings.MONGODB_DB_NAME = f"{settings.MONGODB_DB_NAME}_bench_upload"
+settings.LOCAL_STORAGE_DIR = tempfile.mkdtemp(prefix="medflow-bench-upload-")
+
+from fastapi import UploadFile
+from motor.motor_asyncio import AsyncIOMotorClient
+from starlette.datastructures import Headers
+from app.models.session import FileType
+from app.services import session_service
+from app.services.storage_service import storage_service
+
+MB = 1024 * 1024
+
+
+async def buffered_upload(db, session_id: str, file: UploadFile):
+    """The upload path before streaming, for comparison"""
+    await db.sessions.find_one({"session_id": session_id}, {"session_status": 1})
+    file_content = await file.read()
+    await storage_service.upload_file(
+        file_content,
+        f"sessions/{session_id}/F-bench_{file.filename}",
+        file.content_type
+    )
+    return len(file_content)
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def run_mode(mode: str, files: int, size_mb: int):
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db = client[settings.MONGODB_DB_NAME]
+    await client.drop_database(settings.MONGODB_DB_NAME)
+    now = datetime.utcnow()
+    await db.sessions.insert_many([{
+        "session_id": f"S-{n:05d}", "patient_id": "P-00001", "session_status": "draft",
+        "uploaded_files": [], "created_at": now, "last_updated": now,
+    } for n in range(files)])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for n in range(files):
+            path = Path(tmp) / f"scan-{n}.dcm"
+            with open(path, "wb") as f:
+                for _ in range(size_mb):
+                    f.write(os.urandom(MB))
+            paths.append(path)
+
+        uploads = [
+            UploadFile(open(path, "rb"), filename=path.name, headers=Headers({"content-type": "application/dicom"}))
+            for path in paths
+        ]
+        baseline = peak_rss_mb()
+        start = time.perf_counter()
+        if mode == "buffered":
+            await asyncio.gather(*[
+                buffered_upload(db, f"S-{n:05d}", upload) for n, upload in enumerate(uploads)
+            ])
+        else:
+            await asyncio.gather(*[
+                session_service.upload_session_file(db, f"S-{n:05d}", upload, FileType.ct, "N-00001")
+                for n, upload in enumerate(uploads)
+            ])
+        elapsed = time.perf_counter() - start
+        for upload in uploads:
+            await upload.close()
+
+    await client.drop_database(settings.MONGODB_DB_NAME)
+    client.close()
+    shutil.rmtree(settings.LOCAL_STORAGE_DIR)
+    return {"mode": mode, "peak_rss_increase_mb": peak_rss_mb() - baseline, "seconds": elapsed}
+
+
+def main(files: int, size_mb: int):
+    print(f"{files} concurrent uploads of {size_mb} MB, {settings.UPLOAD_CHUNK_SIZE_MB} MB chunks")
+    for mode in ("buffered", "streamed"):
+        output = subprocess.run(
+            [sys.executable, __file__, "--mode", mode, "--files", str(files), "--size-mb", str(size_mb)],
+            check=True, capture_output=True, text=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"  {mode:<9} peak RSS +{result['peak_rss_increase_mb']:7.1f} MB  {result['seconds']:6.2f}s")
+    shutil.rmtree(settings.LOCAL_STORAGE_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=4, help="Concurrent uploads")
+    parser.add_argument("--size-mb", type=int, default=200, help="Size of each file")
+    parser.add_argument("--mode", choices=["buffered", "streamed"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.mode:
+        print(json.dumps(asyncio.run(run_mode(args.mode, args.files, args.size_mb))))
+    else:
+        main(args.files, args.size_mb)
@@ -0,0 +1,99 @@
+"""
+Benchmark micro-batched initial VLM analyses against one model call per task
+
+Submits a clinic's worth of sessions against a throwaway database on the
+configured MongoDB and runs their VLM tasks in-process (eagerly), once with
+batching disabled and once through the batching stage. The model is the
+local inference backend with a constant time to first token: like a GPU
+server, it decodes a batch in lockstep, one forward pass per token for all
+prompts. The analysis cache is disabled so every session reaches the model.
+
+Usage:
+    python scripts/bench_vlm_batching.py [--sessions 32] [--batch-size 8]
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Add parent directory to path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app.core.config import settings
+
+settings.MONGODB_DB_NAME = f"{settings.MONGODB_DB_NAME}_bench_vlm_batching"
+settings.VLM_CACHE_ENABLED = False
+settings.VLM_BACKEND = "local"
+settings.VLM_LOCAL_LATENCY_DISTRIBUTION = "constant"
+settings.VLM_LOCAL_LATENCY_MEAN_SECONDS = 0.4
+settings.VLM_LOCAL_TOKENS_PER_SECOND = 2000.0
+
+from app.core import database
+from app.tasks import vlm_tasks, worker
+
+
+async def seed(db, sessions: int):
+    now = datetime.utcnow()
+    await db.patients.insert_one({
+        "patient_id": "P-00001", "name": "Bench Patient", "national_id": "29801010000001",
+        "age": 58, "sex": "female", "chronic_diseases": [],
+    })
+    await db.sessions.insert_many([{
+        "session_id": f"S-{n:05d}", "patient_id": "P-00001", "session_type": "new_problem",
+        "session_status": "submitted", "chief_complaint": f"Persistent dry cough ({n})",
+        "current_state_description": "Worse at night, no fever", "status_event_count": 2,
+        "created_at": now, "created_by": "N-00001", "last_updated": now,
+    } for n in range(1, sessions + 1)])
+
+
+def run_per_task(session_ids):
+    settings.VLM_BATCH_MAX_SIZE = 1
+    for session_id in session_ids:
+        vlm_tasks.process_session_vlm.apply(args=(session_id,)).get()
+
+
+def run_batched(session_ids, batch_size: int):
+    settings.VLM_BATCH_MAX_SIZE = batch_size
+    # Flushes would be scheduled on the broker; run one once all are queued
+    vlm_tasks.process_vlm_batch.apply_async = lambda **kwargs: None
+    for session_id in session_ids:
+        vlm_tasks.process_session_vlm.apply(args=(session_id,)).get()
+    vlm_tasks.process_vlm_batch.apply().get()
+
+
+def main(sessions: int, batch_size: int):
+    db = worker.get_database()
+    worker.run(db.client.drop_database(settings.MONGODB_DB_NAME))
+    database.db.db = db
+    worker.run(database.create_indexes())
+    worker.run(seed(db, sessions * 2))
+
+    session_ids = [f"S-{n:05d}" for n in range(1, sessions * 2 + 1)]
+    timings = {}
+    for name, run in [
+        ("per-task calls", lambda: run_per_task(session_ids[:sessions])),
+        (f"batches of {batch_size}", lambda: run_batched(session_ids[sessions:], batch_size)),
+    ]:
+        start = time.perf_counter()
+        run()
+        timings[name] = time.perf_counter() - start
+
+    completed = worker.run(db.sessions.count_documents({"session_status": "awaiting_doctor"}))
+    worker.run(db.client.drop_database(settings.MONGODB_DB_NAME))
+    worker.stop()
+
+    print(f"{sessions} sessions per mode, local backend: "
+          f"{settings.VLM_LOCAL_LATENCY_MEAN_SECONDS * 1000:.0f}ms to first token, "
+          f"{settings.VLM_LOCAL_TOKENS_PER_SECOND:.0f} tokens/s ({completed}/{sessions * 2} completed)")
+    for name, elapsed in timings.items():
+        print(f"  {name:<16} {elapsed:6.2f}s  {sessions / elapsed:6.1f} sessions/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=32, help="Sessions submitted per mode")
+    parser.add_argument("--batch-size", type=int, default=8, help="VLM_BATCH_MAX_SIZE for the batched run")
+    args = parser.parse_args()
+    main(args.sessions, args.batch_size)
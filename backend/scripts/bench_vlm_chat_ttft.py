@@ -0,0 +1,130 @@
+"""
+Benchmark time-to-first-token of the streaming VLM chat
+
+Serves the API with uvicorn on a local port (so responses really stream),
+against a throwaway database on the configured MongoDB, and sends the same
+questions to the blocking and the streaming chat endpoints. For the blocking
+endpoint the doctor sees nothing until the whole answer arrives; for the
+streaming one, text appears with the first token event.
+
+Usage:
+    python scripts/bench_vlm_chat_ttft.py [--requests 10] [--port 8765]
+"""
+import argparse
+import asyncio
+import math
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Add parent directory to path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+import httpx
+import uvicorn
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.core.config import settings
+
+# Chat answers from the rule-based mock VLM
+settings.VLM_BACKEND = "mock"
+
+from app.core import database
+from app.core.security import create_access_token
+from app.main import app
+
+BENCH_DB_NAME = f"{settings.MONGODB_DB_NAME}_bench_chat_ttft"
+SESSION_ID = "S-00001"
+QUESTIONS = [
+    "Any concern about the wheezing on auscultation?",
+    "She mentions left shoulder pain radiating from the chest",
+    "BP today is 150/95 mmHg",
+    "Should we repeat the chest X-ray?",
+]
+
+
+def summarize(latencies_ms):
+    ordered = sorted(latencies_ms)
+    p95 = ordered[math.ceil(len(ordered) * 0.95) - 1]
+    return f"p50={statistics.median(ordered):7.0f}ms p95={p95:7.0f}ms max={ordered[-1]:7.0f}ms"
+
+
+async def seed(db):
+    now = datetime.utcnow()
+    await db.patients.insert_one({
+        "patient_id": "P-00001", "name": "Bench Patient", "national_id": "29801010000001",
+        "age": 58, "sex": "female", "chronic_diseases": ["Hypertension"],
+    })
+    await db.sessions.insert_one({
+        "session_id": SESSION_ID, "patient_id": "P-00001", "session_status": "doctor_reviewing",
+        "chief_complaint": "Persistent dry cough", "current_state_description": "Worse at night",
+        "doctor_id": "D-00001", "vlm_chat_count": 0, "status_event_count": 0,
+        "created_at": now, "last_updated": now,
+    })
+
+
+async def blocking_chat(api, url, headers, question):
+    start = time.perf_counter()
+    response = await api.post(url, json={"content": question}, headers=headers)
+    response.raise_for_status()
+    total = (time.perf_counter() - start) * 1000
+    return total, total
+
+
+async def streaming_chat(api, url, headers, question):
+    start = time.perf_counter()
+    first_token = None
+    async with api.stream("POST", f"{url}/stream", json={"content": question}, headers=headers) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if line.startswith("event: error"):
+                raise RuntimeError("stream reported an error")
+            if first_token is None and line == "event: token":
+                first_token = (time.perf_counter() - start) * 1000
+    return first_token, (time.perf_counter() - start) * 1000
+
+
+async def main(requests: int, port: int):
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    await client.drop_database(BENCH_DB_NAME)
+    database.db.client = client
+    database.db.db = client[BENCH_DB_NAME]
+    await database.create_indexes()
+    await seed(database.db.db)
+
+    # lifespan off: the startup hook would reconnect to the real database
+    server = uvicorn.Server(uvicorn.Config(app, port=port, lifespan="off", log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    token = create_access_token({"sub": "D-00001", "role": "doctor", "username": "d-00001"})
+    headers = {"Authorization": f"Bearer {token}"}
+    url = f"http://127.0.0.1:{port}{settings.API_V1_PREFIX}/doctor/sessions/{SESSION_ID}/vlm-chat"
+
+    results = {"blocking": [], "streaming": []}
+    async with httpx.AsyncClient(timeout=None) as api:
+        for n in range(requests):
+            question = QUESTIONS[n % len(QUESTIONS)]
+            results["blocking"].append(await blocking_chat(api, url, headers, question))
+            results["streaming"].append(await streaming_chat(api, url, headers, question))
+
+    server.should_exit = True
+    await server_task
+    await client.drop_database(BENCH_DB_NAME)
+    client.close()
+
+    print(f"{requests} chat turns per endpoint")
+    for name, samples in results.items():
+        print(f"  {name:<10} first text {summarize([s[0] for s in samples])}")
+        print(f"  {'':<10} full answer {summarize([s[1] for s in samples])}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=10, help="Chat turns per endpoint")
+    parser.add_argument("--port", type=int, default=8765, help="Local port to serve on")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.port))
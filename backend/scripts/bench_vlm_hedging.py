@@ -0,0 +1,113 @@
+"""
+Benchmark tail latency of initial VLM analyses with and without hedging
+
+Runs MedGemmaService against a stub backend (no network, no database):
+the primary model usually answers fast but stalls on a small fraction of
+calls, the fallback is slower but steady. Each mode gets a fresh service, a
+warm-up to build up latency stats, then the measured requests. A final
+phase takes the primary down entirely (each call hangs, then errors) to
+show the circuit breaker skipping it.
+
+Usage:
+    python scripts/bench_vlm_hedging.py [--requests 200] [--concurrency 8]
+"""
+import argparse
+import logging
+import math
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Add parent directory to path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app.core.config import settings
+from app.services.inference_backends import InferenceBackend
+from app.services.medgemma_service import MedGemmaService
+
+PRIMARY_SECONDS = (0.05, 0.10)
+PRIMARY_STALL_SECONDS = (1.5, 2.5)
+PRIMARY_STALL_RATE = 0.03  # Below 5%, so the p95 hedge deadline sits under the stalls
+FALLBACK_SECONDS = (0.15, 0.25)
+OUTAGE_HANG_SECONDS = 1.0
+STUB_RESPONSE = "FINDINGS:\nStub analysis.\n"
+
+REQUEST = {
+    "patient_context": {"age": 58, "sex": "female", "chronic_diseases": [], "current_medications": []},
+    "chief_complaint": "Persistent dry cough",
+    "current_state": "Worse at night, no fever",
+}
+
+
+class StubBackend(InferenceBackend):
+    name = "stub"
+
+    def __init__(self, primary_model: str):
+        self.primary_model = primary_model
+        self.primary_down = False
+
+    def generate(self, prompt, model, **params):
+        if model == self.primary_model:
+            if self.primary_down:
+                time.sleep(OUTAGE_HANG_SECONDS)
+                raise TimeoutError("primary endpoint timed out")
+            stalled = random.random() < PRIMARY_STALL_RATE
+            time.sleep(random.uniform(*(PRIMARY_STALL_SECONDS if stalled else PRIMARY_SECONDS)))
+        else:
+            time.sleep(random.uniform(*FALLBACK_SECONDS))
+        return STUB_RESPONSE
+
+
+def summarize(latencies_s):
+    ordered = sorted(ms * 1000 for ms in latencies_s)
+
+    def pct(p):
+        return ordered[math.ceil(len(ordered) * p / 100) - 1]
+
+    return (f"p50={statistics.median(ordered):6.0f}ms p95={pct(95):6.0f}ms "
+            f"p99={pct(99):6.0f}ms max={ordered[-1]:6.0f}ms")
+
+
+def run(service, requests: int, concurrency: int):
+    def one(_):
+        start = time.perf_counter()
+        output = service.process_initial_session(**REQUEST)
+        return time.perf_counter() - start, output["model_used"]
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(one, range(requests)))
+
+
+def main(requests: int, concurrency: int, warmup: int):
+    logging.getLogger("app.services.medgemma_service").setLevel(logging.ERROR)
+    random.seed(7)
+    for hedging in (False, True):
+        settings.VLM_HEDGING_ENABLED = hedging
+        backend = StubBackend(settings.MEDGEMMA_MODEL)
+        service = MedGemmaService(backend)
+
+        run(service, warmup, concurrency)
+        results = run(service, requests, concurrency)
+        fallback_answers = sum(1 for _, model_used in results if model_used == "fallback")
+
+        backend.primary_down = True
+        outage = run(service, requests // 4, concurrency)
+        primary_health = service.health[service.primary_model].snapshot()
+
+        label = "hedged" if hedging else "no hedging"
+        print(f"{label}:")
+        print(f"  normal  {summarize([s for s, _ in results])}  ({fallback_answers}/{requests} from fallback)")
+        print(f"  outage  {summarize([s for s, _ in outage])}  (primary circuit {primary_health['state']})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per mode")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight")
+    parser.add_argument("--warmup", type=int, default=50, help="Unmeasured requests to build latency stats")
+    args = parser.parse_args()
+    main(args.requests, args.concurrency, args.warmup)
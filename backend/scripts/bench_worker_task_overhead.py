@@ -0,0 +1,104 @@
+"""
+Benchmark per-task overhead of the Celery VLM task
+
+Runs process_session_vlm in-process (eagerly) against a throwaway database on
+the configured MongoDB, for sessions whose analysis is already in the VLM
+cache, so what is measured is the task's own overhead: event loop, database
+connection and its queries, without any model call.
+
+Two modes are compared:
+  per-task setup   event loop and DB/inference clients torn down after every
+                   task, as happened when a task found its loop closed or its
+                   client inherited from the parent process
+  persistent       the worker process's long-lived loop and pooled client
+
+Usage:
+    python scripts/bench_worker_task_overhead.py [--tasks 50]
+"""
+import argparse
+import math
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Add parent directory to path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app.core.config import settings
+
+settings.MONGODB_DB_NAME = f"{settings.MONGODB_DB_NAME}_bench_worker"
+
+from app.services import vlm_cache
+from app.services.medgemma_service import medgemma_service
+from app.tasks import worker
+from app.tasks.vlm_tasks import process_session_vlm
+
+PATIENT_CONTEXT = {"age": 58, "sex": "female", "chronic_diseases": [], "current_medications": []}
+CHIEF_COMPLAINT = "Persistent dry cough"
+CURRENT_STATE = "Worse at night, no fever"
+
+
+def summarize(latencies_ms):
+    ordered = sorted(latencies_ms)
+    p95 = ordered[math.ceil(len(ordered) * 0.95) - 1]
+    return f"mean={statistics.mean(ordered):7.2f}ms p50={statistics.median(ordered):7.2f}ms p95={p95:7.2f}ms"
+
+
+async def seed(db, sessions: int):
+    now = datetime.utcnow()
+    await db.patients.insert_one({
+        "patient_id": "P-00001", "name": "Bench Patient", "national_id": "29801010000001",
+        "age": PATIENT_CONTEXT["age"], "sex": PATIENT_CONTEXT["sex"], "chronic_diseases": [],
+    })
+    await db.sessions.insert_many([{
+        "session_id": f"S-{n:05d}", "patient_id": "P-00001", "session_type": "new_problem",
+        "session_status": "submitted", "chief_complaint": CHIEF_COMPLAINT,
+        "current_state_description": CURRENT_STATE, "status_event_count": 2,
+        "created_at": now, "created_by": "N-00001", "last_updated": now,
+    } for n in range(1, sessions + 1)])
+
+    key = medgemma_service.initial_cache_key(PATIENT_CONTEXT, CHIEF_COMPLAINT, CURRENT_STATE)
+    await vlm_cache.put(db, key, medgemma_service.primary_model, {
+        "findings": "Cached analysis", "key_observations": [], "model_used": "primary",
+        "model_version": medgemma_service.primary_model, "processing_time_seconds": 0,
+    })
+
+
+def run_tasks(session_ids, per_task_setup: bool):
+    latencies = []
+    for session_id in session_ids:
+        start = time.perf_counter()
+        result = process_session_vlm.apply(args=(session_id,)).get()
+        if per_task_setup:
+            worker.stop()
+        latencies.append((time.perf_counter() - start) * 1000)
+        if not result.get("success"):
+            raise RuntimeError(f"Task failed for {session_id}: {result}")
+    return latencies
+
+
+def main(tasks: int):
+    worker.run(worker.get_database().client.drop_database(settings.MONGODB_DB_NAME))
+    worker.run(seed(worker.get_database(), tasks * 2))
+    worker.stop()
+
+    session_ids = [f"S-{n:05d}" for n in range(1, tasks * 2 + 1)]
+    per_task = run_tasks(session_ids[:tasks], per_task_setup=True)
+    persistent = run_tasks(session_ids[tasks:], per_task_setup=False)
+
+    worker.run(worker.get_database().client.drop_database(settings.MONGODB_DB_NAME))
+    worker.stop()
+
+    print(f"{tasks} cached-analysis tasks per mode")
+    print(f"  per-task setup  {summarize(per_task)}")
+    print(f"  persistent      {summarize(persistent)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=50, help="Tasks per mode")
+    args = parser.parse_args()
+    main(args.tasks)
@@ -0,0 +1,151 @@
+"""
+Count MongoDB round trips per write endpoint
+
+Drives the API in-process against a throwaway database on the configured
+MongoDB, with a pymongo command listener attached, and reports the commands
+each endpoint issues in steady state (the second call, so ID block
+reservation is not counted). Exits non-zero if an endpoint exceeds its
+round-trip budget.
+
+Usage:
+    python scripts/count_round_trips.py
+"""
+import asyncio
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# Add parent directory to path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+import httpx
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+from app.core import database
+from app.core.config import settings
+from app.core.security import create_access_token
+from app.main import app
+
+BENCH_DB_NAME = f"{settings.MONGODB_DB_NAME}_round_trips"
+IGNORED_COMMANDS = {"hello", "ismaster", "isMaster", "ping", "endSessions", "buildInfo", "saslStart", "saslContinue"}
+
+# Maximum database commands per request
+BUDGETS = {
+    "POST /patients": 1,
+    "PUT /patients/{id}": 1,
+    "POST /sessions": 6,
+    "PUT /sessions/{id}": 1,
+    "PUT /sessions/{id} (reassign)": 3,
+}
+
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.commands = []
+
+    def started(self, event):
+        if event.command_name not in IGNORED_COMMANDS:
+            target = event.command.get(event.command_name)
+            self.commands.append(f"{event.command_name}({target})")
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def auth_header(user_id: str, role: str) -> dict:
+    token = create_access_token({"sub": user_id, "role": role, "username": user_id})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def patient_payload(n: int) -> dict:
+    return {
+        "name": f"Round Trip Patient {n}",
+        "national_id": f"2980101{n:07d}",
+        "date_of_birth": "1980-01-01",
+        "phone_primary": f"0100{n:07d}",
+        "sex": "female",
+    }
+
+
+async def main() -> int:
+    counter = CommandCounter()
+    client = AsyncIOMotorClient(settings.MONGODB_URL, event_listeners=[counter])
+    await client.drop_database(BENCH_DB_NAME)
+    database.db.client = client
+    database.db.db = client[BENCH_DB_NAME]
+    await database.create_indexes()
+
+    for user_id, role in [("D-00001", "doctor"), ("D-00002", "doctor"), ("N-00001", "nurse")]:
+        await database.db.db.users.insert_one({
+            "user_id": user_id,
+            "username": user_id.lower(),
+            "full_name": f"Round Trip {role}",
+            "role": role,
+            "hashed_password": "",
+            "is_active": True,
+            "created_at": datetime.utcnow(),
+        })
+    nurse = auth_header("N-00001", "nurse")
+    session_payload = {
+        "session_type": "new_problem",
+        "assigned_doctor_id": "D-00001",
+        "chief_complaint": "Persistent dry cough",
+        "current_state_description": "Worse at night, no fever",
+    }
+
+    async def measure(label, method, url, **kwargs):
+        counter.commands.clear()
+        response = await api.request(method, url, headers=nurse, **kwargs)
+        response.raise_for_status()
+        return label, list(counter.commands), response.json()
+
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://medflow") as api:
+        prefix = settings.API_V1_PREFIX
+        patient_ids = []
+        for n in range(2):
+            result = await measure("POST /patients", "POST", f"{prefix}/patients", json=patient_payload(n))
+            patient_ids.append(result[2]["patient_id"])
+        results.append(result)
+
+        results.append(await measure(
+            "PUT /patients/{id}", "PUT", f"{prefix}/patients/{patient_ids[0]}",
+            json={"address": "12 Nile Street"}
+        ))
+
+        for _ in range(2):
+            result = await measure(
+                "POST /sessions", "POST", f"{prefix}/sessions",
+                json={**session_payload, "patient_id": patient_ids[0]}
+            )
+        results.append(result)
+        session_id = result[2]["session_id"]
+
+        results.append(await measure(
+            "PUT /sessions/{id}", "PUT", f"{prefix}/sessions/{session_id}",
+            json={"chief_complaint": "Persistent dry cough, 3 weeks"}
+        ))
+        results.append(await measure(
+            "PUT /sessions/{id} (reassign)", "PUT", f"{prefix}/sessions/{session_id}",
+            json={"assigned_doctor_id": "D-00002"}
+        ))
+
+    await client.drop_database(BENCH_DB_NAME)
+    client.close()
+
+    over_budget = 0
+    for label, commands, _ in results:
+        budget = BUDGETS[label]
+        ok = len(commands) <= budget
+        over_budget += not ok
+        print(f"{'ok  ' if ok else 'OVER'} {label:<30} {len(commands)} / {budget}  {', '.join(commands)}")
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,65 @@
+"""
+Index advisor: explain() every registered query shape and report problems
+
+Flags shapes whose winning plan does a collection scan, sorts in memory, or
+examines many more documents than it returns.
+
+Usage:
+    python scripts/index_advisor.py [--max-ratio 10] [--strict]
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.core.config import settings
+from app.core.query_shapes import explain_all_shapes
+
+
+def find_issues(report: dict, max_ratio: float) -> list:
+    """List the problems found in one explain report"""
+    issues = []
+    if report["collection_scan"]:
+        issues.append("COLLSCAN")
+    if report["in_memory_sort"]:
+        issues.append("in-memory SORT")
+    if report["examined_per_returned"] > max_ratio:
+        issues.append(f"examined/returned {report['examined_per_returned']:.1f}")
+    return issues
+
+
+async def main(args) -> int:
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db = client[settings.MONGODB_DB_NAME]
+
+    reports = await explain_all_shapes(db)
+    client.close()
+
+    problems = 0
+    print(f"{'shape':<34} {'collection':<10} {'examined':>9} {'returned':>9}  plan / issues")
+    for report in reports:
+        issues = find_issues(report, args.max_ratio)
+        problems += bool(issues)
+        plan = " > ".join(report["stages"])
+        print(
+            f"{report['shape']:<34} {report['collection']:<10} "
+            f"{report['docs_examined']:>9} {report['returned']:>9}  {plan}"
+        )
+        if issues:
+            print(f"{'':<34} !! {', '.join(issues)}  ({report['issued_by']})")
+
+    print(f"\n{len(reports)} shapes explained, {problems} with issues")
+    return 1 if args.strict and problems else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-ratio", type=float, default=10.0,
+                        help="Flag shapes examining more than this many docs per returned doc")
+    parser.add_argument("--strict", action="store_true", help="Exit non-zero when any shape has issues")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,151 @@
+"""
+Load test: does VLM chat stall the other endpoints on the same worker?
+
+Runs the API in-process against a throwaway database on the configured
+MongoDB. A probe loop keeps requesting GET /sessions/{id} while a batch of
+concurrent VLM chat requests is in flight, and probe latency is compared
+with an idle baseline. With --inline the chat calls the (blocking) mock VLM
+directly on the event loop, as before the bounded executor, for comparison.
+
+Usage:
+    python scripts/load_test_vlm_chat.py [--chats 8] [--inline]
+"""
+import argparse
+import asyncio
+import math
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Add parent directory to path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+import httpx
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.core.config import settings
+
+# Chat answers from the rule-based mock VLM
+settings.VLM_BACKEND = "mock"
+
+from app.core import database
+from app.core.executor import vlm_executor
+from app.core.security import create_access_token
+from app.main import app
+
+BENCH_DB_NAME = f"{settings.MONGODB_DB_NAME}_load_vlm_chat"
+SESSION_ID = "S-00001"
+PROBE_INTERVAL_SECONDS = 0.05
+
+
+def auth_header(user_id: str, role: str) -> dict:
+    token = create_access_token({"sub": user_id, "role": role, "username": user_id})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def summarize(latencies_ms):
+    ordered = sorted(latencies_ms)
+    p95 = ordered[math.ceil(len(ordered) * 0.95) - 1]
+    return f"n={len(ordered):<4} p50={statistics.median(ordered):8.1f}ms p95={p95:8.1f}ms max={ordered[-1]:8.1f}ms"
+
+
+async def seed(db):
+    now = datetime.utcnow()
+    await db.users.insert_one({
+        "user_id": "D-00001", "username": "d-00001", "full_name": "Load Test Doctor",
+        "role": "doctor", "hashed_password": "", "is_active": True, "created_at": now,
+    })
+    await db.patients.insert_one({
+        "patient_id": "P-00001", "name": "Load Test Patient", "national_id": "29801010000001",
+        "age": 45, "sex": "female", "chronic_diseases": [],
+    })
+    await db.sessions.insert_one({
+        "session_id": SESSION_ID, "patient_id": "P-00001", "patient_name": "Load Test Patient",
+        "session_type": "new_problem", "session_status": "doctor_reviewing",
+        "assigned_doctor_id": "D-00001", "assigned_doctor_name": "Load Test Doctor",
+        "nurse_id": "N-00001", "nurse_name": "Load Test Nurse", "session_date": now,
+        "chief_complaint": "Persistent dry cough",
+        "current_state_description": "Worse at night, no fever",
+        "doctor_id": "D-00001", "vlm_chat_count": 0, "status_event_count": 0,
+        "created_at": now, "created_by": "N-00001",
+        "last_updated": now, "last_updated_by": "N-00001",
+    })
+
+
+async def probe(api, headers, stop: asyncio.Event):
+    """Probe on a fixed schedule; latency counts from the scheduled send time,
+    so time spent waiting for a stalled event loop is included"""
+    latencies = []
+    scheduled = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(max(scheduled - time.perf_counter(), 0))
+        response = await api.get(f"{settings.API_V1_PREFIX}/sessions/{SESSION_ID}", headers=headers)
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - scheduled) * 1000)
+        scheduled += PROBE_INTERVAL_SECONDS
+    return latencies
+
+
+async def main(chats: int, baseline_seconds: float, inline: bool):
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    await client.drop_database(BENCH_DB_NAME)
+    database.db.client = client
+    database.db.db = client[BENCH_DB_NAME]
+    await database.create_indexes()
+    await seed(database.db.db)
+
+    if inline:
+        async def run_inline(fn, *args, timeout=None, **kwargs):
+            return fn(*args, **kwargs)
+        vlm_executor.run = run_inline
+
+    doctor = auth_header("D-00001", "doctor")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://medflow", timeout=None) as api:
+        stop = asyncio.Event()
+        probe_task = asyncio.create_task(probe(api, doctor, stop))
+        await asyncio.sleep(baseline_seconds)
+        stop.set()
+        baseline = await probe_task
+
+        async def chat(n):
+            start = time.perf_counter()
+            response = await api.post(
+                f"{settings.API_V1_PREFIX}/doctor/sessions/{SESSION_ID}/vlm-chat",
+                json={"content": f"Any concern about the cough pattern? ({n})"},
+                headers=doctor
+            )
+            return response.status_code, (time.perf_counter() - start) * 1000
+
+        stop = asyncio.Event()
+        probe_task = asyncio.create_task(probe(api, doctor, stop))
+        started = time.perf_counter()
+        results = await asyncio.gather(*[chat(n) for n in range(chats)])
+        elapsed = time.perf_counter() - started
+        stop.set()
+        under_load = await probe_task
+
+    await client.drop_database(BENCH_DB_NAME)
+    client.close()
+    vlm_executor.shutdown()
+
+    mode = "inline (blocking)" if inline else f"executor (max {vlm_executor.max_concurrency} concurrent)"
+    statuses = {}
+    for status_code, _ in results:
+        statuses[status_code] = statuses.get(status_code, 0) + 1
+    print(f"VLM chat mode: {mode}")
+    print(f"{chats} chats finished in {elapsed:.1f}s, statuses {statuses}")
+    print(f"  chat latency          {summarize([ms for _, ms in results])}")
+    print(f"  probe, idle           {summarize(baseline)}")
+    print(f"  probe, chats running  {summarize(under_load)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=8, help="Concurrent chat requests")
+    parser.add_argument("--baseline-seconds", type=float, default=2.0, help="Idle probing time")
+    parser.add_argument("--inline", action="store_true", help="Call the VLM on the event loop (old behaviour)")
+    args = parser.parse_args()
+    asyncio.run(main(args.chats, args.baseline_seconds, args.inline))
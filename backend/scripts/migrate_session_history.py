@@ -0,0 +1,41 @@
+"""
+Move embedded chat and status history out of session documents
+
+Sessions created before chat messages and status events got their own
+collections carry them as vlm_chat_history/status_history arrays. This
+copies them to session_chat_messages/session_status_events, ahead of any
+entries written there since, raises the counters on the session and unsets
+the arrays. Safe to re-run, and to run while the app is serving.
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.core.config import settings
+from app.core import database
+from app.services.history_service import migrate_embedded_history
+
+
+async def main(batch_size: int):
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    database.db.client = client
+    database.db.db = client[settings.MONGODB_DB_NAME]
+
+    await database.create_indexes()
+    migrated = await migrate_embedded_history(database.db.db, batch_size)
+    print(f"Migrated history of {migrated} sessions")
+
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=500, help="Sessions per batch")
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size))
@@ -0,0 +1,33 @@
+"""
+Recount the materialized dashboard counters from the sessions collection
+
+Run once after deploying the counter store on an existing database, or to
+repair drift. Transitions that happen while the rebuild runs may be lost,
+so run it when the system is quiet.
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.core.config import settings
+from app.services.stats_service import rebuild_session_counters
+
+
+async def main():
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db = client[settings.MONGODB_DB_NAME]
+
+    sessions_seen = await rebuild_session_counters(db)
+    counters = await db.session_counters.count_documents({})
+    print(f"Rebuilt {counters} counters from {sessions_seen} sessions")
+
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
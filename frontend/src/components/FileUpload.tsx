@@ -17,10 +17,13 @@ import {
   Chip,
 } from '@mui/material';
 import { CloudUpload, Delete, InsertDriveFile } from '@mui/icons-material';
-import { useMutation, useQueryClient } from '@tanstack/react-query';
+import { useMutation, useQuery, useQueryClient } from '@tanstack/react-query';
 import { sessionService } from '../services/sessionService';
 import { FileType, UploadedFile } from '../types/session';
 
+// Signed URLs stay valid for at least the server's refresh margin (5 minutes)
+const FILE_URLS_STALE_TIME_MS = 4 * 60 * 1000;
+
 interface FileUploadProps {
   sessionId: string;
   files: UploadedFile[];
@@ -32,6 +35,23 @@ const FileUpload: React.FC<FileUploadProps> = ({ sessionId, files, canDelete })
   const [selectedFile, setSelectedFile] = useState<File | null>(null);
   const [fileType, setFileType] = useState<FileType>('other');
 
+  // One request signs every file of the session; downloads reuse it
+  const { data: fileUrls } = useQuery({
+    queryKey: ['fileUrls', sessionId, files.map((f) => f.file_id).join(',')],
+    queryFn: () => sessionService.getFileUrls(sessionId),
+    enabled: files.length > 0,
+    staleTime: FILE_URLS_STALE_TIME_MS,
+  });
+
+  // Thumbnails of imaging files are a few kilobytes each, unlike the originals
+  const withThumbnails = files.filter((f) => f.derivatives_status === 'ready');
+  const { data: thumbnailUrls } = useQuery({
+    queryKey: ['fileUrls', sessionId, 'thumbnail', withThumbnails.map((f) => f.file_id).join(',')],
+    queryFn: () => sessionService.getFileUrls(sessionId, 'thumbnail'),
+    enabled: withThumbnails.length > 0,
+    staleTime: FILE_URLS_STALE_TIME_MS,
+  });
+
   const uploadMutation = useMutation({
     mutationFn: ({ file, type }: { file: File; type: FileType }) =>
       sessionService.uploadFile(sessionId, file, type),
@@ -64,7 +84,8 @@ const FileUpload: React.FC<FileUploadProps> = ({ sessionId, files, canDelete })
 
   const handleDownload = async (file: UploadedFile) => {
     try {
-      const url = await sessionService.getFileUrl(sessionId, file.file_id);
+      const url =
+        fileUrls?.[file.file_id] ?? (await sessionService.getFileUrl(sessionId, file.file_id));
       window.open(url, '_blank');
     } catch (error) {
       console.error('Failed to get file URL:', error);
@@ -155,7 +176,17 @@ const FileUpload: React.FC<FileUploadProps> = ({ sessionId, files, canDelete })
                 }}
                 onClick={() => handleDownload(file)}
               >
-                <InsertDriveFile sx={{ mr: 2, color: 'primary.main' }} />
+                {thumbnailUrls?.[file.file_id] ? (
+                  <Box
+                    component="img"
+                    src={thumbnailUrls[file.file_id]}
+                    alt={file.file_name}
+                    loading="lazy"
+                    sx={{ width: 64, height: 64, objectFit: 'cover', borderRadius: 1, mr: 2 }}
+                  />
+                ) : (
+                  <InsertDriveFile sx={{ mr: 2, color: 'primary.main' }} />
+                )}
                 <ListItemText
                   primary={file.file_name}
                   secondary={
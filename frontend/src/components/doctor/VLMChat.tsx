@@ -9,33 +9,56 @@ import {
   CircularProgress,
 } from '@mui/material';
 import { Send, SmartToy, Person } from '@mui/icons-material';
-import { useMutation, useQueryClient } from '@tanstack/react-query';
+import { useInfiniteQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import { doctorService } from '../../services/doctorService';
 
 interface VLMChatProps {
   sessionId: string;
-  chatHistory: any[];
+  messageCount: number;
 }
 
-const VLMChat: React.FC<VLMChatProps> = ({ sessionId, chatHistory }) => {
+const VLMChat: React.FC<VLMChatProps> = ({ sessionId, messageCount }) => {
   const queryClient = useQueryClient();
   const [message, setMessage] = useState('');
+  const [pendingQuestion, setPendingQuestion] = useState('');
+  const [streamedReply, setStreamedReply] = useState('');
   const messagesEndRef = useRef<HTMLDivElement>(null);
 
+  // Refetched only when the session's message count changes
+  const { data, fetchNextPage, hasNextPage, isFetchingNextPage } = useInfiniteQuery({
+    queryKey: ['doctor', 'session', sessionId, 'chat', messageCount],
+    queryFn: ({ pageParam }) => doctorService.getChatHistory(sessionId, pageParam),
+    initialPageParam: undefined as string | undefined,
+    getNextPageParam: (lastPage) => lastPage.nextCursor,
+  });
+
+  // Pages go back in time; show the oldest first
+  const chatHistory = data ? [...data.pages].reverse().flatMap((page) => page.messages) : [];
+
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
   };
 
   useEffect(() => {
     scrollToBottom();
-  }, [chatHistory]);
+  }, [messageCount, streamedReply]);
 
   const chatMutation = useMutation({
-    mutationFn: (msg: string) => doctorService.chatWithVLM(sessionId, msg),
+    mutationFn: (msg: string) => {
+      setPendingQuestion(msg);
+      setStreamedReply('');
+      return doctorService.streamChatWithVLM(sessionId, msg, (text) =>
+        setStreamedReply((reply) => reply + text)
+      );
+    },
     onSuccess: () => {
       queryClient.invalidateQueries({ queryKey: ['doctor', 'session', sessionId] });
       setMessage('');
     },
+    onSettled: () => {
+      setPendingQuestion('');
+      setStreamedReply('');
+    },
   });
 
   const handleSendMessage = () => {
@@ -54,7 +77,7 @@ const VLMChat: React.FC<VLMChatProps> = ({ sessionId, chatHistory }) => {
   return (
     <Box>
       <Paper sx={{ p: 2, mb: 2, maxHeight: 500, overflow: 'auto' }}>
-        {chatHistory.length === 0 ? (
+        {chatHistory.length === 0 && !pendingQuestion ? (
           <Box textAlign="center" py={4}>
             <SmartToy sx={{ fontSize: 60, color: 'text.secondary', mb: 2 }} />
             <Typography variant="h6" color="text.secondary" gutterBottom>
@@ -66,6 +89,13 @@ const VLMChat: React.FC<VLMChatProps> = ({ sessionId, chatHistory }) => {
           </Box>
         ) : (
           <Box>
+            {hasNextPage && (
+              <Box textAlign="center" mb={2}>
+                <Button size="small" onClick={() => fetchNextPage()} disabled={isFetchingNextPage}>
+                  {isFetchingNextPage ? 'Loading...' : 'Load earlier messages'}
+                </Button>
+              </Box>
+            )}
             {chatHistory.map((msg, index) => (
               <Box key={index} mb={3}>
                 {/* Doctor Message */}
@@ -111,6 +141,42 @@ const VLMChat: React.FC<VLMChatProps> = ({ sessionId, chatHistory }) => {
                 )}
               </Box>
             ))}
+
+            {/* Question being answered, with the reply streaming in */}
+            {pendingQuestion && (
+              <Box mb={3}>
+                <Box display="flex" gap={2} mb={2}>
+                  <Avatar sx={{ bgcolor: 'primary.main' }}>
+                    <Person />
+                  </Avatar>
+                  <Box flex={1}>
+                    <Typography variant="subtitle2" color="text.secondary">
+                      You
+                    </Typography>
+                    <Paper sx={{ p: 2, bgcolor: 'primary.50' }}>
+                      <Typography variant="body1">{pendingQuestion}</Typography>
+                    </Paper>
+                  </Box>
+                </Box>
+                <Box display="flex" gap={2} pl={7}>
+                  <Avatar sx={{ bgcolor: 'secondary.main' }}>
+                    <SmartToy />
+                  </Avatar>
+                  <Box flex={1}>
+                    <Typography variant="subtitle2" color="text.secondary">
+                      VLM Assistant
+                    </Typography>
+                    <Paper sx={{ p: 2, bgcolor: 'grey.50' }}>
+                      {streamedReply ? (
+                        <Typography variant="body1">{streamedReply}</Typography>
+                      ) : (
+                        <CircularProgress size={20} />
+                      )}
+                    </Paper>
+                  </Box>
+                </Box>
+              </Box>
+            )}
             <div ref={messagesEndRef} />
           </Box>
         )}
@@ -15,19 +15,25 @@ import {
   Switch,
   CircularProgress,
   Alert,
+  Button,
 } from '@mui/material';
-import { useQuery } from '@tanstack/react-query';
+import { useInfiniteQuery } from '@tanstack/react-query';
 import { doctorService, SessionSummary } from '../../services/doctorService';
 
 const DoctorQueue: React.FC = () => {
   const navigate = useNavigate();
   const [assignedToMe, setAssignedToMe] = useState(false);
 
-  const { data: sessions, isLoading, error } = useQuery({
+  // Pages follow X-Next-Cursor; X-Total-Count comes with the first page only
+  const { data, isLoading, error, fetchNextPage, hasNextPage, isFetchingNextPage } = useInfiniteQuery({
     queryKey: ['doctor', 'queue', assignedToMe],
-    queryFn: () => doctorService.getQueue(assignedToMe),
+    queryFn: ({ pageParam }) => doctorService.getQueue(assignedToMe, pageParam),
+    initialPageParam: undefined as string | undefined,
+    getNextPageParam: (lastPage) => lastPage.nextCursor,
     refetchInterval: 10000, // Refresh every 10 seconds
   });
+  const sessions = data?.pages.flatMap((page) => page.sessions);
+  const totalCount = data?.pages[0].totalCount;
 
   const handleRowClick = (sessionId: string) => {
     navigate(`/doctor/sessions/${sessionId}`);
@@ -124,6 +130,19 @@ const DoctorQueue: React.FC = () => {
             )}
           </TableBody>
         </Table>
+        {sessions && sessions.length > 0 && (
+          <Box display="flex" alignItems="center" justifyContent="space-between" px={2} py={1}>
+            <Typography variant="body2" color="text.secondary">
+              Showing {sessions.length}
+              {totalCount !== undefined && ` of ${totalCount}`} sessions
+            </Typography>
+            {hasNextPage && (
+              <Button size="small" onClick={() => fetchNextPage()} disabled={isFetchingNextPage}>
+                {isFetchingNextPage ? 'Loading...' : 'Load more'}
+              </Button>
+            )}
+          </Box>
+        )}
       </TableContainer>
     </Box>
   );
@@ -12,6 +12,7 @@ import {
   Grid,
   Divider,
   CircularProgress,
+  LinearProgress,
   Dialog,
   DialogTitle,
   DialogContent,
@@ -82,6 +83,8 @@ const SessionReview: React.FC = () => {
   const vlmFailed = vlmStatus === 'failed' || session.session_status === 'vlm_failed';
   const vlmProcessing = vlmStatus === 'processing' || session.session_status === 'vlm_processing';
   const vlmCompleted = vlmStatus === 'completed' && !!vlmOutput;
+  // Sections already generated are stored while the rest is still being written
+  const vlmStreaming = vlmProcessing && !!vlmOutput;
 
   const canClose = !!session.diagnosis;
   
@@ -387,8 +390,54 @@ const SessionReview: React.FC = () => {
                 <Typography variant="h6" gutterBottom>
                   Chat with VLM
                 </Typography>
-                <VLMChat sessionId={session.session_id} chatHistory={session.vlm_chat_history} />
+                <VLMChat sessionId={session.session_id} messageCount={session.vlm_chat_count} />
               </>
+            ) : vlmStreaming ? (
+              <Paper sx={{ p: 3, mb: 3, bgcolor: 'primary.50' }}>
+                <Typography variant="h6" gutterBottom>
+                  VLM Initial Analysis (in progress)
+                </Typography>
+                <LinearProgress sx={{ mb: 2 }} />
+                {vlmOutput.findings && (
+                  <Typography variant="body1" paragraph>
+                    {vlmOutput.findings}
+                  </Typography>
+                )}
+
+                {vlmOutput.key_observations.length > 0 && (
+                  <>
+                    <Typography variant="subtitle2" gutterBottom>
+                      Key Observations
+                    </Typography>
+                    <Box component="ul" sx={{ pl: 2 }}>
+                      {vlmOutput.key_observations.map((obs: string, i: number) => (
+                        <li key={i}>
+                          <Typography variant="body2">{obs}</Typography>
+                        </li>
+                      ))}
+                    </Box>
+                  </>
+                )}
+
+                {vlmOutput.suggested_considerations.length > 0 && (
+                  <>
+                    <Typography variant="subtitle2" gutterBottom mt={2}>
+                      Suggested Considerations
+                    </Typography>
+                    <Box component="ul" sx={{ pl: 2 }}>
+                      {vlmOutput.suggested_considerations.map((cons: string, i: number) => (
+                        <li key={i}>
+                          <Typography variant="body2">{cons}</Typography>
+                        </li>
+                      ))}
+                    </Box>
+                  </>
+                )}
+
+                <Typography variant="caption" color="text.secondary" display="block" mt={2}>
+                  Remaining sections appear as the model writes them. This page auto-refreshes every 5 seconds.
+                </Typography>
+              </Paper>
             ) : vlmProcessing ? (
               <Box textAlign="center" py={6}>
                 <CircularProgress size={60} sx={{ mb: 3 }} />
@@ -27,7 +27,7 @@ import {
   Snackbar,
 } from '@mui/material';
 import { ArrowBack, Edit, Add, Delete } from '@mui/icons-material';
-import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
+import { useInfiniteQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import { patientService } from '../../services/patientService';
 import { sessionService } from '../../services/sessionService';
 import { useAuth } from '../../contexts/AuthContext';
@@ -62,11 +62,15 @@ const PatientProfile: React.FC = () => {
   const [sessionToDelete, setSessionToDelete] = useState<string | null>(null);
   const [snackbar, setSnackbar] = useState({ open: false, message: '', severity: 'success' as 'success' | 'error' });
 
-  const { data: portfolio, isLoading } = useQuery({
-    queryKey: ['patient', 'portfolio', patientId],
-    queryFn: () => patientService.getPatientPortfolio(patientId!),
+  // Sessions come a page at a time, newest first; the total is only sent with the first page
+  const { data, isLoading, fetchNextPage, hasNextPage, isFetchingNextPage } = useInfiniteQuery({
+    queryKey: ['patient', 'portfolio', patientId, 'pages'],
+    queryFn: ({ pageParam }) => patientService.getPatientPortfolio(patientId!, pageParam),
+    initialPageParam: undefined as string | undefined,
+    getNextPageParam: (lastPage) => lastPage.next_cursor ?? undefined,
     enabled: !!patientId,
   });
+  const portfolio = data?.pages[0];
 
   // Delete session mutation
   const deleteMutation = useMutation({
@@ -113,7 +117,8 @@ const PatientProfile: React.FC = () => {
     return <Typography>Patient not found</Typography>;
   }
 
-  const { patient, sessions } = portfolio;
+  const { patient, total_count: totalCount } = portfolio;
+  const sessions = data!.pages.flatMap((page) => page.sessions);
 
   return (
     <Box>
@@ -153,7 +158,7 @@ const PatientProfile: React.FC = () => {
         <Tabs value={tabValue} onChange={(_, newValue) => setTabValue(newValue)}>
           <Tab label="Demographics" />
           <Tab label="Medical History" />
-          <Tab label={`Sessions (${patient.total_sessions})`} />
+          <Tab label={`Sessions (${totalCount ?? patient.total_sessions})`} />
         </Tabs>
 
         <TabPanel value={tabValue} index={0}>
@@ -397,6 +402,17 @@ const PatientProfile: React.FC = () => {
                     ))}
                   </TableBody>
                 </Table>
+                <Box display="flex" alignItems="center" justifyContent="space-between" py={2}>
+                  <Typography variant="body2" color="text.secondary">
+                    Showing {sessions.length}
+                    {totalCount !== undefined && totalCount !== null && ` of ${totalCount}`} sessions
+                  </Typography>
+                  {hasNextPage && (
+                    <Button size="small" onClick={() => fetchNextPage()} disabled={isFetchingNextPage}>
+                      {isFetchingNextPage ? 'Loading...' : 'Load older sessions'}
+                    </Button>
+                  )}
+                </Box>
               </TableContainer>
             ) : (
               <Box textAlign="center" py={4}>
@@ -16,6 +16,8 @@ import {
   Step,
   StepLabel,
   CircularProgress,
+  FormControlLabel,
+  Checkbox,
 } from '@mui/material';
 import { ArrowBack } from '@mui/icons-material';
 import { useMutation, useQuery } from '@tanstack/react-query';
@@ -39,6 +41,7 @@ const SessionCreate: React.FC = () => {
     assigned_doctor_id: '',
     chief_complaint: '',
     current_state_description: '',
+    urgent: false,
   });
 
   // Fetch patient data
@@ -202,6 +205,17 @@ const SessionCreate: React.FC = () => {
                 onChange={(e) => handleInputChange('current_state_description', e.target.value)}
                 helperText="Detailed description of the patient's current condition"
               />
+
+              <FormControlLabel
+                control={
+                  <Checkbox
+                    checked={!!formData.urgent}
+                    onChange={(e) => handleInputChange('urgent', e.target.checked)}
+                  />
+                }
+                label="Urgent - analyse ahead of routine sessions"
+                sx={{ mt: 1 }}
+              />
             </Box>
           </Paper>
 
@@ -18,6 +18,12 @@ export interface DashboardStats {
   // Admin stats
   total_users?: number;
   total_sessions?: number;
+  vlm_cache_hits_today?: number;
+  vlm_cache_misses_today?: number;
+  duplicate_uploads?: number;
+  storage_bytes?: number;
+  storage_bytes_saved?: number;
+  upload_seconds_saved?: number;
 }
 
 export const dashboardService = {
@@ -1,5 +1,5 @@
 import axiosInstance from '../utils/axios';
-import { API_V1_PREFIX } from '../config/api';
+import { API_BASE_URL, API_V1_PREFIX } from '../config/api';
 import { Session } from '../types/session';
 
 export interface SessionSummary {
@@ -38,13 +38,21 @@ export interface PendingTests {
 }
 
 export const doctorService = {
-  // Get doctor queue (automatically includes awaiting_doctor and vlm_failed statuses)
-  getQueue: async (assignedToMe: boolean = false): Promise<SessionSummary[]> => {
+  // Get one page of the doctor queue (automatically includes awaiting_doctor and vlm_failed statuses)
+  getQueue: async (
+    assignedToMe: boolean = false,
+    cursor?: string
+  ): Promise<{ sessions: SessionSummary[]; nextCursor?: string; totalCount?: number }> => {
     const response = await axiosInstance.get<SessionSummary[]>(
       `${API_V1_PREFIX}/doctor/queue`,
-      { params: { assigned_to_me: assignedToMe } }
+      { params: { assigned_to_me: assignedToMe, cursor } }
     );
-    return response.data;
+    const totalCount = response.headers['x-total-count'];
+    return {
+      sessions: response.data,
+      nextCursor: response.headers['x-next-cursor'],
+      totalCount: totalCount !== undefined ? Number(totalCount) : undefined,
+    };
   },
 
   // Get session for review
@@ -55,6 +63,18 @@ export const doctorService = {
     return response.data;
   },
 
+  // Get one page of VLM chat history (newest page first, messages oldest first)
+  getChatHistory: async (
+    sessionId: string,
+    cursor?: string
+  ): Promise<{ messages: any[]; nextCursor?: string }> => {
+    const response = await axiosInstance.get<any[]>(
+      `${API_V1_PREFIX}/doctor/sessions/${sessionId}/vlm-chat`,
+      { params: { cursor } }
+    );
+    return { messages: response.data, nextCursor: response.headers['x-next-cursor'] };
+  },
+
   // Chat with VLM
   chatWithVLM: async (sessionId: string, message: string): Promise<any> => {
     const response = await axiosInstance.post(
@@ -64,6 +84,47 @@ export const doctorService = {
     return response.data;
   },
 
+  // Chat with VLM, receiving the answer token by token (server-sent events)
+  streamChatWithVLM: async (
+    sessionId: string,
+    message: string,
+    onToken: (text: string) => void
+  ): Promise<any> => {
+    const response = await fetch(
+      `${API_BASE_URL}${API_V1_PREFIX}/doctor/sessions/${sessionId}/vlm-chat/stream`,
+      {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          Authorization: `Bearer ${localStorage.getItem('access_token')}`,
+        },
+        body: JSON.stringify({ content: message }),
+      }
+    );
+    if (!response.ok || !response.body) {
+      throw new Error(`VLM chat failed (${response.status})`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    for (;;) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      const events = buffer.split('\n\n');
+      buffer = events.pop() ?? '';
+      for (const block of events) {
+        const event = block.match(/^event: (.*)$/m)?.[1];
+        const data = JSON.parse(block.match(/^data: (.*)$/m)?.[1] ?? 'null');
+        if (event === 'token') onToken(data.text);
+        if (event === 'done') return data;
+        if (event === 'error') throw new Error(data.detail);
+      }
+    }
+    throw new Error('VLM chat stream ended unexpectedly');
+  },
+
   // Submit diagnosis
   submitDiagnosis: async (sessionId: string, diagnosis: Diagnosis): Promise<void> => {
     await axiosInstance.put(
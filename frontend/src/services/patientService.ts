@@ -46,10 +46,11 @@ export const patientService = {
     return response.data;
   },
 
-  // Get patient portfolio (patient + sessions)
-  getPatientPortfolio: async (patientId: string): Promise<any> => {
+  // Get patient portfolio (patient + one page of sessions, newest first)
+  getPatientPortfolio: async (patientId: string, cursor?: string): Promise<any> => {
     const response = await axiosInstance.get(
-      `${API_V1_PREFIX}/patients/${patientId}/portfolio`
+      `${API_V1_PREFIX}/patients/${patientId}/portfolio`,
+      { params: { cursor } }
     );
     return response.data;
   },
@@ -1,6 +1,6 @@
 import axiosInstance from '../utils/axios';
 import { API_V1_PREFIX } from '../config/api';
-import { Session, SessionCreate, UploadedFile, FileType } from '../types/session';
+import { Session, SessionCreate, UploadedFile, FileType, FileUrlKind } from '../types/session';
 
 export const sessionService = {
   // Create session
@@ -64,6 +64,31 @@ export const sessionService = {
     return response.data.url;
   },
 
+  // Get signed URLs for all files of a session (or one of their derivatives), by file id.
+  // With 'tiles' they are the deep zoom descriptors of X-ray and CT files, which a
+  // DZI viewer can open directly: the tiles next to them take the same signature
+  getFileUrls: async (
+    sessionId: string,
+    kind?: FileUrlKind
+  ): Promise<Record<string, string>> => {
+    const response = await axiosInstance.get<{ urls: Record<string, string> }>(
+      `${API_V1_PREFIX}/sessions/${sessionId}/files/urls`,
+      { params: { kind } }
+    );
+    return response.data.urls;
+  },
+
+  // Get signed URLs for all files of several sessions, by session then file id
+  getFileUrlsForSessions: async (
+    sessionIds: string[]
+  ): Promise<Record<string, Record<string, string>>> => {
+    const response = await axiosInstance.get<{ sessions: Record<string, Record<string, string>> }>(
+      `${API_V1_PREFIX}/sessions/files/urls`,
+      { params: { session_ids: sessionIds.join(',') } }
+    );
+    return response.data.sessions;
+  },
+
   // Submit session
   submitSession: async (sessionId: string): Promise<Session> => {
     const response = await axiosInstance.post<Session>(
@@ -12,6 +12,30 @@ export type SessionStatus =
 
 export type FileType = 'xray' | 'ct' | 'lab_result' | 'ecg' | 'report' | 'other';
 
+export type DerivativeKind = 'preview' | 'thumbnail';
+
+// What getFileUrls signs instead of the originals: a derivative, or the deep zoom descriptor
+export type FileUrlKind = DerivativeKind | 'tiles';
+
+export interface FileDerivative {
+  kind: DerivativeKind;
+  file_path: string;
+  mime_type: string;
+  width: number;
+  height: number;
+  size_bytes: number;
+}
+
+export interface TilePyramid {
+  file_path: string;
+  width: number;
+  height: number;
+  tile_size: number;
+  overlap: number;
+  format: string;
+  tile_count: number;
+}
+
 export interface UploadedFile {
   file_id: string;
   file_name: string;
@@ -19,9 +43,13 @@ export interface UploadedFile {
   file_path: string;
   mime_type: string;
   file_size_mb: number;
+  sha256?: string;
   upload_timestamp: string;
   uploaded_by: string;
   can_delete: boolean;
+  derivatives_status?: 'pending' | 'ready' | 'unsupported' | 'failed' | null;
+  derivatives?: FileDerivative[];
+  pyramid?: TilePyramid | null;
 }
 
 export interface SessionCreate {
@@ -30,6 +58,7 @@ export interface SessionCreate {
   assigned_doctor_id: string;
   chief_complaint: string;
   current_state_description: string;
+  urgent?: boolean;
 }
 
 export interface Session extends SessionCreate {
@@ -45,7 +74,7 @@ export interface Session extends SessionCreate {
   uploaded_files: UploadedFile[];
   vlm_initial_status: string;
   vlm_initial_output?: any;
-  vlm_chat_history: any[];
+  vlm_chat_count: number;
   doctor_id?: string;
   doctor_name?: string;
   diagnosis?: any;